@@ -3,8 +3,15 @@ import logging
 import logging.handlers
 import time
 from flask import Flask
-from app.data_ingestor import DataIngestor
+from app.dataset_registry import DatasetRegistry, DEFAULT_DATASET, parse_datasets
 from app.task_runner import ThreadPool
+from app.job_scheduler import JobScheduler
+from app.job_store import InMemoryJobStore, SQLiteJobStore
+from app.admission_control import AdmissionController
+from app.broker import JobBroker
+from app.pool_autoscaler import PoolAutoscaler
+from app.result_cache import ResultCache
+from app.startup import StartupTask
 
 # Creating the logs folder if not present
 if not os.path.exists("./logs"):
@@ -38,16 +45,111 @@ if 'TP_NUM_OF_THREADS' in os.environ:
 else:
     num_of_threads = os.cpu_count()
 
+# Checking the bounds of the pool size, the pool is resized between them if any of them is set
+autoscaling = 'TP_MIN_THREADS' in os.environ or 'TP_MAX_THREADS' in os.environ
+min_threads = int(os.environ.get("TP_MIN_THREADS", 1))
+max_threads = max(min_threads, int(os.environ.get("TP_MAX_THREADS", num_of_threads)))
+if autoscaling:
+    num_of_threads = min(max(num_of_threads, min_threads), max_threads)
+
+# Checking how long cheap jobs may overtake expensive ones (multiple of their expected cost)
+scheduler_stretch = float(os.environ.get("TP_SCHEDULER_STRETCH", 10))
+
+# Checking how many jobs for the same question a worker may take at once, and how long it waits for them
+batch_size = int(os.environ.get("TP_BATCH_SIZE", 1))
+batch_window = float(os.environ.get("TP_BATCH_WINDOW", 0))
+
+
+def optional_int_env(name):
+    """
+    Returns the integer value of an environment variable, None if it is not set.
+    """
+    return int(os.environ[name]) if name in os.environ else None
+
+
+# Checking the admission control limits (not set means no limit)
+max_queue_depth = optional_int_env("TP_MAX_QUEUE_DEPTH")
+max_in_flight = optional_int_env("TP_MAX_IN_FLIGHT")
+max_jobs_per_client = optional_int_env("TP_MAX_JOBS_PER_CLIENT")
+
 webserver = Flask(__name__)
 
 webserver.logger = logger
 
-logger.info("Importing CSV data")
-webserver.data_ingestor = DataIngestor("./nutrition_activity_obesity_usa_subset.csv")
+# Registering the datasets the jobs can name: the default one and the ones in TP_DATASETS
+# ("name=path,..."). They are loaded on first use, the least recently used ones being unloaded
+# when the loaded datasets exceed TP_DATASET_MEMORY_BUDGET bytes
+webserver.datasets = DatasetRegistry(
+    {
+        DEFAULT_DATASET: "./nutrition_activity_obesity_usa_subset.csv",
+        **parse_datasets(os.environ.get("TP_DATASETS", ""))
+    },
+    logger,
+    os.environ.get("TP_DEFAULT_DATASET", DEFAULT_DATASET),
+    optional_int_env("TP_DATASET_MEMORY_BUDGET")
+)
+
+# Checking where the job statuses are kept, a SQLite database is shared by several web processes
+if 'TP_JOB_STORE' in os.environ:
+    logger.info("Using the SQLite job store %s", os.environ["TP_JOB_STORE"])
+    job_store = SQLiteJobStore(os.environ["TP_JOB_STORE"])
+else:
+    job_store = InMemoryJobStore()
 
+# The workers are started once the default dataset is loaded (see the startup steps below)
 logger.info("Initializing thread pool")
-webserver.tasks_runner = ThreadPool(num_of_threads, webserver.data_ingestor, logger)
+webserver.tasks_runner = ThreadPool(
+    0,
+    webserver.datasets,
+    logger,
+    JobScheduler(stretch=scheduler_stretch, batch_size=batch_size, batch_window=batch_window),
+    job_store
+)
+
+# Creating the autoscaler of the thread pool, if enabled
+webserver.autoscaler = None
+if autoscaling:
+    logger.info("Initializing thread pool autoscaler, between %s and %s workers", min_threads, max_threads)
+    webserver.autoscaler = PoolAutoscaler(
+        webserver.tasks_runner,
+        min_threads,
+        max_threads,
+        float(os.environ.get("TP_POOL_TARGET_WAIT", 0.5)),
+        float(os.environ.get("TP_POOL_IDLE_TIMEOUT", 30))
+    )
+
+# Caching the serialized (and compressed) results of the finished jobs, up to TP_RESULT_CACHE_BYTES
+webserver.result_cache = ResultCache(int(os.environ.get("TP_RESULT_CACHE_BYTES", 64 * 1024 * 1024)))
+
+logger.info("Initializing admission control")
+webserver.admission_control = AdmissionController(
+    webserver.tasks_runner.job_queue,
+    max_queue_depth,
+    max_in_flight,
+    max_jobs_per_client
+)
+
+# Starting the job broker for remote workers, if enabled
+if 'TP_BROKER_PORT' in os.environ:
+    logger.info("Initializing job broker")
+    webserver.broker = JobBroker(
+        (os.environ.get("TP_BROKER_HOST", "127.0.0.1"), int(os.environ["TP_BROKER_PORT"])),
+        webserver.tasks_runner,
+        logger,
+        float(os.environ.get("TP_HEARTBEAT_TIMEOUT", 10))
+    )
+    webserver.broker.start()
 
-webserver.job_counter = 1
+# Loading the default dataset (with its indexes) and starting the workers in the background, so the
+# HTTP server accepts connections right away. The jobs submitted meanwhile are queued, and
+# /api/ready reports the progress
+startup_steps = [
+    ("Importing CSV data", webserver.datasets.get),
+    (f"Starting {num_of_threads} workers", lambda: webserver.tasks_runner.add_workers(num_of_threads))
+]
+if webserver.autoscaler is not None:
+    startup_steps.append(("Starting the thread pool autoscaler", webserver.autoscaler.start))
+webserver.startup = StartupTask(startup_steps, logger)
+webserver.startup.start()
 
 from app import routes
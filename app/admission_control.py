@@ -0,0 +1,119 @@
+import math
+import time
+from collections import deque
+from threading import Lock
+
+
+class AdmissionController:
+    """
+    Admission control for job submissions, keeping the queue bounded under overload.
+
+    A job is rejected when the queue depth, the number of jobs in flight (queued or being
+    executed) or the number of unfinished jobs of the submitting client reached its limit.
+    Rejected clients are told when to retry, estimated from the rate at which the pool is
+    currently draining the queue.
+
+    Parameters:
+        scheduler (JobScheduler): The queue of the thread pool.
+        max_queue_depth (int): The maximum number of queued jobs, None for no limit.
+        max_in_flight (int): The maximum number of queued or running jobs, None for no limit.
+        max_jobs_per_client (int): The maximum number of unfinished jobs per client, None for no limit.
+
+    Attributes:
+        client_jobs (dict): The number of unfinished jobs of every client.
+    """
+
+    def __init__(self, scheduler, max_queue_depth=None, max_in_flight=None, max_jobs_per_client=None):
+        self.scheduler = scheduler
+        self.limits = {
+            "queue_depth": max_queue_depth,
+            "in_flight": max_in_flight,
+            "per_client": max_jobs_per_client
+        }
+        self.client_jobs = {}
+        self._job_clients = {}
+        self._completions = deque(maxlen=100)
+        self._lock = Lock()
+
+        scheduler.add_done_callback(self.job_done)
+
+    def drain_rate(self):
+        """
+        Returns:
+            float: The number of jobs finished per second, measured over the last completions,
+                None if not enough jobs were finished yet.
+        """
+        with self._lock:
+            if len(self._completions) < 2:
+                return None
+            elapsed = self._completions[-1] - self._completions[0]
+            return (len(self._completions) - 1) / elapsed if elapsed > 0 else None
+
+    def retry_after(self, excess_jobs):
+        """
+        Estimates the number of seconds until `excess_jobs` jobs will have been drained.
+
+        Parameters:
+            excess_jobs (int): The number of jobs which must finish before a new job is admitted.
+
+        Returns:
+            int: The number of seconds to wait, at least 1.
+        """
+        rate = self.drain_rate()
+        if rate is None:
+            return 1
+        return max(1, math.ceil(excess_jobs / rate))
+
+    def admit(self, job, client_id, priority=0):
+        """
+        Checks whether a new job may be queued and, if so, queues it and accounts it to its client.
+
+        The job is queued under the same lock as the checks, so concurrent submissions cannot all
+        pass the checks before any of them is counted in the queue. Its slots are released when
+        the queue reports it as finished (executed, failed, skipped or cancelled).
+
+        Parameters:
+            job (list): The job, having its ID on the third position.
+            client_id (str): The identifier of the submitting client.
+            priority (float): The client priority of the job, see JobScheduler.put().
+
+        Returns:
+            tuple:
+                - reason (str): Why the job was rejected, None if it was admitted.
+                - retry_after (int): The number of seconds after which to retry, None if admitted.
+        """
+        with self._lock:
+            checks = [
+                ("Queue is full", self.limits["queue_depth"], self.scheduler.qsize()),
+                ("Too many jobs in flight", self.limits["in_flight"], self.scheduler.unfinished_tasks),
+                ("Too many unfinished jobs for this client", self.limits["per_client"],
+                 self.client_jobs.get(client_id, 0))
+            ]
+            for reason, limit, current in checks:
+                if limit is not None and current >= limit:
+                    break
+            else:
+                self.client_jobs[client_id] = self.client_jobs.get(client_id, 0) + 1
+                self._job_clients[job[2]] = client_id
+                self.scheduler.put(job, priority)
+                return None, None
+
+        return reason, self.retry_after(current - limit + 1)
+
+    def job_done(self, job):
+        """
+        Releases the slot of a finished job and records its completion time.
+
+        Parameters:
+            job (list): The finished job, having its ID on the third position.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._completions.append(time.monotonic())
+            client_id = self._job_clients.pop(job[2], None)
+            if client_id is not None:
+                self.client_jobs[client_id] -= 1
+                if not self.client_jobs[client_id]:
+                    del self.client_jobs[client_id]
@@ -0,0 +1,327 @@
+import numpy as np
+from pandas import factorize
+
+
+def group_codes(keys):
+    """
+    Encodes the given key columns as a single integer group code per row.
+
+    Every key column is factorized separately (sorted), after which the codes are combined
+    in mixed radix, so the combined codes preserve the lexicographic order of the keys.
+    Rows having a missing value in any of the key columns are excluded, like pandas does.
+
+    Parameters:
+        keys (list): The key columns (array-like objects of the same length).
+
+    Returns:
+        tuple:
+            - codes (ndarray): The group code of every row, -1 for excluded rows.
+            - uniques (list): The sorted unique values of every key column.
+    """
+    codes = None
+    uniques = []
+    for key in keys:
+        key_codes, key_uniques = factorize(np.asarray(key), sort=True)
+        uniques.append(key_uniques)
+
+        if codes is None:
+            codes = key_codes.astype(np.int64)
+        else:
+            codes = np.where(
+                (codes < 0) | (key_codes < 0),
+                -1,
+                codes * len(key_uniques) + key_codes
+            )
+
+    return codes, uniques
+
+
+def decode_groups(group_ids, uniques):
+    """
+    Translates combined group codes back to group keys.
+
+    Parameters:
+        group_ids (ndarray): The combined codes of the groups.
+        uniques (list): The sorted unique values of every key column.
+
+    Returns:
+        list: A scalar key per group if there is only one key column, a tuple otherwise.
+    """
+    columns = []
+    for key_uniques in reversed(uniques):
+        columns.append(np.asarray(key_uniques)[group_ids % len(key_uniques)].tolist())
+        group_ids = group_ids // len(key_uniques)
+    columns.reverse()
+
+    if len(columns) == 1:
+        return columns[0]
+    return list(zip(*columns))
+
+
+# Aggregates supported by GroupStats, group_aggregate() and aggregate()
+AGGREGATES = ["mean", "min", "max", "count", "sum", "std", "median", "p90", "weighted_mean"]
+
+# Statistics returned by the *_stats routines
+SUMMARY_STATISTICS = ["count", "mean", "weighted_mean", "std", "min", "median", "p90", "max"]
+
+
+class GroupStats:
+    """
+    Per-group statistics of a value column, calculated in a single vectorized pass.
+
+    The count, sum and sum of squares of the non-missing values, as well as the (optionally
+    confidence-weighted) sums, are accumulated per group with `np.bincount`, and the minimums
+    and maximums with `np.fmin.at` / `np.fmax.at`, instead of building a sub-DataFrame for every
+    group. Every other statistic is derived from these totals, except for the percentiles, which
+    need the values of every group sorted; those are only sorted the first time a percentile
+    is requested. Missing values are skipped and groups without any value get NaN statistics,
+    the same way pandas does.
+
+    Parameters:
+        keys (list): The key columns to group by.
+        values (array-like): The values to be aggregated.
+        weights (array-like): Optional weights of the values, used by the weighted mean.
+
+    Attributes:
+        keys (list): The key of every observed group, ordered by group key.
+        totals (dict): The per-group accumulators ("count", "sum", "sum_squares", "min", "max",
+            "weighted_sum" and "weight_total").
+    """
+
+    def __init__(self, keys, values, weights=None):
+        codes, uniques = group_codes(keys)
+        values = np.asarray(values, dtype=np.float64)
+
+        # Drop rows with missing keys, then renumber the observed groups compactly
+        valid = codes >= 0
+        group_ids, inverse = np.unique(codes[valid], return_inverse=True)
+        values = values[valid]
+        self.keys = decode_groups(group_ids, uniques)
+
+        groups = len(group_ids)
+        present = ~np.isnan(values)
+        filled = np.where(present, values, 0.0)
+        self.totals = {
+            "count": np.bincount(inverse, weights=present, minlength=groups),
+            "sum": np.bincount(inverse, weights=filled, minlength=groups),
+            "sum_squares": np.bincount(inverse, weights=filled * filled, minlength=groups),
+            "min": np.full(groups, np.nan),
+            "max": np.full(groups, np.nan)
+        }
+        np.fmin.at(self.totals["min"], inverse, values)
+        np.fmax.at(self.totals["max"], inverse, values)
+
+        if weights is not None:
+            weights = np.asarray(weights, dtype=np.float64)[valid]
+            weights = np.where(present & (weights > 0), weights, 0.0)
+            self.totals["weighted_sum"] = np.bincount(inverse, weights=weights * filled, minlength=groups)
+            self.totals["weight_total"] = np.bincount(inverse, weights=weights, minlength=groups)
+
+        self._inverse = inverse
+        self._values = values
+        self._sorted = None
+
+    def count(self):
+        """
+        Returns:
+            ndarray: The number of non-missing values of every group.
+        """
+        return self.totals["count"].astype(np.int64)
+
+    def sum(self):
+        """
+        Returns:
+            ndarray: The sum of the values of every group.
+        """
+        return self.totals["sum"]
+
+    def min(self):
+        """
+        Returns:
+            ndarray: The minimum value of every group.
+        """
+        return self.totals["min"]
+
+    def max(self):
+        """
+        Returns:
+            ndarray: The maximum value of every group.
+        """
+        return self.totals["max"]
+
+    def mean(self):
+        """
+        Returns:
+            ndarray: The mean value of every group.
+        """
+        return _safe_divide(self.totals["sum"], self.totals["count"])
+
+    def std(self):
+        """
+        Returns:
+            ndarray: The sample standard deviation (ddof=1) of every group.
+        """
+        count = self.totals["count"]
+        squares = self.totals["sum_squares"] - _safe_divide(self.totals["sum"] ** 2, count)
+        variance = _safe_divide(np.maximum(squares, 0.0), count - 1)
+        return np.sqrt(variance)
+
+    def weighted_mean(self):
+        """
+        Returns:
+            ndarray: The weighted mean value of every group, NaN if no weights were given.
+        """
+        if "weight_total" not in self.totals:
+            return np.full(len(self.keys), np.nan)
+        return _safe_divide(self.totals["weighted_sum"], self.totals["weight_total"])
+
+    def percentile(self, percent):
+        """
+        Calculates an exact percentile of every group, interpolated linearly like pandas does.
+
+        Parameters:
+            percent (float): The percentile to calculate, between 0 and 100.
+
+        Returns:
+            ndarray: The percentile of every group.
+        """
+        if self._sorted is None:
+            # Sort by group, then by value (missing values are sorted last in each group)
+            order = np.lexsort((self._values, self._inverse))
+            starts = np.zeros(len(self.keys), dtype=np.int64)
+            starts[1:] = np.cumsum(np.bincount(self._inverse, minlength=len(self.keys)))[:-1]
+            self._sorted = (self._values[order], starts)
+        sorted_values, starts = self._sorted
+
+        count = self.totals["count"].astype(np.int64)
+        results = np.full(len(self.keys), np.nan)
+        groups = np.flatnonzero(count > 0)
+
+        position = percent / 100 * (count[groups] - 1)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.ceil(position).astype(np.int64)
+        lower_values = sorted_values[starts[groups] + lower]
+        upper_values = sorted_values[starts[groups] + upper]
+        results[groups] = lower_values + (upper_values - lower_values) * (position - lower)
+        return results
+
+    def get(self, function):
+        """
+        Returns a statistic of every group by name.
+
+        Parameters:
+            function (str): The statistic to return, one of AGGREGATES.
+
+        Returns:
+            ndarray: The statistic of every group.
+        """
+        if function == "median":
+            return self.percentile(50)
+        if function == "p90":
+            return self.percentile(90)
+        if function not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate '{function}'")
+        return getattr(self, function)()
+
+    def to_dict(self, function):
+        """
+        Returns a statistic of every group, keyed by group key.
+
+        Parameters:
+            function (str): The statistic to return, one of AGGREGATES.
+
+        Returns:
+            dict: The statistic of every group, ordered by group key.
+        """
+        return dict(zip(self.keys, self.get(function).tolist()))
+
+    def summary(self, functions=None):
+        """
+        Returns several statistics of every group, keyed by group key.
+
+        Parameters:
+            functions (list): The statistics to return, SUMMARY_STATISTICS by default.
+
+        Returns:
+            dict: For every group, a dictionary with the requested statistics.
+        """
+        functions = functions or SUMMARY_STATISTICS
+        columns = [self.get(function).tolist() for function in functions]
+        return {
+            key: dict(zip(functions, values))
+            for key, values in zip(self.keys, zip(*columns))
+        }
+
+
+def _safe_divide(numerator, denominator):
+    # Element-wise division giving NaN wherever the denominator is not positive
+    result = np.full(len(numerator), np.nan)
+    np.divide(numerator, denominator, out=result, where=denominator > 0)
+    return result
+
+
+def group_aggregate(keys, values, function="mean", weights=None):
+    """
+    Calculates an aggregate of the values of every group, see GroupStats.
+
+    Parameters:
+        keys (list): The key columns to group by.
+        values (array-like): The values to be aggregated.
+        function (str): The aggregate to calculate, one of AGGREGATES.
+        weights (array-like): Optional weights of the values, used by the weighted mean.
+
+    Returns:
+        dict: The aggregate of every observed group, ordered by group key.
+    """
+    return GroupStats(keys, values, weights).to_dict(function)
+
+
+def group_means(keys, values):
+    """
+    Calculates the mean of the values of every group, see GroupStats.
+
+    Parameters:
+        keys (list): The key columns to group by.
+        values (array-like): The values to be averaged.
+
+    Returns:
+        dict: The mean of every observed group, ordered by group key.
+    """
+    return group_aggregate(keys, values, "mean")
+
+
+def aggregate(values, function="mean", weights=None):
+    """
+    Calculates an aggregate of all the non-missing values.
+
+    Parameters:
+        values (array-like): The values to be aggregated.
+        function (str): The aggregate to calculate, one of AGGREGATES.
+        weights (array-like): Optional weights of the values, used by the weighted mean.
+
+    Returns:
+        float: The aggregate value, NaN if there are no values (except for "count").
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if function == "mean":
+        present = ~np.isnan(values)
+        count = np.count_nonzero(present)
+        return float(values[present].sum() / count) if count else float("nan")
+
+    result = GroupStats([np.zeros(len(values), dtype=np.int64)], values, weights).to_dict(function)
+    if not result:
+        return 0 if function == "count" else float("nan")
+    return result[0]
+
+
+def mean(values):
+    """
+    Calculates the mean of the non-missing values, NaN if there are none.
+
+    Parameters:
+        values (array-like): The values to be averaged.
+
+    Returns:
+        float: The mean value.
+    """
+    return aggregate(values, "mean")
@@ -0,0 +1,662 @@
+import json
+import math
+import time
+from queue import Empty, Queue
+from app import webserver
+from app.aggregator import AGGREGATES
+from app.data_ingestor import INDEXED_COLUMNS, RANGE_COLUMNS
+from app.job_store import FINAL_STATUSES
+from app.result_cache import choose_encoding, etag_matches
+
+# Maximum number of jobs in a bulk result request
+MAX_BULK_JOBS = 1000
+
+# Upper bound (and default) of the time a bulk result request may stream results, in seconds
+MAX_BULK_WAIT = 300.0
+
+# How often a streaming bulk result request checks the statuses of its unfinished jobs, in seconds
+BULK_POLL_INTERVAL = 1.0
+
+# Job types accepted by the server, with the request fields passed to the job, in order.
+# None means that all the request values are passed in the order they were received
+JOB_REQUESTS = {
+    "states_mean": None,
+    "state_mean": None,
+    "best5": None,
+    "worst5": None,
+    "global_mean": None,
+    "diff_from_mean": None,
+    "state_diff_from_mean": None,
+    "mean_by_category": None,
+    "state_mean_by_category": None,
+    "states_stats": None,
+    "stats_by_category": None,
+    "query": ["filters", "group_by", "aggregate"]
+}
+
+
+def is_number(value):
+    """
+    Checks whether a JSON value is a number (booleans excluded).
+
+    Args:
+        value: The value to be checked.
+
+    Returns:
+        bool: True if the value is an int or a float, False otherwise.
+    """
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def is_job_id(value):
+    """
+    Checks whether a JSON value can be a job ID (an integer, booleans excluded).
+
+    Args:
+        value: The value to be checked.
+
+    Returns:
+        bool: True if the value is an int, False otherwise.
+    """
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def is_scalar(value):
+    """
+    Checks whether a JSON value can be a column value in a filter (a string or a number).
+
+    Args:
+        value: The value to be checked.
+
+    Returns:
+        bool: True if the value is a string or a number, False otherwise.
+    """
+    return isinstance(value, str) or is_number(value)
+
+
+def validate_query(data):
+    """
+    Validates the body of a 'query' request.
+
+    Args:
+        data (dict): The request JSON.
+
+    Returns:
+        str: The reason why the query is invalid, or None if it is valid.
+    """
+    filters = data.get("filters") or {}
+    if not isinstance(filters, dict):
+        return "'filters' must be an object"
+    for column, condition in filters.items():
+        if column not in INDEXED_COLUMNS:
+            return f"Cannot filter by '{column}', allowed columns: {INDEXED_COLUMNS}"
+        if isinstance(condition, dict):
+            if column not in RANGE_COLUMNS or not set(condition) <= {"min", "max"}:
+                return f"Range filters are only allowed for {RANGE_COLUMNS}, as {{\"min\": ..., \"max\": ...}}"
+            if not all(is_number(bound) for bound in condition.values()):
+                return f"The bounds of the range filter on '{column}' must be numbers"
+        elif isinstance(condition, list):
+            if not all(is_scalar(value) for value in condition):
+                return f"The values of the filter on '{column}' must be strings or numbers"
+        elif not is_scalar(condition):
+            return f"The value of the filter on '{column}' must be a string, a number or a list of them"
+
+    group_by = data.get("group_by") or []
+    if not isinstance(group_by, list) or any(column not in INDEXED_COLUMNS for column in group_by):
+        return f"'group_by' must be a list of columns from {INDEXED_COLUMNS}"
+
+    if data.get("aggregate", "mean") not in AGGREGATES:
+        return f"'aggregate' must be one of {AGGREGATES}"
+
+    return None
+
+
+def validate_request(request_name, data, priority, deadline, dataset):
+    """
+    Validates the body of a job request.
+
+    Args:
+        request_name (str): The name of the request.
+        data (dict): The request JSON, without the scheduling fields.
+        priority: The "priority" scheduling field.
+        deadline: The "deadline" scheduling field.
+        dataset: The "dataset" field.
+
+    Returns:
+        str: The reason why the request is invalid, or None if it is valid.
+    """
+    if not isinstance(dataset, str) or dataset not in webserver.datasets:
+        return f"Unknown dataset '{dataset}', available datasets: {list(webserver.datasets.paths)}"
+    # Python's JSON parser accepts NaN and Infinity, which would break the order of the queue
+    if not is_number(priority) or not math.isfinite(priority):
+        return "'priority' must be a finite number"
+    if deadline is not None and not (is_number(deadline) and math.isfinite(deadline) and deadline > 0):
+        return "'deadline' must be a positive number of seconds"
+    if request_name == "query":
+        return validate_query(data)
+    return None
+
+
+def submit_job(request_name, body, client_id):
+    """
+    Registers a request as a job in the thread pool's queue, if the thread pool is running.
+
+    Every request may name the dataset it is about in the optional "dataset" field (the default
+    dataset otherwise), and may carry the optional scheduling fields, which are not passed to the job:
+        - "priority": a number, higher values are run earlier;
+        - "deadline": a number of seconds after which the job is no longer worth running. If it is
+          still queued by then, the job is skipped and marked as "expired".
+    Jobs exceeding the admission control limits are rejected with HTTP 429 and a Retry-After header.
+
+    Args:
+        request_name (str): The name of the request, one of JOB_REQUESTS.
+        body (dict): The request JSON.
+        client_id (str): The identifier of the submitting client.
+
+    Returns:
+        tuple:
+            - result (dict): The response JSON.
+            - status_code (int): The HTTP status code.
+            - headers (dict): The additional HTTP headers.
+    """
+    if not webserver.tasks_runner.is_running():
+        result = {"status": "Shutting down"}
+        webserver.logger.info("Request received, but the thread pool was shut down, returning %s to client", result)
+        return result, 200, {}
+
+    if not isinstance(body, dict):
+        result = {"status": "error", "reason": "The request body must be a JSON object"}
+        webserver.logger.info("Invalid request, returning %s to client", result)
+        return result, 200, {}
+
+    # Get request data, separating the dataset and the scheduling options from the query
+    data = dict(body)
+    dataset = data.pop("dataset", webserver.datasets.default)
+    priority = data.pop("priority", 0)
+    deadline = data.pop("deadline", None)
+    webserver.logger.info("Request '%s' received, dataset: %s, data: %s, priority: %s, deadline: %s",
+                          request_name, dataset, data, priority, deadline)
+
+    # Validate request data
+    reason = validate_request(request_name, data, priority, deadline, dataset)
+    if reason is not None:
+        result = {"status": "error", "reason": reason}
+        webserver.logger.info("Invalid request, returning %s to client", result)
+        return result, 200, {}
+
+    # Allocate the job ID (the job is visible as "running" before any worker may take it)
+    job_status = webserver.tasks_runner.job_status
+    job_id = job_status.add_job("running")
+    fields = JOB_REQUESTS[request_name]
+    if fields is not None:
+        data = {field: data.get(field) for field in fields}
+    if deadline is not None:
+        deadline += time.time()
+    job = [request_name, list(data.values()), job_id, deadline, dataset]
+
+    # Register job if it is within the queue limits. Don't wait for task to finish
+    reason, retry_after = webserver.admission_control.admit(job, client_id, priority)
+    if reason is not None:
+        del job_status[job_id]
+        result = {"status": "error", "reason": reason}
+        webserver.logger.info("Rejected request from %s, returning %s to client, retry after %s s",
+                              client_id, result, retry_after)
+        return result, 429, {"Retry-After": str(retry_after)}
+
+    # Notify workers about incoming job
+    webserver.logger.info("Queued the job with id %s, notifying available worker", job_id)
+    with webserver.tasks_runner.condition:
+        webserver.tasks_runner.condition.notify()
+
+    # Return associated job_id
+    result = {
+        "status": "queued",
+        "job_id": job_id
+    }
+    webserver.logger.info("Returning %s to client", result)
+    return result, 200, {}
+
+
+def num_jobs():
+    """
+    Returns the number of jobs currently running.
+
+    Returns:
+        dict: The response JSON.
+    """
+    webserver.logger.info("Request received")
+
+    result = {
+        "status": "done",
+        "data": webserver.tasks_runner.job_status.count("running")
+    }
+
+    webserver.logger.info("Returning %s to client", result)
+    return result
+
+
+def jobs():
+    """
+    Returns the status of all jobs.
+
+    Returns:
+        dict: The response JSON.
+    """
+    webserver.logger.info("Request received")
+
+    jobs_status = []
+    for current_id, current_status in webserver.tasks_runner.job_status.items():
+        jobs_status.append({f"job_id_{current_id}": current_status})
+    result = {
+        "status": "done",
+        "data": jobs_status
+    }
+
+    webserver.logger.info("Returning %s to client", result)
+    return result
+
+
+def pool_status():
+    """
+    Returns the size of the thread pool, its bounds and its last resize events.
+
+    Returns:
+        dict: The response JSON.
+    """
+    webserver.logger.info("Request received")
+
+    if webserver.autoscaler is not None:
+        data = webserver.autoscaler.status()
+    else:
+        # Fixed size pool
+        threads = webserver.tasks_runner.num_of_threads()
+        queued = webserver.tasks_runner.job_queue.qsize()
+        data = {
+            "threads": threads,
+            "min_threads": threads,
+            "max_threads": threads,
+            "queued": queued,
+            "busy": max(0, webserver.tasks_runner.job_queue.unfinished_tasks - queued),
+            "events": []
+        }
+    result = {
+        "status": "done",
+        "data": data
+    }
+
+    webserver.logger.info("Returning %s to client", result)
+    return result
+
+
+def datasets_status():
+    """
+    Returns the datasets the jobs can name and which of them are loaded.
+
+    Returns:
+        dict: The response JSON.
+    """
+    webserver.logger.info("Request received")
+
+    result = {
+        "status": "done",
+        "data": webserver.datasets.status()
+    }
+
+    webserver.logger.info("Returning %s to client", result)
+    return result
+
+
+def readiness():
+    """
+    Returns whether the server is ready to execute jobs, with the progress of its startup.
+
+    Jobs submitted before readiness are accepted and queued, they run once the data is loaded.
+
+    Returns:
+        tuple:
+            - result (dict): The response JSON.
+            - status_code (int): 200 if the server is ready, 503 otherwise.
+    """
+    data = webserver.startup.status()
+    if data["ready"]:
+        return {"status": "ready", "data": data}, 200
+    return {"status": "failed" if data["error"] else "starting", "data": data}, 503
+
+
+def liveness():
+    """
+    Returns whether the server is alive, i.e. its startup did not fail.
+
+    Returns:
+        tuple:
+            - result (dict): The response JSON.
+            - status_code (int): 200 if the server is alive, 503 otherwise.
+    """
+    error = webserver.startup.status()["error"]
+    if error is not None:
+        return {"status": "failed", "reason": error}, 503
+    return {"status": "alive"}, 200
+
+
+def is_valid_job_id(job_id):
+    """
+    Checks whether a job with the given ID was registered.
+
+    Args:
+        job_id (int): The ID of the job.
+
+    Returns:
+        bool: True if the job exists, False otherwise.
+    """
+    return job_id in webserver.tasks_runner.job_status
+
+
+def cancel_job(job_id):
+    """
+    Cancels a job which was not taken by a worker yet.
+
+    Args:
+        job_id (int): The ID of the job to be cancelled.
+
+    Returns:
+        dict: The response JSON.
+    """
+    webserver.logger.info("Request received, cancelling job with id %s", job_id)
+
+    # Check if job_id is valid
+    if not is_valid_job_id(job_id):
+        result = {
+            "status": "error",
+            "reason": "Invalid job_id"
+        }
+        webserver.logger.info("Returning %s to client", result)
+        return result
+
+    # Only the jobs still waiting in the queue can be cancelled. The status is set before the
+    # job is reported as finished, so the done callbacks (e.g. streamed results) see it
+    job = webserver.tasks_runner.job_queue.cancel(job_id)
+    if job is not None:
+        webserver.tasks_runner.job_status[job_id] = "cancelled"
+        webserver.tasks_runner.job_queue.task_done(job)
+        result = {
+            "status": "cancelled",
+            "job_id": job_id
+        }
+    else:
+        job_status = webserver.tasks_runner.job_status
+        status = job_status[job_id]
+        if status != "running":
+            reason = f"Job is already {status}"
+        elif job_status.shared:
+            # Another process sharing the job store may hold the job in its own queue
+            reason = "Job is already being executed, or was submitted to another process (only the " \
+                     "process which received the job can cancel it)"
+        else:
+            reason = "Job is already being executed"
+        result = {
+            "status": "error",
+            "reason": reason
+        }
+
+    webserver.logger.info("Returning %s to client", result)
+    return result
+
+
+def job_result_entry(job_id):
+    """
+    Returns the result of a job, or its status if there is no result (yet), without logging.
+
+    Args:
+        job_id (int): The ID of the job for which the result is requested.
+
+    Returns:
+        dict: The response JSON.
+    """
+    # Check if job_id is valid
+    if not is_valid_job_id(job_id):
+        return {
+            "status": "error",
+            "reason": "Invalid job_id"
+        }
+
+    # Check if job_id is done and return the data
+    status = webserver.tasks_runner.job_status[job_id]
+    if status == "done":
+        with open(f"./results/job_id_{job_id}.json", encoding="utf-8") as file:
+            data = json.load(file)
+        return {
+            "status": "done",
+            "data": data
+        }
+
+    # The details of a failed job are in the server log
+    if status == "error":
+        return {
+            "status": "error",
+            "reason": "The job failed"
+        }
+
+    # Jobs dropped without being executed have no result, the others are still running
+    return {"status": status}
+
+
+def job_result(job_id):
+    """
+    Returns the result of a job, or its status if there is no result (yet).
+
+    Args:
+        job_id (int): The ID of the job for which the result is requested.
+
+    Returns:
+        dict: The response JSON.
+    """
+    webserver.logger.info("Request received, requesting status of job with id %s", job_id)
+
+    result = job_result_entry(job_id)
+    webserver.logger.info("Returning %s to client", result)
+    return result
+
+
+def parse_bulk_request(body):
+    """
+    Validates the body of a bulk result request.
+
+    The jobs are given as a list of IDs ("job_ids"), as an inclusive range ("from" and "to") or
+    both. With "stream", the results are streamed as the jobs finish, for at most "wait" seconds.
+
+    Args:
+        body (dict): The request JSON.
+
+    Returns:
+        tuple:
+            - job_ids (list): The requested job IDs, in order and without duplicates.
+            - wait (float): The maximum number of seconds to stream the results, None for no streaming.
+            - reason (str): The reason why the request is invalid, or None if it is valid.
+    """
+    if not isinstance(body, dict):
+        return None, None, "The request body must be a JSON object"
+
+    job_ids = body.get("job_ids") or []
+    if not isinstance(job_ids, list) or not all(is_job_id(job_id) for job_id in job_ids):
+        return None, None, "'job_ids' must be a list of job IDs"
+    if "from" in body or "to" in body:
+        first, last = body.get("from"), body.get("to")
+        if not is_job_id(first) or not is_job_id(last) or first > last:
+            return None, None, "'from' and 'to' must be job IDs, 'from' not greater than 'to'"
+        if last - first >= MAX_BULK_JOBS:
+            return None, None, f"At most {MAX_BULK_JOBS} jobs can be requested at once"
+        job_ids = job_ids + list(range(first, last + 1))
+
+    job_ids = list(dict.fromkeys(job_ids))
+    if not job_ids:
+        return None, None, "No job requested, expected 'job_ids' or 'from' and 'to'"
+    if len(job_ids) > MAX_BULK_JOBS:
+        return None, None, f"At most {MAX_BULK_JOBS} jobs can be requested at once"
+
+    if not body.get("stream", False):
+        return job_ids, None, None
+    wait = body.get("wait", MAX_BULK_WAIT)
+    if not is_number(wait) or wait < 0:
+        return None, None, "'wait' must be a non-negative number of seconds"
+    return job_ids, min(wait, MAX_BULK_WAIT), None
+
+
+def bulk_results(job_ids):
+    """
+    Returns, in one response, the results of the finished jobs and the status of the other ones.
+
+    Args:
+        job_ids (list): The IDs of the jobs.
+
+    Returns:
+        dict: The response JSON, with the result (or status) of every job as "data".
+    """
+    webserver.logger.info("Request received, requesting results of %s jobs", len(job_ids))
+
+    result = {
+        "status": "done",
+        "data": {f"job_id_{job_id}": job_result_entry(job_id) for job_id in job_ids}
+    }
+
+    webserver.logger.info("Returning the results of %s jobs to client", len(job_ids))
+    return result
+
+
+def stream_results(job_ids, wait, stop=None):
+    """
+    Streams the results of jobs as newline-delimited JSON, each job as soon as it is finished.
+
+    The jobs already finished (or invalid) are sent first. The other ones are sent as they finish,
+    until all of them are finished or `wait` seconds have passed; the ones still unfinished are
+    then sent with their current status, to be requested again. Every line is the result (or
+    status) of a job, as returned by /api/get_results/<job_id>, plus its "job_id".
+
+    The jobs finished by this process are reported by the JobScheduler's done callbacks, while
+    the statuses are also checked every BULK_POLL_INTERVAL seconds, for the jobs finished by
+    other processes sharing the job store (or cancelled meanwhile).
+
+    Args:
+        job_ids (list): The IDs of the jobs.
+        wait (float): The maximum number of seconds to wait for the unfinished jobs.
+        stop (Event): Ends the wait early when set (e.g. the client disconnected), None if the
+            wait is only bounded by `wait`.
+
+    Yields:
+        bytes: A line of the response body.
+    """
+    webserver.logger.info("Request received, streaming results of %s jobs for at most %s s",
+                          len(job_ids), wait)
+    deadline = time.monotonic() + wait
+    pending = set(job_ids)
+    finished = Queue()
+
+    def job_done(job):
+        if job[2] in pending:
+            finished.put(job[2])
+
+    def collect(job_id):
+        entry = job_result_entry(job_id)
+        if entry["status"] == "running":
+            return None
+        pending.discard(job_id)
+        return json.dumps({"job_id": job_id, **entry}, sort_keys=True).encode("utf-8") + b"\n"
+
+    # Subscribed before checking the statuses, so no job can finish unnoticed
+    job_queue = webserver.tasks_runner.job_queue
+    job_queue.add_done_callback(job_done)
+    try:
+        for job_id in job_ids:
+            line = collect(job_id)
+            if line is not None:
+                yield line
+
+        while pending and time.monotonic() < deadline and not (stop is not None and stop.is_set()):
+            try:
+                timeout = max(0.0, min(BULK_POLL_INTERVAL, deadline - time.monotonic()))
+                candidates = [finished.get(timeout=timeout)]
+            except Empty:
+                candidates = [job_id for job_id in job_ids if job_id in pending]
+            for job_id in candidates:
+                line = collect(job_id) if job_id in pending else None
+                if line is not None:
+                    yield line
+    finally:
+        job_queue.remove_done_callback(job_done)
+
+    for job_id in job_ids:
+        if job_id in pending:
+            yield json.dumps({"job_id": job_id, "status": "running"}).encode("utf-8") + b"\n"
+    webserver.logger.info("Streamed the results of %s jobs, %s unfinished",
+                          len(job_ids), len(pending))
+
+
+def job_result_response(job_id, accept_encoding="", if_none_match=""):
+    """
+    Returns the HTTP response for the result of a job, with caching and compression.
+
+    The results of the jobs in a final status never change: they are served with a strong ETag (a
+    hash of the body), a request whose If-None-Match matches the ETag gets an empty 304 response,
+    and large bodies are compressed with gzip or deflate when the client accepts it. The job IDs
+    start again from 1 when the server restarts (unless the job store is persistent), so the same
+    URL may later hold another result: the responses are marked "no-cache", caches revalidate
+    them on every use and the ETag turns those requests into cheap 304 responses.
+    The serialized and compressed bodies are kept in the ResultCache, so polling a finished job
+    neither reads the results file nor serializes or compresses the result again.
+
+    Args:
+        job_id (int): The ID of the job for which the result is requested.
+        accept_encoding (str): The Accept-Encoding header of the request.
+        if_none_match (str): The If-None-Match header of the request.
+
+    Returns:
+        tuple:
+            - body (bytes): The response body (JSON, possibly compressed), empty for 304.
+            - status_code (int): The HTTP status code.
+            - headers (dict): The HTTP headers.
+    """
+    if webserver.tasks_runner.job_status.get(job_id) not in FINAL_STATUSES:
+        body = json.dumps(job_result(job_id), sort_keys=True).encode("utf-8")
+        return body, 200, {"Content-Type": "application/json", "Cache-Control": "no-cache"}
+
+    body, etag, encoding = webserver.result_cache.get(
+        job_id,
+        choose_encoding(accept_encoding),
+        lambda: json.dumps(job_result(job_id), sort_keys=True).encode("utf-8")
+    )
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding"
+    }
+    if etag_matches(if_none_match, etag):
+        webserver.logger.info("Result of job with id %s not modified, returning 304 to client", job_id)
+        return b"", 304, headers
+
+    headers["Content-Type"] = "application/json"
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    webserver.logger.info("Returning cached result of job with id %s (%s bytes, encoding %s) to client",
+                          job_id, len(body), encoding)
+    return body, 200, headers
+
+
+def graceful_shutdown():
+    """
+    Initiates a graceful shutdown of the thread pool.
+
+    Returns:
+        dict: The response JSON.
+    """
+    webserver.logger.info("Request received")
+
+    if webserver.tasks_runner.is_running():
+        webserver.tasks_runner.shutdown()
+
+        # Notify workers about shutdown event
+        webserver.logger.info("Notifying all workers about shutdown event")
+        with webserver.tasks_runner.condition:
+            webserver.tasks_runner.condition.notify_all()
+
+    result = {"status": "Shutting down"}
+    webserver.logger.info("Thread pool is shutting down, returning %s to client", result)
+    return result
@@ -0,0 +1,288 @@
+import asyncio
+import json
+import re
+from threading import Event
+from urllib.parse import parse_qs
+from app import webserver
+from app import api
+from app.job_store import FINAL_STATUSES
+
+# Upper bound of the long-poll wait accepted from clients, in seconds
+MAX_WAIT = 30.0
+
+
+class JobWaiters:
+    """
+    Lets coroutines wait for jobs to finish without blocking a thread.
+
+    Every waiting client owns an asyncio future, resolved from the worker threads (through
+    `call_soon_threadsafe()`) when the JobScheduler reports the job as finished.
+
+    Attributes:
+        loop (AbstractEventLoop): The event loop of the ASGI server, None until the first request.
+        waiters (dict): The futures waiting for every job ID.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.waiters = {}
+
+    def start(self, loop):
+        """
+        Binds the waiters to the event loop and subscribes to the finished jobs.
+
+        Parameters:
+            loop (AbstractEventLoop): The event loop of the ASGI server.
+
+        Returns:
+            None
+        """
+        self.loop = loop
+        webserver.tasks_runner.job_queue.add_done_callback(self.job_done)
+
+    def job_done(self, job):
+        """
+        Called from the worker threads for every finished job.
+
+        Parameters:
+            job (list): The finished job.
+
+        Returns:
+            None
+        """
+        self.loop.call_soon_threadsafe(self._wake, job[2])
+
+    def _wake(self, job_id):
+        for future in self.waiters.pop(job_id, ()):
+            if not future.done():
+                future.set_result(None)
+
+    async def wait(self, job_id, timeout):
+        """
+        Waits until a job reaches a final status or the timeout expires.
+
+        Parameters:
+            job_id (int): The ID of the job.
+            timeout (float): The maximum number of seconds to wait.
+
+        Returns:
+            None
+        """
+        future = self.loop.create_future()
+        self.waiters.setdefault(job_id, set()).add(future)
+        try:
+            # The job may have finished before the future was registered
+            if webserver.tasks_runner.job_status.get(job_id) in FINAL_STATUSES:
+                return
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            futures = self.waiters.get(job_id)
+            if futures is not None:
+                futures.discard(future)
+                if not futures:
+                    del self.waiters[job_id]
+
+
+job_waiters = JobWaiters()
+
+
+async def read_body(receive):
+    """
+    Reads the whole body of an HTTP request.
+    """
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    return body
+
+
+async def wait_for_disconnect(receive):
+    """
+    Waits until the client of an HTTP request, whose body was already read, disconnects.
+    """
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def send_body(send, body, status_code, headers):
+    """
+    Sends an HTTP response with an already serialized body.
+    """
+    raw_headers = [(b"content-length", str(len(body)).encode("latin-1"))]
+    for name, value in headers.items():
+        raw_headers.append((name.lower().encode("latin-1"), value.encode("latin-1")))
+
+    await send({"type": "http.response.start", "status": status_code, "headers": raw_headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_json(send, result, status_code=200, headers=None):
+    """
+    Sends a JSON response, serialized the same way the Flask front-end does.
+    """
+    body = json.dumps(result, sort_keys=True).encode("utf-8")
+    await send_body(send, body, status_code, {"Content-Type": "application/json", **(headers or {})})
+
+
+async def get_results(scope, job_id):
+    """
+    Returns the response for the result of a job, cached and compressed like in the Flask front-end.
+    With the "wait" query parameter (seconds, at most MAX_WAIT), the request is long-polled:
+    it only returns when the job finished or the wait expired.
+
+    Returns:
+        tuple: The response body, the HTTP status code and the HTTP headers.
+    """
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    try:
+        wait = min(float(query.get("wait", ["0"])[0]), MAX_WAIT)
+    except ValueError:
+        wait = 0.0
+
+    if wait > 0 and api.is_valid_job_id(job_id):
+        await job_waiters.wait(job_id, wait)
+
+    # Reading the result file and compressing it are blocking, keep them off the event loop
+    headers = dict(scope.get("headers", []))
+    return await asyncio.to_thread(
+        api.job_result_response,
+        job_id,
+        headers.get(b"accept-encoding", b"").decode("latin-1"),
+        headers.get(b"if-none-match", b"").decode("latin-1")
+    )
+
+
+async def bulk_results(receive, send):
+    """
+    Sends the results of several jobs at once, streamed as newline-delimited JSON if requested.
+
+    The streamed lines come from the same blocking generator as in the Flask front-end
+    (`api.stream_results()`), iterated in an executor thread so the event loop is never blocked.
+    If the client disconnects meanwhile, the generator stops waiting (within BULK_POLL_INTERVAL
+    seconds) and is closed, which unsubscribes it from the finished jobs.
+    """
+    try:
+        body = json.loads(await read_body(receive) or b"null")
+    except ValueError:
+        body = None
+
+    job_ids, wait, reason = api.parse_bulk_request(body)
+    if reason is not None:
+        await send_json(send, {"status": "error", "reason": reason})
+        return
+    if wait is None:
+        await send_json(send, await asyncio.to_thread(api.bulk_results, job_ids))
+        return
+
+    stop = Event()
+    lines = api.stream_results(job_ids, wait, stop)
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    line = None
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"application/x-ndjson")]
+    })
+    try:
+        while True:
+            line = asyncio.ensure_future(asyncio.to_thread(next, lines, None))
+            await asyncio.wait([line, disconnected], return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done() or line.result() is None:
+                break
+            await send({"type": "http.response.body", "body": line.result(), "more_body": True})
+        if not disconnected.done():
+            await send({"type": "http.response.body", "body": b""})
+    finally:
+        # Stops the generator and, once its thread left it, unsubscribes it from the finished jobs
+        stop.set()
+        disconnected.cancel()
+        if line is not None and not line.done():
+            await asyncio.wait([line])
+        lines.close()
+
+
+async def handle_request(scope, receive):
+    """
+    Routes an HTTP request to the same API implementation used by the Flask front-end.
+
+    Returns:
+        tuple: The response JSON, the HTTP status code and the additional headers.
+    """
+    method = scope["method"]
+    path = scope["path"]
+
+    if method == "GET" and path == "/api/num_jobs":
+        return api.num_jobs(), 200, {}
+    if method == "GET" and path == "/api/jobs":
+        return api.jobs(), 200, {}
+    if method == "GET" and path == "/api/pool":
+        return api.pool_status(), 200, {}
+    if method == "GET" and path == "/api/datasets":
+        return api.datasets_status(), 200, {}
+    if method == "GET" and path == "/api/ready":
+        return (*api.readiness(), {})
+    if method == "GET" and path == "/api/live":
+        return (*api.liveness(), {})
+    if method == "GET" and path == "/api/graceful_shutdown":
+        return api.graceful_shutdown(), 200, {}
+
+    match = re.fullmatch(r"/api/jobs/(\d+)", path)
+    if method == "DELETE" and match:
+        return api.cancel_job(int(match.group(1))), 200, {}
+
+    match = re.fullmatch(r"/api/(\w+)", path)
+    if method == "POST" and match and match.group(1) in api.JOB_REQUESTS:
+        try:
+            body = json.loads(await read_body(receive) or b"null")
+        except ValueError:
+            body = None
+
+        headers = dict(scope.get("headers", []))
+        client_id = headers.get(b"x-client-id", b"").decode("latin-1")
+        if not client_id and scope.get("client"):
+            client_id = scope["client"][0]
+        # Allocating the job ID (possibly a SQLite write) and the admission lock may block
+        return await asyncio.to_thread(api.submit_job, match.group(1), body, client_id)
+
+    return {"status": "error", "reason": "Not found"}, 404, {}
+
+
+async def application(scope, receive, send):
+    """
+    Asyncio (ASGI) front-end serving the same /api/* contract as the Flask routes.
+
+    Submissions, status checks and result fetches run on the event loop, while the jobs are
+    computed by the existing thread pool. Clients waiting for a result (long-poll) only cost a
+    coroutine. Can be served by any ASGI server, e.g. `uvicorn app.asgi:application`.
+    """
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    if scope["type"] != "http":
+        return
+
+    if job_waiters.loop is None:
+        job_waiters.start(asyncio.get_running_loop())
+
+    match = re.fullmatch(r"/api/get_results/(\d+)", scope["path"])
+    if scope["method"] == "GET" and match:
+        await send_body(send, *await get_results(scope, int(match.group(1))))
+        return
+
+    if scope["method"] == "POST" and scope["path"] == "/api/get_results":
+        await bulk_results(receive, send)
+        return
+
+    result, status_code, headers = await handle_request(scope, receive)
+    await send_json(send, result, status_code, headers)
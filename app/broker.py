@@ -0,0 +1,347 @@
+import json
+import math
+import socket
+import socketserver
+import time
+from itertools import count
+from threading import Lock, Thread
+
+try:
+    from .task_runner import save_result, skip_job
+except ImportError:
+    from task_runner import save_result, skip_job
+
+# How many times a job is put back in the queue after its workers died, before it is marked as failed
+MAX_REQUEUES = 3
+
+
+def send_message(stream, message):
+    """
+    Sends a message of the broker protocol: a JSON object on a single line.
+
+    Parameters:
+        stream (file): The writable binary stream of the connection.
+        message (dict): The message.
+
+    Returns:
+        None
+    """
+    stream.write(json.dumps(message).encode("utf-8") + b"\n")
+    stream.flush()
+
+
+def receive_message(stream):
+    """
+    Receives a message of the broker protocol.
+
+    Parameters:
+        stream (file): The readable binary stream of the connection.
+
+    Returns:
+        dict: The message, None if the connection was closed.
+    """
+    line = stream.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+def is_seconds(value):
+    """
+    Returns:
+        bool: Whether a JSON value is a finite, non-negative number of seconds (booleans excluded).
+    """
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        return False
+    return math.isfinite(value) and value >= 0
+
+
+def invalid_message(message):
+    """
+    Checks the shape of a message received from a worker, before it changes any job.
+
+    Parameters:
+        message: The decoded JSON message.
+
+    Returns:
+        str: The reason why the message is invalid, or None if it is valid.
+    """
+    if not isinstance(message, dict) or not isinstance(message.get("type"), str):
+        return "Expected a JSON object with a 'type'"
+    if message["type"] == "pull" and not is_seconds(message.get("wait", 1.0)):
+        return "'wait' must be a number of seconds"
+    if message["type"] == "result":
+        if not isinstance(message.get("job_id"), int) or isinstance(message["job_id"], bool):
+            return "'job_id' must be a job ID"
+        if "error" not in message and "result" not in message:
+            return "Expected a 'result' or an 'error'"
+        if message.get("duration") is not None and not is_seconds(message["duration"]):
+            return "'duration' must be a number of seconds"
+    return None
+
+
+class BrokerRequestHandler(socketserver.StreamRequestHandler):
+    """
+    Serves the connection of a remote worker: every message received gets exactly one reply.
+
+    Messages sent by workers:
+        - {"type": "pull", "wait": seconds}: asks for a job. The reply is {"type": "job", "job": job},
+          {"type": "idle"} if no job was queued during the wait, or {"type": "shutdown"}.
+        - {"type": "result", "job_id": id, "result": result, "duration": seconds}: pushes the result of
+          a job. The reply is {"type": "ok"}, or {"type": "error"} if the job was re-queued meanwhile.
+        - {"type": "result", "job_id": id, "error": message}: reports that a job failed, which is then
+          marked as "error". The replies are the same as above.
+
+    A malformed message gets the reply {"type": "error", "reason": reason} and changes no job.
+        - {"type": "heartbeat"}: keeps the leases of the worker alive. The reply is {"type": "ok"}.
+    """
+
+    def handle(self):
+        broker = self.server
+        worker_id = broker.register_worker(self.connection)
+        try:
+            while True:
+                message = receive_message(self.rfile)
+                if message is None:
+                    break
+
+                reply = broker.dispatch(worker_id, message)
+                send_message(self.wfile, reply)
+                if reply["type"] == "shutdown":
+                    break
+        except (OSError, ValueError) as error:
+            broker.logger.info("Connection of worker %s failed: %s", worker_id, error)
+        finally:
+            broker.unregister_worker(worker_id)
+
+
+class JobBroker(socketserver.ThreadingTCPServer):
+    """
+    A TCP job broker letting remote worker processes execute the jobs of the thread pool.
+
+    Remote workers pull jobs from the same JobScheduler as the local TaskRunner threads, compute
+    them against their own copy of the dataset and push the results back, which the broker saves
+    on disk and marks as done. The jobs handed to a worker are leased to it: if the worker does not
+    send any message (e.g. heartbeats) for `heartbeat_timeout` seconds, or if its connection drops,
+    its leased jobs are put back in the queue, at most `max_requeues` times per job; a job whose
+    workers keep dying is then marked as "error", so it cannot take the whole fleet down.
+
+    Parameters:
+        address (tuple): The (host, port) address to listen on.
+        thread_pool (ThreadPool): The thread pool whose jobs are distributed.
+        logger (Logger): An object providing access to the logger.
+        heartbeat_timeout (float): The number of seconds after which a silent worker is considered dead.
+        max_requeues (int): How many times a job is re-queued before it is marked as "error".
+
+    Attributes:
+        workers (dict): For every connected worker, its connection, last activity time and leased jobs.
+        requeues (dict): How many times each unfinished job was re-queued.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, thread_pool, logger, heartbeat_timeout=10.0, max_requeues=MAX_REQUEUES):
+        super().__init__(address, BrokerRequestHandler)
+        self.thread_pool = thread_pool
+        self.logger = logger
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_requeues = max_requeues
+        self.workers = {}
+        self.requeues = {}
+        self._worker_ids = count(1)
+        self._lock = Lock()
+
+    def start(self):
+        """
+        Starts serving workers and monitoring their heartbeats, in background threads.
+
+        Returns:
+            None
+        """
+        Thread(target=self.serve_forever, name="JobBroker", daemon=True).start()
+        Thread(target=self.monitor_workers, name="JobBrokerMonitor", daemon=True).start()
+        self.logger.info("Job broker listening on %s:%s", *self.server_address[:2])
+
+    def register_worker(self, connection):
+        """
+        Registers a newly connected worker.
+
+        Parameters:
+            connection (socket): The connection of the worker.
+
+        Returns:
+            int: The ID assigned to the worker.
+        """
+        with self._lock:
+            worker_id = next(self._worker_ids)
+            self.workers[worker_id] = {
+                "connection": connection,
+                "last_seen": time.monotonic(),
+                "leases": {}
+            }
+        self.logger.info("Worker %s connected from %s", worker_id, connection.getpeername())
+        return worker_id
+
+    def unregister_worker(self, worker_id):
+        """
+        Removes a worker, putting back in the queue all the jobs leased to it, or marking them as
+        "error" if they were already re-queued `max_requeues` times.
+
+        Parameters:
+            worker_id (int): The ID of the worker.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            worker = self.workers.pop(worker_id, None)
+            if worker is None:
+                return
+            requeued, failed = [], []
+            for job in worker["leases"].values():
+                self.requeues[job[2]] = self.requeues.get(job[2], 0) + 1
+                if self.requeues[job[2]] > self.max_requeues:
+                    del self.requeues[job[2]]
+                    failed.append(job)
+                else:
+                    requeued.append(job)
+
+        for job in failed:
+            self.logger.error("Job with id %s of worker %s was re-queued too many times", job[2], worker_id)
+            self.thread_pool.job_status[job[2]] = "error"
+            self.thread_pool.job_queue.task_done(job)
+        for job in requeued:
+            self.logger.info("Re-queueing job with id %s of worker %s", job[2], worker_id)
+            self.thread_pool.job_queue.requeue(job)
+        if requeued:
+            with self.thread_pool.condition:
+                self.thread_pool.condition.notify(len(requeued))
+        self.logger.info("Worker %s disconnected", worker_id)
+
+    def monitor_workers(self):
+        """
+        Disconnects the workers which did not send any message for `heartbeat_timeout` seconds.
+
+        Returns:
+            None
+        """
+        while True:
+            time.sleep(self.heartbeat_timeout / 2)
+            now = time.monotonic()
+            with self._lock:
+                stale = [
+                    worker_id for worker_id, worker in self.workers.items()
+                    if now - worker["last_seen"] > self.heartbeat_timeout
+                ]
+                connections = [self.workers[worker_id]["connection"] for worker_id in stale]
+
+            for worker_id, connection in zip(stale, connections):
+                self.logger.info("Worker %s missed its heartbeats", worker_id)
+                self.unregister_worker(worker_id)
+                try:
+                    connection.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def next_job(self, wait):
+        """
+        Takes the next job to be executed from the queue, waiting at most `wait` seconds for one.
+
+        Returns:
+            list: The job, None if there is no job, or the string "shutdown" if the thread pool
+                was shut down and the queue is empty.
+        """
+        pool = self.thread_pool
+        end = time.monotonic() + wait
+        while True:
+            with pool.condition:
+                while pool.job_queue.empty() and not pool.shutdown_notification:
+                    remaining = end - time.monotonic()
+                    if remaining <= 0 or not pool.condition.wait(remaining):
+                        return None
+                if pool.job_queue.empty():
+                    return "shutdown"
+                job = pool.job_queue.get()
+
+            if not skip_job(job, pool.job_status, self.logger):
+                return job
+            pool.job_queue.task_done(job)
+
+    def dispatch(self, worker_id, message):
+        """
+        Handles a message received from a worker.
+
+        Parameters:
+            worker_id (int): The ID of the worker.
+            message (dict): The message.
+
+        Returns:
+            dict: The reply.
+        """
+        reason = invalid_message(message)
+        if reason is not None:
+            self.logger.info("Invalid message from worker %s: %s", worker_id, reason)
+            return {"type": "error", "reason": reason}
+
+        with self._lock:
+            worker = self.workers.get(worker_id)
+            if worker is None:
+                return {"type": "shutdown"}
+            worker["last_seen"] = time.monotonic()
+
+        if message["type"] == "pull":
+            job = self.next_job(min(float(message.get("wait", 1.0)), self.heartbeat_timeout / 2))
+            if job is None:
+                return {"type": "idle"}
+            if job == "shutdown":
+                return {"type": "shutdown"}
+
+            with self._lock:
+                worker["leases"][job[2]] = job
+            self.logger.info("Leased job with id %s to worker %s", job[2], worker_id)
+            return {"type": "job", "job": job}
+
+        if message["type"] == "result":
+            return self.finish_job(worker_id, worker, message)
+
+        if message["type"] == "heartbeat":
+            return {"type": "ok"}
+
+        return {"type": "error", "reason": f"Unknown message type '{message['type']}'"}
+
+    def finish_job(self, worker_id, worker, message):
+        """
+        Handles the result (or the failure) of a job leased to a worker.
+
+        Parameters:
+            worker_id (int): The ID of the worker.
+            worker (dict): The connection, last activity time and leased jobs of the worker.
+            message (dict): The validated "result" message.
+
+        Returns:
+            dict: The reply.
+        """
+        with self._lock:
+            job = worker["leases"].pop(message["job_id"], None)
+            if job is not None:
+                self.requeues.pop(job[2], None)
+        if job is None:
+            return {"type": "error", "reason": "Job is not leased by this worker"}
+
+        # The job is no longer leased, it must end here whatever happens
+        status, duration = "done", message.get("duration")
+        try:
+            if "error" in message:
+                self.logger.error("Worker %s failed job with id %s: %s", worker_id, job[2], message["error"])
+                status, duration = "error", None
+            else:
+                save_result(message["result"], job[2])
+                self.logger.info("Worker %s finished job with id %s", worker_id, job[2])
+        except OSError:
+            self.logger.exception("Could not save the result of job with id %s", job[2])
+            status, duration = "error", None
+        finally:
+            self.thread_pool.job_status[job[2]] = status
+            self.thread_pool.job_queue.task_done(job, duration)
+        return {"type": "ok"}
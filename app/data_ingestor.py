@@ -1,4 +1,42 @@
-from pandas import read_csv
+import numpy as np
+from pandas import read_csv, factorize
+
+try:
+    from .question_cache import QuestionCache
+except ImportError:
+    from question_cache import QuestionCache
+
+# Columns by which the table is physically sorted in the clustered layout
+CLUSTER_COLUMNS = ["Question", "LocationDesc", "StratificationCategory1", "Stratification1"]
+
+# Columns having a bitmap index, usable as filters and group keys in queries
+INDEXED_COLUMNS = [
+    "Question", "LocationDesc", "YearStart", "YearEnd", "StratificationCategory1", "Stratification1"
+]
+
+# Column holding the inverse-variance weight of every value, derived from its 95% confidence interval
+WEIGHT_COLUMN = "Confidence_Weight"
+
+# Indexed columns which also accept a {"min": ..., "max": ...} range filter
+RANGE_COLUMNS = ["YearStart", "YearEnd"]
+
+# Questions where lower values are considered 'best'
+QUESTIONS_BEST_IS_MIN = [
+    'Percent of adults aged 18 years and older who have an overweight classification',
+    'Percent of adults aged 18 years and older who have obesity',
+    'Percent of adults who engage in no leisure-time physical activity',
+    'Percent of adults who report consuming fruit less than one time daily',
+    'Percent of adults who report consuming vegetables less than one time daily'
+]
+
+# Questions where higher values are considered 'best'
+QUESTIONS_BEST_IS_MAX = [
+    'Percent of adults who achieve at least 150 minutes a week of moderate-intensity aerobic physical activity or 75 minutes a week of vigorous-intensity aerobic activity (or an equivalent combination)',
+    'Percent of adults who achieve at least 150 minutes a week of moderate-intensity aerobic physical activity or 75 minutes a week of vigorous-intensity aerobic physical activity and engage in muscle-strengthening activities on 2 or more days a week',
+    'Percent of adults who achieve at least 300 minutes a week of moderate-intensity aerobic physical activity or 150 minutes a week of vigorous-intensity aerobic activity (or an equivalent combination)',
+    'Percent of adults who engage in muscle-strengthening activities on 2 or more days a week',
+]
+
 
 class DataIngestor:
     """
@@ -8,28 +46,166 @@ class DataIngestor:
 
     Parameters:
         csv_path (str): The file path to the CSV file to be ingested.
+        clustered (bool): Whether to sort the table by CLUSTER_COLUMNS and serve selections as slices.
 
     Attributes:
-        table (DataFrame): The main DataFrame containing the ingested data.
+        table (DataFrame): The main DataFrame containing the ingested data, plus the WEIGHT_COLUMN.
+        clustered (bool): Whether the table uses the clustered (sorted) layout.
+        question_offsets (dict): The [start, end) row range of every question, in the clustered layout.
+        state_offsets (dict): The [start, end) row range of every (question, state) pair, in the clustered layout.
+        bitmaps (dict): For every column in INDEXED_COLUMNS, the packed bitmap of the rows holding each value.
+        question_cache (QuestionCache): The intermediate results of every question, shared by the job types.
         questions_best_is_min (list): A list of questions where lower values are considered 'best'.
         questions_best_is_max (list): A list of questions where higher values are considered 'best'.
     """
 
-    def __init__(self, csv_path: str):
+    def __init__(self, csv_path: str, clustered: bool = True):
+        self.clustered = clustered
+        self.question_offsets = {}
+        self.state_offsets = {}
+        self.bitmaps = {}
+
         # Read csv from csv_path
-        self.table = read_csv(csv_path)
-
-        self.questions_best_is_min = [
-            'Percent of adults aged 18 years and older who have an overweight classification',
-            'Percent of adults aged 18 years and older who have obesity',
-            'Percent of adults who engage in no leisure-time physical activity',
-            'Percent of adults who report consuming fruit less than one time daily',
-            'Percent of adults who report consuming vegetables less than one time daily'
-        ]
-
-        self.questions_best_is_max = [
-            'Percent of adults who achieve at least 150 minutes a week of moderate-intensity aerobic physical activity or 75 minutes a week of vigorous-intensity aerobic activity (or an equivalent combination)',
-            'Percent of adults who achieve at least 150 minutes a week of moderate-intensity aerobic physical activity or 75 minutes a week of vigorous-intensity aerobic physical activity and engage in muscle-strengthening activities on 2 or more days a week',
-            'Percent of adults who achieve at least 300 minutes a week of moderate-intensity aerobic physical activity or 150 minutes a week of vigorous-intensity aerobic activity (or an equivalent combination)',
-            'Percent of adults who engage in muscle-strengthening activities on 2 or more days a week',
-        ]
+        self.load_table(read_csv(csv_path))
+
+        self.questions_best_is_min = QUESTIONS_BEST_IS_MIN
+        self.questions_best_is_max = QUESTIONS_BEST_IS_MAX
+
+    def load_table(self, table):
+        """
+        Sets the table to be served and, in the clustered layout, sorts it and builds the offset tables.
+
+        Parameters:
+            table (DataFrame): The table to be served.
+
+        Returns:
+            None
+        """
+        # Some exports have trailing spaces in the column names (e.g. "High_Confidence_Limit ")
+        table = table.rename(columns=str.strip)
+        table = table.assign(**{WEIGHT_COLUMN: self._confidence_weights(table)})
+
+        if self.clustered:
+            # Sort rows physically, so every question and (question, state) pair is a contiguous range
+            self.table = table.sort_values(CLUSTER_COLUMNS, kind="stable").reset_index(drop=True)
+            self.question_offsets = self._build_offsets(["Question"])
+            self.state_offsets = self._build_offsets(["Question", "LocationDesc"])
+        else:
+            self.table = table
+
+        self.bitmaps = {column: self._build_bitmaps(column) for column in INDEXED_COLUMNS}
+        self.question_cache = QuestionCache(self)
+
+    def memory_usage(self):
+        """
+        Returns:
+            int: The memory (bytes) used by the table and its bitmap indexes.
+        """
+        bitmaps = sum(bitmap.nbytes for column in self.bitmaps.values() for bitmap in column.values())
+        return int(self.table.memory_usage(deep=True).sum()) + bitmaps
+
+    @staticmethod
+    def _confidence_weights(table):
+        # Inverse-variance weights, the standard error being estimated from the 95% confidence interval.
+        # Values without a valid confidence interval get a null weight
+        if "Low_Confidence_Limit" not in table or "High_Confidence_Limit" not in table:
+            return np.zeros(len(table))
+
+        width = (table["High_Confidence_Limit"] - table["Low_Confidence_Limit"]).to_numpy(dtype=np.float64)
+        valid = width > 0
+        weights = np.zeros(len(table))
+        weights[valid] = (2 * 1.959964 / width[valid]) ** 2
+        return weights
+
+    def _build_offsets(self, columns):
+        # A new range starts wherever any of the (sorted) key columns changes value
+        boundaries = np.zeros(len(self.table) + 1, dtype=bool)
+        boundaries[0] = boundaries[-1] = True
+        for column in columns:
+            codes, _ = factorize(self.table[column])
+            boundaries[1:-1] |= codes[1:] != codes[:-1]
+        starts = np.flatnonzero(boundaries)
+
+        offsets = {}
+        for start, end in zip(starts[:-1].tolist(), starts[1:].tolist()):
+            key = tuple(self.table[column].iat[start] for column in columns)
+            offsets[key[0] if len(key) == 1 else key] = (start, end)
+        return offsets
+
+    def _build_bitmaps(self, column):
+        # One packed bitmap (1 bit per row) for every distinct value of the column
+        codes, uniques = factorize(self.table[column])
+        return {
+            value: np.packbits(codes == code)
+            for code, value in enumerate(uniques.tolist())
+        }
+
+    def _column_bitmap(self, column, condition):
+        # Bitwise OR of the bitmaps of all the column values matching the filter condition
+        if isinstance(condition, dict):
+            lower = condition.get("min")
+            upper = condition.get("max")
+            values = [
+                value for value in self.bitmaps[column]
+                if (lower is None or value >= lower) and (upper is None or value <= upper)
+            ]
+        elif isinstance(condition, list):
+            values = condition
+        else:
+            values = [condition]
+
+        bitmap = np.zeros((len(self.table) + 7) // 8, dtype=np.uint8)
+        for value in values:
+            if value in self.bitmaps[column]:
+                bitmap |= self.bitmaps[column][value]
+        return bitmap
+
+    def filter_rows(self, filters):
+        """
+        Finds the rows matching all the given filters using the bitmap indexes.
+
+        The bitmaps of the values accepted by a filter are combined with bitwise OR, then the
+        bitmaps of the filters are combined with bitwise AND, so no string column is scanned.
+
+        Parameters:
+            filters (dict): Maps columns from INDEXED_COLUMNS to a value, a list of values or,
+                for RANGE_COLUMNS, a {"min": ..., "max": ...} range (both ends inclusive).
+
+        Returns:
+            ndarray: The positions of the matching rows, in table order.
+        """
+        if not filters:
+            return np.arange(len(self.table))
+
+        bitmap = None
+        for column, condition in filters.items():
+            column_bitmap = self._column_bitmap(column, condition)
+            bitmap = column_bitmap if bitmap is None else bitmap & column_bitmap
+
+        return np.flatnonzero(np.unpackbits(bitmap, count=len(self.table)))
+
+    def select(self, question, state=None):
+        """
+        Selects the rows of a question, optionally restricted to a state.
+
+        In the clustered layout the selection is a contiguous slice of the table, found in the
+        offset tables, so no boolean mask is built and no rows are copied.
+
+        Parameters:
+            question (str): The question to select.
+            state (str): The state to select, or None for all the states.
+
+        Returns:
+            DataFrame: The selected rows.
+        """
+        if self.clustered:
+            if state is None:
+                start, end = self.question_offsets.get(question, (0, 0))
+            else:
+                start, end = self.state_offsets.get((question, state), (0, 0))
+            return self.table.iloc[start:end]
+
+        mask = self.table["Question"] == question
+        if state is not None:
+            mask &= self.table["LocationDesc"] == state
+        return self.table.loc[mask]
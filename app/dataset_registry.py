@@ -0,0 +1,131 @@
+from collections import OrderedDict
+from threading import Lock
+
+try:
+    from .data_ingestor import DataIngestor
+except ImportError:
+    from data_ingestor import DataIngestor
+
+# Name of the dataset used by the jobs which do not name one
+DEFAULT_DATASET = "default"
+
+
+def parse_datasets(specification):
+    """
+    Parses a list of datasets given as "name=path" pairs separated by commas.
+
+    Parameters:
+        specification (str): The datasets, e.g. "usa_2020=./data/2020.csv,midwest=./data/midwest.csv".
+
+    Returns:
+        dict: The CSV path of every dataset name.
+
+    Raises:
+        ValueError: If a pair has no name or no path.
+    """
+    paths = {}
+    for pair in specification.split(","):
+        if not pair.strip():
+            continue
+        name, _, path = pair.partition("=")
+        if not name.strip() or not path.strip():
+            raise ValueError(f"Invalid dataset '{pair}', expected 'name=path'")
+        paths[name.strip()] = path.strip()
+    return paths
+
+
+class DatasetRegistry:
+    """
+    The datasets which can be named by the jobs, loaded on first use and shared by all the workers.
+
+    Every dataset is a DataIngestor, loaded (with its indexes) the first time a job needs it. When
+    the memory of the loaded datasets exceeds `memory_budget`, the least recently used ones are
+    unloaded; the jobs still executing on an unloaded dataset keep it alive until they finish
+    (the workers drop their reference after every job), and the next job naming it loads it again.
+
+    Parameters:
+        paths (dict): The CSV path of every dataset name.
+        logger (Logger): An object providing access to the logger.
+        default (str): The name of the dataset used by the jobs which do not name one.
+        memory_budget (int): The maximum memory (bytes) of the loaded datasets, None for no limit.
+
+    Attributes:
+        loaded (OrderedDict): The loaded datasets and their memory (bytes), least recently used first.
+    """
+
+    def __init__(self, paths, logger, default=DEFAULT_DATASET, memory_budget=None):
+        self.paths = dict(paths)
+        self.logger = logger
+        self.default = default
+        self.memory_budget = memory_budget
+        self.loaded = OrderedDict()
+        self._load_locks = {name: Lock() for name in self.paths}
+        self._lock = Lock()
+
+    def __contains__(self, name):
+        return name in self.paths
+
+    def get(self, name=None):
+        """
+        Returns a dataset, loading it if needed.
+
+        Parameters:
+            name (str): The name of the dataset, None for the default dataset.
+
+        Returns:
+            DataIngestor: The dataset.
+
+        Raises:
+            KeyError: If no dataset has the given name.
+        """
+        name = name if name is not None else self.default
+        if name not in self.paths:
+            raise KeyError(name)
+
+        with self._lock:
+            if name in self.loaded:
+                self.loaded.move_to_end(name)
+                return self.loaded[name][0]
+
+        # A dataset is loaded by a single worker, the others wait for it
+        with self._load_locks[name]:
+            with self._lock:
+                if name in self.loaded:
+                    self.loaded.move_to_end(name)
+                    return self.loaded[name][0]
+
+            self.logger.info("Loading dataset '%s' from %s", name, self.paths[name])
+            data_ingestor = DataIngestor(self.paths[name])
+            memory = data_ingestor.memory_usage()
+            self.logger.info("Loaded dataset '%s', %s rows, %s bytes", name, len(data_ingestor.table), memory)
+
+            with self._lock:
+                self.loaded[name] = (data_ingestor, memory)
+                self._unload_over_budget()
+        return data_ingestor
+
+    def _unload_over_budget(self):
+        # The most recently used dataset (the one being loaded) is always kept
+        if self.memory_budget is None:
+            return
+        while len(self.loaded) > 1 and sum(memory for _, memory in self.loaded.values()) > self.memory_budget:
+            name, (_, memory) = self.loaded.popitem(last=False)
+            self.logger.info("Unloading dataset '%s' (%s bytes) to stay within the memory budget", name, memory)
+
+    def status(self):
+        """
+        Returns:
+            list: For every dataset, its name, path, whether it is the default one, whether it is
+                loaded and its memory (bytes, 0 if not loaded).
+        """
+        with self._lock:
+            return [
+                {
+                    "name": name,
+                    "path": path,
+                    "default": name == self.default,
+                    "loaded": name in self.loaded,
+                    "memory": self.loaded[name][1] if name in self.loaded else 0
+                }
+                for name, path in self.paths.items()
+            ]
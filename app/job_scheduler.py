@@ -0,0 +1,260 @@
+import heapq
+import math
+import time
+from itertools import count
+from threading import Lock
+
+# Initial cost estimates (seconds) of every job type, refined with the measured durations
+DEFAULT_JOB_COSTS = {
+    "state_mean": 0.001,
+    "global_mean": 0.001,
+    "state_diff_from_mean": 0.002,
+    "state_mean_by_category": 0.002,
+    "states_mean": 0.003,
+    "best5": 0.003,
+    "worst5": 0.003,
+    "diff_from_mean": 0.003,
+    "states_stats": 0.005,
+    "query": 0.005,
+    "mean_by_category": 0.01,
+    "stats_by_category": 0.02
+}
+
+
+class JobScheduler:
+    """
+    A cost-aware priority queue for jobs, used instead of a FIFO queue.
+
+    Jobs are run shortest-expected-job-first, with aging: every job receives a virtual deadline
+    equal to its submission time plus its expected cost multiplied by `stretch`. Cheap jobs can
+    therefore overtake a burst of expensive ones, while an expensive job is never delayed by more
+    than `stretch` times its own expected cost by jobs submitted after it. A client-supplied
+    priority moves the virtual deadline earlier by `priority_step` seconds per priority point.
+
+    The expected cost of a job type starts from DEFAULT_JOB_COSTS and is then tracked as an
+    exponentially weighted moving average of the measured durations.
+
+    Workers may take several queued jobs at once (see take()), up to `batch_size` jobs, after
+    waiting `batch_window` seconds for more jobs to be queued.
+
+    Parameters:
+        stretch (float): How many times its expected cost a job may be overtaken by newer cheaper jobs.
+        priority_step (float): The number of seconds a priority point moves the virtual deadline.
+        smoothing (float): The weight of the last measured duration in the moving average.
+        batch_size (int): The maximum number of jobs taken at once by a worker, 1 to disable batching.
+        batch_window (float): The number of seconds a worker waits for a batch to fill up.
+
+    Attributes:
+        costs (dict): The current expected cost (seconds) of every job type.
+        unfinished_tasks (int): The number of jobs queued or being executed.
+    """
+
+    def __init__(self, stretch=10.0, priority_step=0.01, smoothing=0.2, batch_size=1, batch_window=0.0):
+        self.stretch = stretch
+        self.priority_step = priority_step
+        self.smoothing = smoothing
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.costs = dict(DEFAULT_JOB_COSTS)
+        self.unfinished_tasks = 0
+        self._done_callbacks = []
+        self._heap = []
+        self._sequence = count()
+        self._lock = Lock()
+
+    def expected_cost(self, request):
+        """
+        Returns the expected cost (seconds) of a job type.
+
+        Parameters:
+            request (str): The job type.
+
+        Returns:
+            float: The expected cost, the highest known cost for unknown job types.
+        """
+        return self.costs.get(request, max(self.costs.values()))
+
+    def put(self, job, priority=0):
+        """
+        Adds a job to the queue.
+
+        Parameters:
+            job (list): The job, having the job type on the first position.
+            priority (float): The client priority, higher values are run earlier.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: If the priority is NaN or infinite, which would break the order of the heap.
+        """
+        if not math.isfinite(priority):
+            raise ValueError(f"Invalid priority {priority}")
+        with self._lock:
+            deadline = (
+                time.monotonic()
+                + self.stretch * self.expected_cost(job[0])
+                - self.priority_step * priority
+            )
+            # The sequence number keeps FIFO order between jobs with equal deadlines
+            heapq.heappush(self._heap, (deadline, next(self._sequence), job))
+            self.unfinished_tasks += 1
+
+    def requeue(self, job):
+        """
+        Puts back a job which was taken from the queue, but not finished (e.g. its worker died).
+
+        The job keeps counting as unfinished and is placed ahead of all the other queued jobs.
+
+        Parameters:
+            job (list): The job.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            heapq.heappush(self._heap, (float("-inf"), next(self._sequence), job))
+
+    def get(self):
+        """
+        Removes and returns the job with the earliest virtual deadline.
+
+        Returns:
+            list: The job.
+
+        Raises:
+            IndexError: If the queue is empty.
+        """
+        with self._lock:
+            return heapq.heappop(self._heap)[-1]
+
+    def take(self, predicate, limit):
+        """
+        Removes and returns up to `limit` queued jobs matching a predicate, in the order of their
+        virtual deadlines.
+
+        Parameters:
+            predicate (callable): Receives a job, returns True if it must be taken.
+            limit (int): The maximum number of jobs to take.
+
+        Returns:
+            list: The jobs taken.
+        """
+        with self._lock:
+            matching = sorted(entry for entry in self._heap if predicate(entry[-1]))[:limit]
+            if not matching:
+                return []
+
+            taken = {id(entry) for entry in matching}
+            self._heap = [entry for entry in self._heap if id(entry) not in taken]
+            heapq.heapify(self._heap)
+            return [entry[-1] for entry in matching]
+
+    def empty(self):
+        """
+        Returns:
+            bool: True if there are no queued jobs, False otherwise.
+        """
+        return not self._heap
+
+    def qsize(self):
+        """
+        Returns:
+            int: The number of queued jobs.
+        """
+        return len(self._heap)
+
+    def backlog(self):
+        """
+        Returns:
+            float: The expected number of seconds of work in the queue (sum of the expected costs).
+        """
+        with self._lock:
+            return sum(self.expected_cost(entry[-1][0]) for entry in self._heap)
+
+    def record(self, request, duration):
+        """
+        Updates the expected cost of a job type with a measured duration.
+
+        Parameters:
+            request (str): The job type.
+            duration (float): The measured duration of the job, in seconds.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            previous = self.costs.get(request, duration)
+            self.costs[request] = (1 - self.smoothing) * previous + self.smoothing * duration
+
+    def add_done_callback(self, callback):
+        """
+        Registers a function to be called with every finished job, see task_done().
+
+        Parameters:
+            callback (callable): The function, receiving the finished job.
+
+        Returns:
+            None
+        """
+        self._done_callbacks.append(callback)
+
+    def remove_done_callback(self, callback):
+        """
+        Unregisters a function registered with add_done_callback().
+
+        Parameters:
+            callback (callable): The function.
+
+        Returns:
+            None
+        """
+        self._done_callbacks.remove(callback)
+
+    def cancel(self, job_id):
+        """
+        Removes a job from the queue, if it was not taken by a worker yet.
+
+        The removed job still counts as unfinished: the caller records its new status, then
+        reports it with task_done() (without a duration), so the done callbacks see the status.
+
+        Parameters:
+            job_id (int): The ID of the job to be removed.
+
+        Returns:
+            list: The removed job, None if it is not in the queue.
+        """
+        with self._lock:
+            for position, entry in enumerate(self._heap):
+                if entry[-1][2] == job_id:
+                    job = entry[-1]
+                    self._heap[position] = self._heap[-1]
+                    self._heap.pop()
+                    heapq.heapify(self._heap)
+                    break
+            else:
+                return None
+        return job
+
+    def task_done(self, job, duration=None):
+        """
+        Marks a job taken from the queue as finished, like `Queue.task_done()` does.
+
+        The measured duration updates the expected cost of the job type, then all the
+        registered callbacks are notified.
+
+        Parameters:
+            job (list): The finished job.
+            duration (float): The measured duration of the job in seconds, None if the job was
+                skipped without being executed.
+
+        Returns:
+            None
+        """
+        if duration is not None:
+            self.record(job[0], duration)
+        with self._lock:
+            self.unfinished_tasks -= 1
+        # A copy, the callbacks may be removed meanwhile by other threads
+        for callback in list(self._done_callbacks):
+            callback(job)
@@ -0,0 +1,186 @@
+import os
+import sqlite3
+from abc import abstractmethod
+from collections.abc import MutableMapping
+from itertools import count
+from threading import Lock, local
+
+# Job statuses for which the result will never change anymore
+FINAL_STATUSES = ("done", "cancelled", "expired", "error")
+
+
+class JobStore(MutableMapping):
+    """
+    The status of every job, indexed by job ID, plus the allocation of new job IDs.
+
+    The store behaves like the dictionary it replaces (`store[job_id] = "done"`), so the worker
+    threads and the API do not depend on where the statuses are kept. Subclasses implement the
+    storage: InMemoryJobStore for a single web process, SQLiteJobStore for several web processes
+    sharing the same job IDs and statuses.
+
+    Attributes:
+        shared (bool): Whether other processes see the same jobs. The queue of a job is only held
+            by the process which registered it, the other processes can read its status but not
+            cancel it.
+    """
+
+    shared = False
+
+    @abstractmethod
+    def add_job(self, status):
+        """
+        Atomically allocates a new job ID and registers the job with the given status.
+
+        Job IDs start from 1 and are never reused, even if the job is discarded.
+
+        Parameters:
+            status (str): The initial status of the job.
+
+        Returns:
+            int: The ID of the new job.
+        """
+
+    def items(self):
+        """
+        Returns:
+            list: The (job ID, status) pairs of all the jobs, as a consistent snapshot: jobs
+                discarded meanwhile (e.g. rejected submissions) can neither be half-listed nor
+                make the listing fail.
+        """
+        snapshot = []
+        for job_id in self:
+            status = self.get(job_id)
+            if status is not None:
+                snapshot.append((job_id, status))
+        return snapshot
+
+    def count(self, status):
+        """
+        Parameters:
+            status (str): A job status.
+
+        Returns:
+            int: The number of jobs having the given status.
+        """
+        return sum(1 for value in self.values() if value == status)
+
+
+class InMemoryJobStore(JobStore):
+    """
+    A JobStore kept in a dictionary of the current process (the default).
+    """
+
+    def __init__(self):
+        self._statuses = {}
+        self._job_ids = count(1)
+        self._lock = Lock()
+
+    def add_job(self, status):
+        with self._lock:
+            job_id = next(self._job_ids)
+            self._statuses[job_id] = status
+        return job_id
+
+    def __getitem__(self, job_id):
+        return self._statuses[job_id]
+
+    def __setitem__(self, job_id, status):
+        with self._lock:
+            self._statuses[job_id] = status
+
+    def __delitem__(self, job_id):
+        with self._lock:
+            del self._statuses[job_id]
+
+    def __iter__(self):
+        return iter(list(self._statuses))
+
+    def __len__(self):
+        return len(self._statuses)
+
+    def items(self):
+        # Copied at once, unlike the keys-then-lookups of the MutableMapping implementation
+        with self._lock:
+            return list(self._statuses.items())
+
+
+class SQLiteJobStore(JobStore):
+    """
+    A JobStore kept in a SQLite database in WAL mode, shared by all the processes opening it.
+
+    Job IDs are allocated by the database (AUTOINCREMENT), so concurrent submissions from several
+    web processes never receive the same ID. Every thread uses its own connection in autocommit
+    mode, and WAL lets readers run concurrently with the writer. Final statuses never change,
+    so they are also cached in the process, sparing the database the polls of finished jobs.
+
+    Parameters:
+        path (str): The path of the database file, created if it does not exist.
+        timeout (float): The number of seconds to wait for a lock held by another process.
+    """
+
+    shared = True
+
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self._final_statuses = {}
+        self._local = local()
+
+        connection = self._connect()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (job_id INTEGER PRIMARY KEY AUTOINCREMENT, status TEXT NOT NULL)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+        connection.close()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _connection(self):
+        # Connections are neither shared between threads, nor inherited by forked processes
+        if getattr(self._local, "pid", None) != os.getpid():
+            self._local.connection = self._connect()
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    def add_job(self, status):
+        return self._connection().execute("INSERT INTO jobs (status) VALUES (?)", (status,)).lastrowid
+
+    def __getitem__(self, job_id):
+        status = self._final_statuses.get(job_id)
+        if status is not None:
+            return status
+
+        row = self._connection().execute("SELECT status FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise KeyError(job_id)
+        if row[0] in FINAL_STATUSES:
+            self._final_statuses[job_id] = row[0]
+        return row[0]
+
+    def __setitem__(self, job_id, status):
+        self._connection().execute(
+            "INSERT INTO jobs (job_id, status) VALUES (?, ?) "
+            "ON CONFLICT (job_id) DO UPDATE SET status = excluded.status",
+            (job_id, status)
+        )
+
+    def __delitem__(self, job_id):
+        if self._connection().execute("DELETE FROM jobs WHERE job_id = ?", (job_id,)).rowcount == 0:
+            raise KeyError(job_id)
+
+    def __iter__(self):
+        rows = self._connection().execute("SELECT job_id FROM jobs ORDER BY job_id").fetchall()
+        return (row[0] for row in rows)
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    def items(self):
+        return self._connection().execute("SELECT job_id, status FROM jobs ORDER BY job_id").fetchall()
+
+    def count(self, status):
+        return self._connection().execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
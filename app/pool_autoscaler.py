@@ -0,0 +1,136 @@
+import math
+import time
+from collections import deque
+from threading import Thread
+
+# Number of seconds between two checks of the pool size
+CHECK_INTERVAL = 0.1
+
+
+class PoolAutoscaler:
+    """
+    Grows and shrinks a ThreadPool between a minimum and a maximum number of worker threads.
+
+    The pool grows as soon as the queued work would take longer than `target_wait` seconds to
+    drain: the queued work is the sum of the expected costs of the queued jobs, as measured by the
+    JobScheduler, so a burst of expensive jobs adds more workers than a burst of cheap ones. The
+    pool shrinks when some workers stayed idle for `idle_timeout` seconds, by asking that many
+    workers to retire once they find the queue empty.
+
+    Parameters:
+        thread_pool (ThreadPool): The thread pool to be resized.
+        min_threads (int): The minimum number of worker threads.
+        max_threads (int): The maximum number of worker threads.
+        target_wait (float): The number of seconds the queued work should be drained in.
+        idle_timeout (float): The number of seconds workers must stay idle before being retired.
+
+    Attributes:
+        events (deque): The last resize events, with their time, old and new sizes and reason.
+    """
+
+    def __init__(self, thread_pool, min_threads, max_threads, target_wait=0.5, idle_timeout=30.0):
+        self.thread_pool = thread_pool
+        self.bounds = (min_threads, max_threads)
+        self.target_wait = target_wait
+        self.idle_timeout = idle_timeout
+        self.events = deque(maxlen=100)
+        # Since when the queue is empty, and the fewest idle workers seen since then
+        self._idle = None
+
+    def start(self):
+        """
+        Starts checking the pool size in a background thread, until the pool is shut down.
+
+        Returns:
+            None
+        """
+        Thread(target=self.run, name="PoolAutoscaler", daemon=True).start()
+
+    def run(self):
+        """
+        Checks the pool size every CHECK_INTERVAL seconds, until the pool is shut down.
+
+        Returns:
+            None
+        """
+        while self.thread_pool.is_running():
+            self.check()
+            time.sleep(CHECK_INTERVAL)
+
+    def check(self):
+        """
+        Resizes the pool if the queued work or the idle workers require it.
+
+        Returns:
+            None
+        """
+        scheduler = self.thread_pool.job_queue
+        threads = self.thread_pool.num_of_threads()
+        queued = scheduler.qsize()
+        busy = max(0, scheduler.unfinished_tasks - queued)
+        min_threads, max_threads = self.bounds
+
+        if threads < min_threads:
+            self.resize(threads, min_threads, "below the minimum size")
+            return
+
+        if queued:
+            self._idle = None
+            backlog = scheduler.backlog()
+            wanted = min(max_threads, busy + math.ceil(backlog / self.target_wait))
+            if wanted > threads:
+                self.resize(threads, wanted, f"{queued} queued jobs, {backlog:.3f} s of expected work")
+            return
+
+        now = time.monotonic()
+        spare = max(0, threads - busy)
+        if self._idle is None:
+            self._idle = (now, spare)
+            return
+        self._idle = (self._idle[0], min(self._idle[1], spare))
+
+        idle_since, idle_workers = self._idle
+        if now - idle_since >= self.idle_timeout:
+            retired = min(idle_workers, threads - min_threads)
+            if retired > 0:
+                self.resize(threads, threads - retired,
+                            f"{idle_workers} workers idle for {self.idle_timeout} s")
+            self._idle = None
+
+    def resize(self, old_size, new_size, reason):
+        """
+        Adds or retires workers, and records the resize event.
+
+        Parameters:
+            old_size (int): The current number of worker threads.
+            new_size (int): The wanted number of worker threads.
+            reason (str): Why the pool is resized.
+
+        Returns:
+            None
+        """
+        if new_size > old_size:
+            self.thread_pool.add_workers(new_size - old_size)
+        else:
+            self.thread_pool.retire_workers(old_size - new_size)
+
+        event = {"time": time.time(), "from": old_size, "to": new_size, "reason": reason}
+        self.events.append(event)
+        self.thread_pool.logger.info("Resizing the thread pool from %s to %s workers: %s",
+                                     old_size, new_size, reason)
+
+    def status(self):
+        """
+        Returns:
+            dict: The current pool size, its bounds, the queued and running jobs and the last resize events.
+        """
+        scheduler = self.thread_pool.job_queue
+        queued = scheduler.qsize()
+        return {
+            "threads": self.thread_pool.num_of_threads(),
+            "min_threads": self.bounds[0],
+            "max_threads": self.bounds[1],
+            "queued": queued,
+            "busy": max(0, scheduler.unfinished_tasks - queued),
+            "events": list(self.events)
+        }
@@ -0,0 +1,99 @@
+from threading import Lock
+
+try:
+    from .aggregator import group_means, mean
+except ImportError:
+    from aggregator import group_means, mean
+
+
+class QuestionCache:
+    """
+    Intermediate results shared by the job types, computed at most once per question.
+
+    Most job types are transformations of the same few aggregates of a question: `states_mean`,
+    `best5`, `worst5` and `state_mean` are a sort or a slice of the per-state means, `global_mean`,
+    `diff_from_mean` and `state_diff_from_mean` add the global mean, and `mean_by_category` and
+    `state_mean_by_category` are views of the per-category means. After the first job for a
+    question computed an aggregate, the other job types only transform the cached one.
+
+    The cache belongs to the table of a DataIngestor and is replaced when the table is reloaded.
+    Only the questions of the table are cached: the results for unknown questions (any string a
+    client sends) are computed on every request, so they cannot grow the cache without bound.
+
+    Parameters:
+        data_ingestor (DataIngestor): The data the intermediate results are computed from.
+    """
+
+    def __init__(self, data_ingestor):
+        self.data_ingestor = data_ingestor
+        self._results = {}
+        self._lock = Lock()
+
+    def _get(self, question, name, compute):
+        key = (question, name)
+        with self._lock:
+            if key in self._results:
+                return self._results[key]
+
+        # Computed outside the lock, concurrent misses for the same key compute the same result
+        result = compute(self.data_ingestor.select(question))
+        if question not in self.data_ingestor.bitmaps["Question"]:
+            return result
+        with self._lock:
+            return self._results.setdefault(key, result)
+
+    def state_means(self, question):
+        """
+        Parameters:
+            question (str): The question.
+
+        Returns:
+            dict: The mean of the values of every state, in the order of the state names.
+        """
+        return self._get(
+            question,
+            "state_means",
+            lambda table: group_means([table["LocationDesc"]], table["Data_Value"])
+        )
+
+    def global_mean(self, question):
+        """
+        Parameters:
+            question (str): The question.
+
+        Returns:
+            float: The mean of all the values of the question.
+        """
+        return self._get(question, "global_mean", lambda table: mean(table["Data_Value"]))
+
+    def category_means(self, question):
+        """
+        Parameters:
+            question (str): The question.
+
+        Returns:
+            dict: For every state, the mean of the values of every (category, stratification),
+                both levels in sorted order.
+        """
+        return self._get(question, "category_means", self._compute_category_means)
+
+    @staticmethod
+    def _compute_category_means(table):
+        means = group_means(
+            [table[column] for column in ["LocationDesc", "StratificationCategory1", "Stratification1"]],
+            table["Data_Value"]
+        )
+        category_means = {}
+        for (state, category, stratification), value in means.items():
+            category_means.setdefault(state, {})[(category, stratification)] = value
+        return category_means
+
+    def clear(self):
+        """
+        Drops all the intermediate results.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._results.clear()
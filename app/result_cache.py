@@ -0,0 +1,137 @@
+import gzip
+import hashlib
+import zlib
+from collections import OrderedDict
+from threading import Lock
+
+# Bodies smaller than this (bytes) are not worth compressing
+MIN_COMPRESSED_SIZE = 1024
+
+# Supported content encodings, in the order of preference
+ENCODINGS = ("gzip", "deflate")
+
+
+def choose_encoding(accept_encoding):
+    """
+    Negotiates the content encoding of a response.
+
+    Parameters:
+        accept_encoding (str): The Accept-Encoding header of the request, empty if missing.
+
+    Returns:
+        str: The preferred encoding among ENCODINGS accepted by the client, None for no encoding.
+    """
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, parameters = item.partition(";")
+        weight = 1.0
+        parameters = parameters.strip()
+        if parameters.startswith("q="):
+            try:
+                weight = float(parameters[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+
+    best_encoding, best_weight = None, 0.0
+    for encoding in ENCODINGS:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best_encoding, best_weight = encoding, weight
+    return best_encoding
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Checks an If-None-Match header against an ETag (weak comparison, as required for If-None-Match).
+
+    Parameters:
+        if_none_match (str): The If-None-Match header of the request, empty if missing.
+        etag (str): The quoted ETag of the current representation.
+
+    Returns:
+        bool: True if the client's cached representation is still valid.
+    """
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class ResultCache:
+    """
+    An LRU cache of serialized job results, bounded by the total size of the cached bodies.
+
+    Only the results which never change (the ones of finished jobs) may be cached. For every job,
+    the cache keeps the serialized body, its strong ETag (a hash of the body) and the compressed
+    variants of the body, each built on first request. Compressed variants have their own ETag,
+    derived from the one of the body, since they are different representations.
+
+    Parameters:
+        max_bytes (int): The maximum total size of the cached bodies and compressed variants.
+
+    Attributes:
+        size (int): The current total size of the cached bodies and compressed variants.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, job_id, encoding, serialize):
+        """
+        Returns a representation of a job result, serializing and compressing it only on cache miss.
+
+        Parameters:
+            job_id (int): The ID of the job.
+            encoding (str): The wanted content encoding, None for no encoding.
+            serialize (callable): Returns the serialized result (bytes), called on cache miss.
+
+        Returns:
+            tuple:
+                - body (bytes): The (possibly compressed) body.
+                - etag (str): The quoted strong ETag of the representation.
+                - encoding (str): The content encoding of the body, None if it is not compressed.
+        """
+        with self._lock:
+            entry = self._entries.get(job_id)
+            if entry is not None:
+                self._entries.move_to_end(job_id)
+
+        if entry is None:
+            body = serialize()
+            entry = {"body": body, "etag": hashlib.sha256(body).hexdigest()[:32]}
+            self._store(job_id, entry)
+
+        if encoding is None or len(entry["body"]) < MIN_COMPRESSED_SIZE:
+            return entry["body"], f'"{entry["etag"]}"', None
+
+        if encoding not in entry:
+            if encoding == "gzip":
+                # A fixed mtime keeps the gzip bytes (and their ETag) reproducible
+                encoded = gzip.compress(entry["body"], mtime=0)
+            else:
+                encoded = zlib.compress(entry["body"])
+            self._store(job_id, {**entry, encoding: encoded})
+            return encoded, f'"{entry["etag"]}-{encoding}"', encoding
+
+        return entry[encoding], f'"{entry["etag"]}-{encoding}"', encoding
+
+    @staticmethod
+    def _entry_size(entry):
+        return sum(len(value) for key, value in entry.items() if key != "etag")
+
+    def _store(self, job_id, entry):
+        with self._lock:
+            previous = self._entries.get(job_id)
+            self.size += self._entry_size(entry) - (self._entry_size(previous) if previous else 0)
+            self._entries[job_id] = entry
+            self._entries.move_to_end(job_id)
+
+            # Evict the least recently used results, but always keep the last one
+            while self.size > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= self._entry_size(evicted)
@@ -1,7 +1,7 @@
-import json
 from functools import wraps
-from flask import request, jsonify
+from flask import Response, request, jsonify
 from app import webserver
+from app import api
 
 
 def request_handler(request_name):
@@ -9,7 +9,8 @@ def request_handler(request_name):
     Decorator for handling requests.
 
     This decorator adds request handling functionality to the decorated function.
-    It checks if the thread pool is running, and if so, registers the request as a job in the pool's queue.
+    It checks if the thread pool is running, and if so, registers the request as a job in the pool's queue
+    (see `api.submit_job()` for the scheduling fields and the admission control).
 
     Args:
         request_name (str): The name of the request.
@@ -20,36 +21,9 @@ def request_handler(request_name):
     def decorator(handler):
         @wraps(handler)
         def wrapper():
-            if webserver.tasks_runner.is_running():
-                # Get request data
-                data = request.json
-                webserver.logger.info("Request '%s' received, data: %s", request_name, data)
-
-                # Register job. Don't wait for task to finish
-                job_id = webserver.job_counter
-                job = [request_name, list(data.values()), job_id]
-                webserver.tasks_runner.job_queue.put(job)
-                webserver.tasks_runner.job_status[job_id] = "running"
-
-                # Notify workers about incoming job
-                webserver.logger.info("Queued the job with id %s, notifying available worker", job_id)
-                with webserver.tasks_runner.condition:
-                    webserver.tasks_runner.condition.notify()
-
-                # Increment job_id counter
-                webserver.job_counter += 1
-
-                # Return associated job_id
-                result = {
-                    "status": "queued",
-                    "job_id": job_id
-                }
-                webserver.logger.info("Returning %s to client", result)
-                return jsonify(result)
-
-            result = {"status": "Shutting down"}
-            webserver.logger.info("Request received, but the thread pool was shut down, returning %s to client", result)
-            return jsonify(result)
+            client_id = request.headers.get("X-Client-Id", request.remote_addr)
+            result, status_code, headers = api.submit_job(request_name, request.get_json(silent=True), client_id)
+            return jsonify(result), status_code, headers
         return wrapper
     return decorator
 
@@ -64,16 +38,7 @@ def num_jobs_request():
             - "status": The response status ("done").
             - "data": The number of jobs currently running.
     """
-    webserver.logger.info("Request received")
-
-    job_status_values = list(webserver.tasks_runner.job_status.values())
-    result = {
-        "status": "done",
-        "data": len(list(filter(lambda value: value == "running", job_status_values)))
-    }
-
-    webserver.logger.info("Returning %s to client", result)
-    return jsonify(result)
+    return jsonify(api.num_jobs())
 
 
 @webserver.route('/api/jobs', methods=['GET'])
@@ -86,19 +51,81 @@ def jobs_request():
             - "status": The response status ("done").
             - "data": The list of jobs and their status.
     """
-    webserver.logger.info("Request received")
+    return jsonify(api.jobs())
+
+
+@webserver.route('/api/pool', methods=['GET'])
+def pool_request():
+    """
+    Function that returns the size of the thread pool and its resize events.
+
+    Returns:
+        JSON response:
+            - "status": The response status ("done").
+            - "data": The number of worker threads, the min/max bounds, the queued and running
+              jobs and the last resize events (time, old size, new size, reason).
+    """
+    return jsonify(api.pool_status())
+
+
+@webserver.route('/api/datasets', methods=['GET'])
+def datasets_request():
+    """
+    Function that returns the datasets the jobs can name.
+
+    Returns:
+        JSON response:
+            - "status": The response status ("done").
+            - "data": For every dataset, its name, CSV path, whether it is the default one,
+              whether it is loaded and its memory (bytes).
+    """
+    return jsonify(api.datasets_status())
 
-    jobs = []
-    for current_id in range(1, webserver.job_counter):
-        current_status = webserver.tasks_runner.job_status[current_id]
-        jobs.append({f"job_id_{current_id}": current_status})
-    result = {
-        "status": "done",
-        "data": jobs
-    }
 
-    webserver.logger.info("Returning %s to client", result)
-    return jsonify(result)
+@webserver.route('/api/ready', methods=['GET'])
+def ready_request():
+    """
+    Function that returns whether the server is ready to execute jobs (readiness probe).
+
+    Returns:
+        JSON response, with HTTP status 200 if the server is ready, 503 otherwise:
+            - "status": "ready", "starting" or "failed".
+            - "data": The progress of the startup: the current step, the number of done steps out
+              of all the steps, the elapsed seconds and the error, if any.
+    """
+    result, status_code = api.readiness()
+    return jsonify(result), status_code
+
+
+@webserver.route('/api/live', methods=['GET'])
+def live_request():
+    """
+    Function that returns whether the server is alive (liveness probe).
+
+    Returns:
+        JSON response, with HTTP status 200 if the server is alive, 503 if its startup failed:
+            - "status": "alive" or "failed".
+            - "reason": The error of the startup, if it failed.
+    """
+    result, status_code = api.liveness()
+    return jsonify(result), status_code
+
+
+@webserver.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job_request(job_id):
+    """
+    Function that cancels a job which was not taken by a worker yet.
+
+    Args:
+        job_id (str): The ID of the job to be cancelled.
+
+    Returns:
+        JSON response:
+            - "status": The response status ("cancelled" or "error").
+            - "job_id": The ID of the cancelled job.
+            - "reason" (if status is "error"): The reason why the job cannot be cancelled.
+    """
+    return jsonify(api.cancel_job(int(job_id)))
 
 
 @webserver.route('/api/get_results/<job_id>', methods=['GET'])
@@ -109,40 +136,45 @@ def get_results_request(job_id):
     Args:
         job_id (str): The ID of the job for which the result is requested.
 
+    The results of finished jobs are served with an ETag (conditional requests get a 304 response)
+    and compressed when the client accepts gzip or deflate, see `api.job_result_response()`.
+
     Returns:
         JSON response:
-            - "status": The response status ("done" or "running").
+            - "status": The response status ("done", "running", "cancelled", "expired" or "error").
             - "data": The result of the job if done.
             - "reason" (if status is "error"): The reason for the error.
     """
-    webserver.logger.info("Request received, requesting status of job with id %s", job_id)
+    body, status_code, headers = api.job_result_response(
+        int(job_id),
+        request.headers.get("Accept-Encoding", ""),
+        request.headers.get("If-None-Match", "")
+    )
+    return Response(body, status_code, headers)
 
-    job_id = int(job_id)
 
-    # Check if job_id is valid
-    if job_id not in range(1, webserver.job_counter):
-        result = {
-            "status": "error",
-            "reason": "Invalid job_id"
-        }
-        webserver.logger.info("Returning %s to client", result)
-        return jsonify(result)
-
-    # Check if job_id is done and return the data
-    if webserver.tasks_runner.job_status[job_id] == "done":
-        with open(f"./results/job_id_{job_id}.json", encoding="utf-8") as file:
-            data = json.load(file)
-        result = {
-            "status": "done",
-            "data": data
-        }
-        webserver.logger.info("Returning %s to client", result)
-        return jsonify(result)
+@webserver.route('/api/get_results', methods=['POST'])
+def bulk_results_request():
+    """
+    Function that returns the results of several jobs at once.
 
-    # If not, return running status
-    result = {"status": "running"}
-    webserver.logger.info("Returning %s to client", result)
-    return jsonify(result)
+    The jobs are given as "job_ids" (a list) and/or "from" and "to" (an inclusive range). With
+    "stream": true, the results are streamed as newline-delimited JSON, each job as soon as it is
+    finished, for at most "wait" seconds (see `api.stream_results()`).
+
+    Returns:
+        JSON response:
+            - "status": The response status ("done" or "error").
+            - "data": The result (or status) of every job, by "job_id_<job_id>".
+            - "reason" (if status is "error"): The reason for the error.
+        Or, if streamed, one JSON line per job, with its "job_id", "status" and "data" if done.
+    """
+    job_ids, wait, reason = api.parse_bulk_request(request.get_json(silent=True))
+    if reason is not None:
+        return jsonify({"status": "error", "reason": reason})
+    if wait is None:
+        return jsonify(api.bulk_results(job_ids))
+    return Response(api.stream_results(job_ids, wait), mimetype="application/x-ndjson")
 
 
 @webserver.route('/api/states_mean', methods=['POST'])
@@ -310,6 +342,80 @@ def state_mean_by_category_request():
     """
 
 
+@webserver.route('/api/states_stats', methods=['POST'])
+@request_handler("states_stats")
+def states_stats_request():
+    """
+    Function that adds a 'states_stats' job to the queue for execution.
+
+    The job calculates, for every state, the count, mean, confidence-weighted mean, standard
+    deviation, minimum, median, 90th percentile and maximum of the values.
+
+    Request JSON:
+        {
+            "question": "Question1"
+        }
+
+    Returns:
+        JSON response:
+            - "status": The response status ("queued" or "Shutting down").
+            - "job_id": The ID of the job added to the queue.
+    """
+
+
+@webserver.route('/api/stats_by_category', methods=['POST'])
+@request_handler("stats_by_category")
+def stats_by_category_request():
+    """
+    Function that adds a 'stats_by_category' job to the queue for execution.
+
+    The job calculates the same statistics as 'states_stats', for every (state, category, stratification).
+
+    Request JSON:
+        {
+            "question": "Question1"
+        }
+
+    Returns:
+        JSON response:
+            - "status": The response status ("queued" or "Shutting down").
+            - "job_id": The ID of the job added to the queue.
+    """
+
+
+@webserver.route('/api/query', methods=['POST'])
+@request_handler("query")
+def query_request():
+    """
+    Function that adds a generic 'query' job to the queue for execution.
+
+    The rows matching all the filters are found using the bitmap indexes of the DataIngestor,
+    grouped by the given columns and the 'Data_Value' column is aggregated for every group.
+
+    Request JSON:
+        {
+            "filters": {
+                "Question": "Question1",
+                "LocationDesc": ["State1", "State2"],
+                "YearStart": {"min": 2015, "max": 2020}
+            },
+            "group_by": ["LocationDesc"],
+            "aggregate": "mean"
+        }
+
+        All the fields are optional. Filters and group keys may use any of "Question",
+        "LocationDesc", "YearStart", "YearEnd", "StratificationCategory1" and "Stratification1".
+        The aggregate is one of "mean" (default), "min", "max", "count", "sum", "std", "median",
+        "p90" and "weighted_mean" (weighted by the inverse variance of the confidence intervals).
+
+    Returns:
+        JSON response:
+            - "status": The response status ("queued", "error" or "Shutting down").
+            - "job_id": The ID of the job added to the queue.
+            - "reason" (if status is "error"): The reason why the query is invalid.
+    """
+
+
 @webserver.route('/api/graceful_shutdown', methods=['GET'])
 def graceful_shutdown_request():
     """
@@ -319,19 +425,7 @@ def graceful_shutdown_request():
         JSON response:
             - "status": The response status ("Shutting down").
     """
-    webserver.logger.info("Request received")
-
-    if webserver.tasks_runner.is_running():
-        webserver.tasks_runner.shutdown()
-
-        # Notify workers about shutdown event
-        webserver.logger.info("Notifying all workers about shutdown event")
-        with webserver.tasks_runner.condition:
-            webserver.tasks_runner.condition.notify_all()
-
-    result = {"status": "Shutting down"}
-    webserver.logger.info("Thread pool is shutting down, returning %s to client", result)
-    return jsonify(result)
+    return jsonify(api.graceful_shutdown())
 
 # You can check localhost in your browser to see what this displays
 @webserver.route('/')
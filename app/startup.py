@@ -0,0 +1,68 @@
+import time
+from threading import Lock, Thread
+
+
+class StartupTask(Thread):
+    """
+    Runs the slow steps of the server startup (data ingestion, index and cache building, starting
+    the workers) in the background, so that the HTTP server accepts connections right away.
+
+    The steps are run in order; the server is ready once all of them are done. If a step fails,
+    the remaining steps are not run and the server is reported as not alive.
+
+    Parameters:
+        steps (list): The (description, callable) pairs of the startup steps.
+        logger (Logger): An object providing access to the logger.
+
+    Attributes:
+        ready (bool): Whether all the steps are done.
+        error (str): The error of the failed step, None if no step failed.
+    """
+
+    def __init__(self, steps, logger):
+        Thread.__init__(self, name="Startup", daemon=True)
+        self.steps = steps
+        self.logger = logger
+        self.ready = False
+        self.error = None
+        self._current = 0
+        self._start_time = time.monotonic()
+        self._end_time = None
+        self._lock = Lock()
+
+    def run(self):
+        for index, (description, step) in enumerate(self.steps):
+            with self._lock:
+                self._current = index
+            self.logger.info("Startup step %s/%s: %s", index + 1, len(self.steps), description)
+            try:
+                step()
+            except Exception as error:
+                self.logger.exception("Startup step '%s' failed", description)
+                with self._lock:
+                    self.error = f"{description}: {error}"
+                    self._end_time = time.monotonic()
+                return
+
+        with self._lock:
+            self._current = len(self.steps)
+            self._end_time = time.monotonic()
+            self.ready = True
+        self.logger.info("Startup done in %.3f s", self._end_time - self._start_time)
+
+    def status(self):
+        """
+        Returns:
+            dict: Whether the server is ready, the current step, the number of done steps out of
+                all the steps, the seconds spent on the startup so far and the error, if any.
+        """
+        with self._lock:
+            end_time = self._end_time if self._end_time is not None else time.monotonic()
+            return {
+                "ready": self.ready,
+                "step": self.steps[self._current][0] if self._current < len(self.steps) else None,
+                "done_steps": self._current,
+                "total_steps": len(self.steps),
+                "elapsed": round(end_time - self._start_time, 3),
+                "error": self.error
+            }
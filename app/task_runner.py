@@ -1,7 +1,75 @@
 import json
-from queue import Queue
+import time
 from threading import Thread, Condition
 
+try:
+    from .aggregator import GroupStats, group_aggregate, aggregate
+    from .data_ingestor import WEIGHT_COLUMN, QUESTIONS_BEST_IS_MIN, QUESTIONS_BEST_IS_MAX
+    from .job_scheduler import JobScheduler
+    from .job_store import InMemoryJobStore
+except ImportError:
+    from aggregator import GroupStats, group_aggregate, aggregate
+    from data_ingestor import WEIGHT_COLUMN, QUESTIONS_BEST_IS_MIN, QUESTIONS_BEST_IS_MAX
+    from job_scheduler import JobScheduler
+    from job_store import InMemoryJobStore
+
+
+def save_result(result, job_id):
+    """
+    Saves the given result to a JSON file on disk with the "job_id_{job_id}.json" format.
+
+    Parameters:
+        result (dict): The result to be saved.
+        job_id (int): The ID of the job used for naming the resulting JSON file.
+
+    Returns:
+        None
+    """
+    with open(f"./results/job_id_{job_id}.json", "w", encoding="utf-8") as output_file:
+        json.dump(result, output_file, sort_keys=False)
+
+
+def skip_job(job, job_status, logger):
+    """
+    Checks whether a job taken from the queue is no longer worth running.
+
+    Cancelled jobs are skipped, as well as the jobs whose deadline passed, which are marked as "expired".
+
+    Parameters:
+        job (list): The job taken from the queue.
+        job_status (JobStore): The status of each job.
+        logger (Logger): An object providing access to the logger.
+
+    Returns:
+        bool: True if the job must be skipped, False if it must be executed.
+    """
+    job_id = job[2]
+    deadline = job[3]
+
+    if job_status[job_id] == "cancelled":
+        logger.info("Job with id %s was cancelled, skipping", job_id)
+        return True
+    if deadline is not None and time.time() > deadline:
+        logger.info("Job with id %s expired before being executed, skipping", job_id)
+        job_status[job_id] = "expired"
+        return True
+    return False
+
+
+def batch_key(job):
+    """
+    Returns the key by which a job can be batched with other jobs: its dataset and question.
+
+    Parameters:
+        job (list): The job.
+
+    Returns:
+        tuple: The dataset and question of the job, None for the jobs which are not about a single
+            question (queries).
+    """
+    question = job[1][0] if job[1] else None
+    return (job[4], question) if isinstance(question, str) else None
+
 
 class ThreadPool:
     """
@@ -12,22 +80,26 @@ class ThreadPool:
 
     Parameters:
         num_of_threads (int): The number of worker threads to create.
-        data_ingestor (DataIngestor): An object providing access to the data for processing.
+        datasets (DatasetRegistry): The datasets the jobs are executed on.
         logger (Logger): An object providing access to the logger.
+        scheduler (JobScheduler): The queue ordering the jobs, a default JobScheduler if not given.
+        job_store (JobStore): Where the job statuses are kept, an InMemoryJobStore if not given.
 
     Attributes:
-        job_queue (Queue): A queue containing the jobs to be processed.
-        job_status (dict): A dictionary to store the status of each job.
+        job_queue (JobScheduler): A cost-aware priority queue containing the jobs to be processed.
+        job_status (JobStore): The status of each job, also allocating the job IDs.
         shutdown_notification (list): A flag indicating whether the task runner should shut down.
         condition (Condition): A threading condition for synchronization.
+        retirements (list): The pending requests for idle workers to exit.
+        workers (list): The worker threads (TaskRunner instances).
     """
 
-    def __init__(self, num_of_threads, data_ingestor, logger):
+    def __init__(self, num_of_threads, datasets, logger, scheduler=None, job_store=None):
         # Initializing job queue
-        self.job_queue = Queue()
+        self.job_queue = scheduler if scheduler is not None else JobScheduler()
 
-        # Initializing job status dictionary
-        self.job_status = {}
+        # Initializing job status store
+        self.job_status = job_store if job_store is not None else InMemoryJobStore()
 
         # Flag for graceful shutdown
         self.shutdown_notification = []
@@ -35,18 +107,65 @@ class ThreadPool:
         # Initializing Condition object
         self.condition = Condition()
 
+        # Requests for idle workers to exit, used to shrink the pool
+        self.retirements = []
+
         # Creating and starting the threads
-        for _ in range(num_of_threads):
-            worker = TaskRunner(
-                self.job_queue,
-                self.job_status,
-                self.shutdown_notification,
-                self.condition,
-                data_ingestor,
-                logger
-            )
-            logger.info("Starting %s", worker.name)
-            worker.start()
+        self.datasets = datasets
+        self.logger = logger
+        self.workers = []
+        self.add_workers(num_of_threads)
+
+    def add_workers(self, count):
+        """
+        Creates and starts new worker threads.
+
+        Parameters:
+            count (int): The number of workers to add.
+
+        Returns:
+            None
+        """
+        with self.condition:
+            for _ in range(count):
+                worker = TaskRunner(
+                    self.job_queue,
+                    self.job_status,
+                    self.shutdown_notification,
+                    self.condition,
+                    None,
+                    self.logger,
+                    self.retirements,
+                    self.datasets
+                )
+                self.logger.info("Starting %s", worker.name)
+                worker.start()
+                self.workers.append(worker)
+
+    def retire_workers(self, count):
+        """
+        Asks worker threads to exit. Every request is taken by a worker finding the queue empty,
+        so no job is left waiting because of it.
+
+        Parameters:
+            count (int): The number of workers to retire.
+
+        Returns:
+            None
+        """
+        with self.condition:
+            self.retirements.extend([True] * count)
+            self.condition.notify(count)
+
+    def num_of_threads(self):
+        """
+        Returns:
+            int: The number of worker threads, not counting the ones asked to retire.
+        """
+        with self.condition:
+            self.workers = [worker for worker in self.workers if worker.is_alive()]
+            active = sum(1 for worker in self.workers if not worker.retired)
+            return active - len(self.retirements)
 
     def is_running(self):
         """
@@ -79,27 +198,60 @@ class TaskRunner(Thread):
         Thread (class): The Thread class from the threading module.
 
     Attributes:
-        job_queue (Queue): A queue containing the jobs to be processed.
-        job_status (dict): A dictionary to store the status of each job.
+        job_queue (JobScheduler): A cost-aware priority queue containing the jobs to be processed.
+        job_status (JobStore): The status of each job.
         shutdown_notification (list): A flag indicating whether the task runner should shut down.
         condition (Condition): A threading condition for synchronization.
-        table (DataFrame): The data table for processing jobs.
+        data_ingestor (DataIngestor): An object providing access to the data for processing, the
+            dataset of the job being executed if `datasets` is given (None between jobs).
+        datasets (DatasetRegistry): The datasets the jobs are executed on, None to execute them on
+            `data_ingestor`.
+        retirements (list): The pending requests for idle workers to exit, shared by the pool's workers.
+        retired (bool): Whether the task runner took a retirement request and is exiting.
         questions_best_is_min (list): A list of questions where lower values are considered 'best'.
         questions_best_is_max (list): A list of questions where higher values are considered 'best'.
         logger (Logger): An object providing access to the logger.
     """
 
-    def __init__(self, job_queue, job_status, shutdown_notification, condition, data_ingestor, logger):
+    def __init__(self, job_queue, job_status, shutdown_notification, condition, data_ingestor, logger,
+                 retirements=None, datasets=None):
         Thread.__init__(self)
         self.job_queue = job_queue
         self.job_status = job_status
         self.shutdown_notification = shutdown_notification
         self.condition = condition
-        self.table = data_ingestor.table
-        self.questions_best_is_min = data_ingestor.questions_best_is_min
-        self.questions_best_is_max = data_ingestor.questions_best_is_max
+        self.data_ingestor = data_ingestor
+        self.datasets = datasets
+        self.retirements = retirements if retirements is not None else []
+        self.retired = False
+        self.questions_best_is_min = QUESTIONS_BEST_IS_MIN
+        self.questions_best_is_max = QUESTIONS_BEST_IS_MAX
         self.logger = logger
 
+    def select_dataset(self, name):
+        """
+        Selects the dataset the next job is executed on, loading it if needed.
+
+        Parameters:
+            name (str): The name of the dataset, None for the default dataset.
+
+        Returns:
+            None
+        """
+        if self.datasets is not None:
+            self.data_ingestor = self.datasets.get(name)
+
+    def release_dataset(self):
+        """
+        Drops the reference to the dataset of the finished job, so an idle worker does not keep
+        a dataset alive after the DatasetRegistry unloaded it.
+
+        Returns:
+            None
+        """
+        if self.datasets is not None:
+            self.data_ingestor = None
+
     def save_job_to_disk(self, result, job_id):
         """
         Saves the given result to a JSON file on disk with the "job_id_{job_id}.json" format.
@@ -111,8 +263,7 @@ class TaskRunner(Thread):
         Returns:
             None
         """
-        with open(f"./results/job_id_{job_id}.json", "w", encoding="utf-8") as output_file:
-            json.dump(result, output_file, sort_keys=False)
+        save_result(result, job_id)
 
     def exec_states_mean(self, question, job_id):
         """
@@ -127,15 +278,11 @@ class TaskRunner(Thread):
         """
         self.logger.info("Executing job with id %s, input: '%s'", job_id, question)
 
-        states_mean = []
-
-        # Filter table by Question column values and group by state afterwards
-        filtered_table = self.table.loc[self.table["Question"] == question]
-        for state, table in filtered_table.groupby("LocationDesc"):
-            states_mean.append((state, table["Data_Value"].mean()))
+        # Get the per-state means of the question, shared with the other job types
+        states_mean = self.data_ingestor.question_cache.state_means(question)
 
         # Sort data by value
-        states_mean = dict(sorted(states_mean, key=lambda state: state[1]))
+        states_mean = dict(sorted(states_mean.items(), key=lambda state: state[1]))
 
         # Save the result on disk
         self.save_job_to_disk(states_mean, job_id)
@@ -156,14 +303,11 @@ class TaskRunner(Thread):
         """
         self.logger.info("Executing job with id %s, input: '%s', '%s'", job_id, question, state)
 
-        # Filter table by Question and LocationDesc columns values
-        filtered_table = self.table.loc[
-            (self.table["Question"] == question) &
-            (self.table["LocationDesc"] == state)
-        ]
+        # Take the state from the per-state means of the question
+        states_mean = self.data_ingestor.question_cache.state_means(question)
 
         # Save the result on disk
-        state_mean = {state: filtered_table["Data_Value"].mean()}
+        state_mean = {state: states_mean.get(state, float("nan"))}
         self.save_job_to_disk(state_mean, job_id)
 
         self.logger.info("Result %s saved on disk", state_mean)
@@ -182,12 +326,8 @@ class TaskRunner(Thread):
         """
         self.logger.info("Executing job with id %s, %s case, input: '%s'", job_id, 'best' if best is True else 'worst', question)
 
-        states_top5 = []
-
-        # Filter table by Question column values and group by state afterwards
-        filtered_table = self.table.loc[self.table["Question"] == question]
-        for state, table in filtered_table.groupby("LocationDesc"):
-            states_top5.append((state, table["Data_Value"].mean()))
+        # Get the per-state means of the question, shared with the other job types
+        states_top5 = self.data_ingestor.question_cache.state_means(question).items()
 
         # Sort data by value depending on the question and best/worst case
         if question in self.questions_best_is_min:
@@ -213,11 +353,8 @@ class TaskRunner(Thread):
         """
         self.logger.info("Executing job with id %s, input: '%s'", job_id, question)
 
-        # Filter table by Question column values
-        filtered_table = self.table.loc[self.table["Question"] == question]
-
-        # Save the result on disk
-        global_mean = {"global_mean": filtered_table["Data_Value"].mean()}
+        # Save the global mean of the question on disk
+        global_mean = {"global_mean": self.data_ingestor.question_cache.global_mean(question)}
         self.save_job_to_disk(global_mean, job_id)
 
         self.logger.info("Result %s saved on disk", global_mean)
@@ -235,14 +372,10 @@ class TaskRunner(Thread):
         """
         self.logger.info("Executing job with id %s, input: '%s'", job_id, question)
 
-        # Filter table by Question column values
-        filtered_table = self.table.loc[self.table["Question"] == question]
-        global_mean = filtered_table["Data_Value"].mean()
-
-        # Group filtered table by LocationDesc column values
-        diff_states_mean = []
-        for state, table in filtered_table.groupby("LocationDesc"):
-            diff_states_mean.append((state, global_mean - table["Data_Value"].mean()))
+        # Get the global and per-state means of the question
+        global_mean = self.data_ingestor.question_cache.global_mean(question)
+        states_mean = self.data_ingestor.question_cache.state_means(question)
+        diff_states_mean = [(state, global_mean - value) for state, value in states_mean.items()]
 
         # Sort data by value
         diff_states_mean = dict(sorted(diff_states_mean, key=lambda state: state[1], reverse=True))
@@ -266,15 +399,12 @@ class TaskRunner(Thread):
         """
         self.logger.info("Executing job with id %s, input: '%s', '%s'", job_id, question, state)
 
-        # Filter table by Question column values to calculate global mean
-        filtered_table = self.table.loc[self.table["Question"] == question]
-        global_mean = filtered_table["Data_Value"].mean()
-
-        # Further filter the table by LocationDesc column values
-        filtered_table = filtered_table.loc[filtered_table["LocationDesc"] == state]
+        # Get the global mean and the mean of the state
+        global_mean = self.data_ingestor.question_cache.global_mean(question)
+        state_mean = self.data_ingestor.question_cache.state_means(question).get(state, float("nan"))
 
         # Save the result on disk
-        state_diff_states_mean = {state: global_mean - filtered_table["Data_Value"].mean()}
+        state_diff_states_mean = {state: global_mean - state_mean}
         self.save_job_to_disk(state_diff_states_mean, job_id)
 
         self.logger.info("Result %s saved on disk", state_diff_states_mean)
@@ -292,12 +422,12 @@ class TaskRunner(Thread):
         """
         self.logger.info("Executing job with id %s, input: '%s'", job_id, question)
 
-        category_mean = {}
-
-        # Filter table by Question column values, then group by categories
-        filtered_table = self.table.loc[self.table["Question"] == question]
-        for category, table in filtered_table.groupby(["LocationDesc", "StratificationCategory1", "Stratification1"]):
-            category_mean[str(category)] = table["Data_Value"].mean()
+        # Flatten the per-category means of the question, shared with state_mean_by_category
+        category_mean = {
+            str((state,) + category): value
+            for state, state_means in self.data_ingestor.question_cache.category_means(question).items()
+            for category, value in state_means.items()
+        }
 
         # Save the result on disk
         self.save_job_to_disk(category_mean, job_id)
@@ -318,61 +448,244 @@ class TaskRunner(Thread):
         """
         self.logger.info("Executing job with id %s, input: '%s', '%s'", job_id, question, state)
 
-        state_category_mean = {}
-
-        # Filter table by Question and LocationDesc columns values, then group by categories
-        filtered_table = self.table.loc[
-            (self.table["Question"] == question) & (self.table["LocationDesc"] == state)
-        ]
-        for category, table in filtered_table.groupby(["StratificationCategory1", "Stratification1"]):
-            state_category_mean[str(category)] = table["Data_Value"].mean()
+        # Take the state from the per-category means of the question
+        state_category_mean = self.data_ingestor.question_cache.category_means(question).get(state, {})
+        state_category_mean = {str(category): value for category, value in state_category_mean.items()}
 
         # Save the result on disk
         self.save_job_to_disk({state: state_category_mean}, job_id)
 
         self.logger.info("Result %s saved on disk", state_category_mean)
 
+    def exec_states_stats(self, question, job_id):
+        """
+        Executes the job to calculate summary statistics (count, mean, confidence-weighted mean,
+        standard deviation, minimum, median, 90th percentile and maximum) for states based on a given question.
+
+        Parameters:
+            question (str): The question for which to calculate the statistics.
+            job_id (int): The ID of the job.
+
+        Returns:
+            None
+        """
+        self.logger.info("Executing job with id %s, input: '%s'", job_id, question)
+
+        # Select the rows of the question and group by state afterwards
+        filtered_table = self.data_ingestor.select(question)
+        states_stats = GroupStats(
+            [filtered_table["LocationDesc"]],
+            filtered_table["Data_Value"],
+            filtered_table[WEIGHT_COLUMN]
+        ).summary()
+
+        # Save the result on disk
+        self.save_job_to_disk(states_stats, job_id)
+
+        self.logger.info("Result %s saved on disk", states_stats)
+
+    def exec_stats_by_category(self, question, job_id):
+        """
+        Executes the job to calculate summary statistics (see exec_states_stats()) by category for a given question.
+
+        Parameters:
+            question (str): The question for which to calculate the statistics.
+            job_id (int): The ID of the job.
+
+        Returns:
+            None
+        """
+        self.logger.info("Executing job with id %s, input: '%s'", job_id, question)
+
+        # Select the rows of the question, then group by categories
+        filtered_table = self.data_ingestor.select(question)
+        category_stats = GroupStats(
+            [filtered_table[column] for column in ["LocationDesc", "StratificationCategory1", "Stratification1"]],
+            filtered_table["Data_Value"],
+            filtered_table[WEIGHT_COLUMN]
+        ).summary()
+        category_stats = {str(category): stats for category, stats in category_stats.items()}
+
+        # Save the result on disk
+        self.save_job_to_disk(category_stats, job_id)
+
+        self.logger.info("Result %s saved on disk", category_stats)
+
+    def exec_query(self, filters, group_by, function, job_id):
+        """
+        Executes a generic query: filters the table, groups it and aggregates the Data_Value column.
+
+        Parameters:
+            filters (dict): The filters to apply, see DataIngestor.filter_rows().
+            group_by (list): The columns to group by, an empty list for a single aggregate.
+            function (str): The aggregate to calculate, one of AGGREGATES.
+            job_id (int): The ID of the job.
+
+        Returns:
+            None
+        """
+        self.logger.info("Executing job with id %s, input: %s, %s, '%s'", job_id, filters, group_by, function)
+
+        # Find the matching rows using the bitmap indexes
+        rows = self.data_ingestor.filter_rows(filters)
+        table = self.data_ingestor.table
+        values = table["Data_Value"].to_numpy()[rows]
+        weights = table[WEIGHT_COLUMN].to_numpy()[rows]
+
+        if group_by:
+            keys = [table[column].to_numpy()[rows] for column in group_by]
+            result = group_aggregate(keys, values, function, weights)
+            result = {
+                str(key) if isinstance(key, tuple) else key: value
+                for key, value in result.items()
+            }
+        else:
+            result = {function: aggregate(values, function, weights)}
+
+        # Save the result on disk
+        self.save_job_to_disk(result, job_id)
+
+        self.logger.info("Result %s saved on disk", result)
+
+    def execute_job(self, request, data, job_id):
+        """
+        Executes a job by calling the execution routine specific to its type.
+
+        Parameters:
+            request (str): The type of the job.
+            data (list): The query received from the client.
+            job_id (int): The ID of the job.
+
+        Returns:
+            None
+        """
+        if request == "states_mean":
+            self.exec_states_mean(data[0], job_id)
+        elif request == "state_mean":
+            self.exec_state_mean(data[0], data[1], job_id)
+        elif request == "best5":
+            self.exec_top5(data[0], job_id)
+        elif request == "worst5":
+            self.exec_top5(data[0], job_id, best=False)
+        elif request == "global_mean":
+            self.exec_global_mean(data[0], job_id)
+        elif request == "diff_from_mean":
+            self.exec_diff_from_mean(data[0], job_id)
+        elif request == "state_diff_from_mean":
+            self.exec_state_diff_from_mean(data[0], data[1], job_id)
+        elif request == "mean_by_category":
+            self.exec_mean_by_category(data[0], job_id)
+        elif request == "state_mean_by_category":
+            self.exec_state_mean_by_category(data[0], data[1], job_id)
+        elif request == "states_stats":
+            self.exec_states_stats(data[0], job_id)
+        elif request == "stats_by_category":
+            self.exec_stats_by_category(data[0], job_id)
+        elif request == "query":
+            self.exec_query(data[0] or {}, data[1] or [], data[2] or "mean", job_id)
 
     def run(self):
         self.logger.info("Started successfully")
 
         # Repeat until graceful_shutdown and empty queue
-        with self.condition:
-            while not (self.shutdown_notification and self.job_queue.empty()):
+        while True:
+            with self.condition:
                 # Put all workers on hold as long as there are no jobs
-                if self.job_queue.empty():
+                while self.job_queue.empty() and not self.shutdown_notification and not self.retirements:
                     self.logger.info("No pending jobs, waiting")
                     self.condition.wait()
                     self.logger.info("Received wake up notification from dispatcher")
-                else:
-                    # Get pending job
-                    job = self.job_queue.get()
-                    request = job[0]
-                    data = job[1]
-                    job_id = job[2]
-                    self.logger.info("Got job '%s', %s with id %s", request, data, job_id)
-
-                    # Execute the job and save the result to disk
-                    if request == "states_mean":
-                        self.exec_states_mean(data[0], job_id)
-                    elif request == "state_mean":
-                        self.exec_state_mean(data[0], data[1], job_id)
-                    elif request == "best5":
-                        self.exec_top5(data[0], job_id)
-                    elif request == "worst5":
-                        self.exec_top5(data[0], job_id, best=False)
-                    elif request == "global_mean":
-                        self.exec_global_mean(data[0], job_id)
-                    elif request == "diff_from_mean":
-                        self.exec_diff_from_mean(data[0], job_id)
-                    elif request == "state_diff_from_mean":
-                        self.exec_state_diff_from_mean(data[0], data[1], job_id)
-                    elif request == "mean_by_category":
-                        self.exec_mean_by_category(data[0], job_id)
-                    elif request == "state_mean_by_category":
-                        self.exec_state_mean_by_category(data[0], data[1], job_id)
-
-                    # Mark job as done
-                    self.job_status[job[-1]] = "done"
-                    self.logger.info("Finished job with id %s", job_id)
-            self.logger.info("Shutting down")
+
+                if self.job_queue.empty():
+                    # Idle workers take the requests to shrink the pool
+                    if self.retirements and not self.shutdown_notification:
+                        self.retirements.pop()
+                        self.retired = True
+                        self.logger.info("Retiring")
+                    break
+
+                # Get pending job, the lock is released before executing it
+                job = self.job_queue.get()
+
+            for batched_job in self.take_batch(job):
+                self.process_job(batched_job)
+        self.logger.info("Shutting down")
+
+    def take_batch(self, job):
+        """
+        Takes from the queue the jobs for the same question (and dataset) as the given job, to be executed together.
+
+        The jobs of a batch run back to back on this worker, so the intermediate results of their
+        question (see QuestionCache) are computed once, instead of concurrently by several workers.
+        Batching is configured by the `batch_size` and `batch_window` of the JobScheduler.
+
+        The worker only waits `batch_window` seconds for more jobs when a burst for the question is
+        already arriving (other jobs for it were queued, but not enough to fill the batch): a lone
+        job is executed right away. The trade-off is that the first job of a burst is not batched
+        with the jobs submitted just after it. While the worker waits, the jobs it took count as
+        being executed and can no longer be cancelled.
+
+        Parameters:
+            job (list): The job taken from the queue.
+
+        Returns:
+            list: The job, followed by the other jobs of the batch.
+        """
+        key = batch_key(job)
+        if key is None or self.job_queue.batch_size <= 1:
+            return [job]
+
+        def same_key(other):
+            return batch_key(other) == key
+
+        batch = [job] + self.job_queue.take(same_key, self.job_queue.batch_size - 1)
+
+        # Give the rest of a burst a chance to be queued, without delaying the lone jobs
+        if 1 < len(batch) < self.job_queue.batch_size and self.job_queue.batch_window > 0:
+            time.sleep(self.job_queue.batch_window)
+            batch += self.job_queue.take(same_key, self.job_queue.batch_size - len(batch))
+        if len(batch) > 1:
+            self.logger.info("Batched %s jobs for question '%s' of dataset '%s'",
+                             len(batch), key[1], key[0])
+        return batch
+
+    def process_job(self, job):
+        """
+        Executes a job taken from the queue and marks it as done, unless it must be skipped.
+
+        A job whose execution fails (e.g. its dataset cannot be loaded) is marked as "error",
+        without stopping the worker. Either way, the job is reported as finished to the queue.
+
+        Parameters:
+            job (list): The job.
+
+        Returns:
+            None
+        """
+        request = job[0]
+        data = job[1]
+        job_id = job[2]
+        self.logger.info("Got job '%s', %s with id %s", request, data, job_id)
+
+        duration = None
+        try:
+            # Skip the jobs nobody waits for anymore
+            if skip_job(job, self.job_status, self.logger):
+                return
+
+            start_time = time.perf_counter()
+
+            # Execute the job on its dataset and save the result to disk
+            self.select_dataset(job[4])
+            self.execute_job(request, data, job_id)
+
+            # Mark job as done, its duration updates the expected cost of its type
+            self.job_status[job_id] = "done"
+            duration = time.perf_counter() - start_time
+            self.logger.info("Finished job with id %s", job_id)
+        except Exception:
+            self.logger.exception("Job with id %s failed", job_id)
+            self.job_status[job_id] = "error"
+        finally:
+            self.release_dataset()
+            self.job_queue.task_done(job, duration)
@@ -0,0 +1,176 @@
+"""
+Remote worker process, executing the jobs of a webserver started with TP_BROKER_PORT.
+
+Usage:
+    python app/worker.py --broker 127.0.0.1:5001 --csv ./nutrition_activity_obesity_usa_subset.csv --threads 4
+
+The worker must know the same datasets as the webserver (its TP_DATASETS, given as --datasets).
+"""
+import argparse
+import logging
+import os
+import socket
+import time
+from threading import Event, Lock, Thread
+
+try:
+    from .broker import send_message, receive_message
+    from .dataset_registry import DatasetRegistry, DEFAULT_DATASET, parse_datasets
+    from .task_runner import TaskRunner
+except ImportError:
+    from broker import send_message, receive_message
+    from dataset_registry import DatasetRegistry, DEFAULT_DATASET, parse_datasets
+    from task_runner import TaskRunner
+
+
+class RemoteTaskRunner(TaskRunner):
+    """
+    A TaskRunner pulling its jobs from a JobBroker over TCP, instead of a local queue.
+
+    The jobs are executed with the same routines as the local workers, but the results are sent
+    back to the broker instead of being saved on disk. While a job is executed, a heartbeat is sent
+    every `heartbeat_interval` seconds, so that the broker does not re-queue it.
+
+    Parameters:
+        address (tuple): The (host, port) address of the broker.
+        datasets (DatasetRegistry): The datasets the jobs are executed on.
+        logger (Logger): An object providing access to the logger.
+        heartbeat_interval (float): The number of seconds between two heartbeats.
+    """
+
+    def __init__(self, address, datasets, logger, heartbeat_interval=2.0):
+        TaskRunner.__init__(self, None, None, None, None, None, logger, datasets=datasets)
+        self.address = address
+        self.heartbeat_interval = heartbeat_interval
+        self.result = None
+
+    def save_job_to_disk(self, result, job_id):
+        """
+        Keeps the result of the job, to be sent to the broker.
+
+        Parameters:
+            result (dict): The result of the job.
+            job_id (int): The ID of the job.
+
+        Returns:
+            None
+        """
+        self.result = result
+        self.logger.info("Result of job with id %s kept, to be sent to the broker", job_id)
+
+    def run(self):
+        self.logger.info("Connecting to the broker at %s:%s", *self.address)
+        with socket.create_connection(self.address) as connection, \
+                connection.makefile("rwb") as stream:
+            lock = Lock()
+            stopped = Event()
+
+            def call(message):
+                # Every message gets exactly one reply, the heartbeats may not interleave with them
+                with lock:
+                    send_message(stream, message)
+                    return receive_message(stream)
+
+            def heartbeat():
+                while not stopped.wait(self.heartbeat_interval):
+                    try:
+                        call({"type": "heartbeat"})
+                    except (OSError, ValueError):
+                        return
+
+            heartbeat_thread = Thread(target=heartbeat, name=f"{self.name}-heartbeat", daemon=True)
+            heartbeat_thread.start()
+            try:
+                self.process_jobs(call)
+            finally:
+                stopped.set()
+        self.logger.info("Shutting down")
+
+    def process_jobs(self, call):
+        """
+        Pulls and executes jobs until the broker sends the shutdown message.
+
+        Parameters:
+            call (callable): Sends a message to the broker and returns its reply.
+
+        Returns:
+            None
+        """
+        while True:
+            reply = call({"type": "pull", "wait": self.heartbeat_interval})
+            if reply is None or reply["type"] == "shutdown":
+                break
+            if reply["type"] != "job":
+                continue
+
+            request, data, job_id = reply["job"][:3]
+            self.logger.info("Got job '%s', %s with id %s", request, data, job_id)
+
+            start_time = time.perf_counter()
+            # A job type without a routine saves nothing, no result of a previous job may be sent
+            self.result = None
+            try:
+                self.select_dataset(reply["job"][4])
+                self.execute_job(request, data, job_id)
+                message = {
+                    "type": "result",
+                    "job_id": job_id,
+                    "result": self.result,
+                    "duration": time.perf_counter() - start_time
+                }
+            except Exception as error:
+                # The broker marks the job as failed, the worker goes on with the next jobs
+                self.logger.exception("Job with id %s failed", job_id)
+                message = {"type": "result", "job_id": job_id, "error": str(error)}
+            finally:
+                self.release_dataset()
+            reply = call(message)
+            self.logger.info("Sent result of job with id %s, broker replied %s", job_id, reply)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Executes the jobs of a webserver's job broker.")
+    parser.add_argument("--broker", default="127.0.0.1:5001",
+                        help="the host:port address of the broker (TP_BROKER_PORT of the webserver)")
+    parser.add_argument("--csv", default="./nutrition_activity_obesity_usa_subset.csv",
+                        help="the default dataset, the same one used by the webserver")
+    parser.add_argument("--datasets", default="",
+                        help="the other datasets, as name=path pairs separated by commas (TP_DATASETS)")
+    parser.add_argument("--default-dataset", default=DEFAULT_DATASET,
+                        help="the name of the default dataset (TP_DEFAULT_DATASET)")
+    parser.add_argument("--memory-budget", type=int, default=None,
+                        help="the maximum memory (bytes) of the loaded datasets")
+    parser.add_argument("--threads", type=int, default=os.cpu_count(),
+                        help="the number of jobs executed in parallel")
+    parser.add_argument("--heartbeat", type=float, default=2.0,
+                        help="the number of seconds between two heartbeats")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="[%(asctime)s %(levelname)s] %(threadName)s.%(funcName)s(): %(message)s"
+    )
+    logger = logging.getLogger("worker")
+
+    host, port = args.broker.rsplit(":", 1)
+    datasets = DatasetRegistry(
+        {DEFAULT_DATASET: args.csv, **parse_datasets(args.datasets)},
+        logger,
+        args.default_dataset,
+        args.memory_budget
+    )
+    logger.info("Importing CSV data")
+    datasets.get()
+
+    workers = [
+        RemoteTaskRunner((host, int(port)), datasets, logger, args.heartbeat)
+        for _ in range(args.threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+from .stats_client import StatsClient, AsyncStatsClient, JobError
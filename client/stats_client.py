@@ -0,0 +1,342 @@
+"""
+Python client for the webserver's /api/* contract.
+
+Usage:
+    with StatsClient("http://127.0.0.1:5000") as client:
+        job_ids = client.submit_many([("best5", {"question": question}) for question in questions])
+        results = client.results(job_ids)
+"""
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Delays between two polls of an unfinished job, in seconds: the first one, the growth factor
+# and the upper bound
+INITIAL_POLL_DELAY = 0.05
+POLL_DELAY_FACTOR = 1.5
+MAX_POLL_DELAY = 2.0
+
+# Long-poll wait requested from the servers supporting it (the ASGI front-end), in seconds
+LONG_POLL_WAIT = 10.0
+
+# Maximum number of jobs per bulk result request, as accepted by the server
+MAX_BULK_JOBS = 1000
+
+
+class JobError(Exception):
+    """
+    Raised when a job is rejected or ends without a result.
+
+    Parameters:
+        status (str): The status of the job ("error", "cancelled" or "expired").
+        reason (str): The reason given by the server, if any.
+        job_id (int): The ID of the job, None if it was rejected on submission.
+    """
+
+    def __init__(self, status, reason=None, job_id=None):
+        Exception.__init__(self, f"Job {job_id}: {status}" + (f" ({reason})" if reason else ""))
+        self.status = status
+        self.reason = reason
+        self.job_id = job_id
+
+
+class _NoBulkEndpoint(Exception):
+    """
+    Raised when the server has no bulk result endpoint, so the jobs have to be polled one by one.
+    """
+
+
+def poll_delays(initial=INITIAL_POLL_DELAY, factor=POLL_DELAY_FACTOR, maximum=MAX_POLL_DELAY):
+    """
+    Yields the delays between the polls of an unfinished job: short at first, for the cheap jobs,
+    then growing geometrically, so the long jobs do not cost the server a request every few
+    milliseconds.
+    """
+    delay = initial
+    while True:
+        yield delay
+        delay = min(delay * factor, maximum)
+
+
+class StatsClient:
+    """
+    A client submitting jobs to the webserver and waiting for their results.
+
+    All the requests share a keep-alive session with a pool of `max_connections` connections, so
+    no connection is opened per call. Many jobs are submitted concurrently (`submit_many()`), and
+    their results are collected with the bulk streaming endpoint, falling back to polling each
+    job with an adaptive backoff on servers without it. Single results are long-polled where the
+    server supports it. Submissions rejected by the admission control (HTTP 429) are retried
+    after the Retry-After delay.
+
+    Parameters:
+        base_url (str): The address of the webserver.
+        max_connections (int): The size of the connection pool, also the number of concurrent
+            submissions.
+        client_id (str): Sent as X-Client-Id, for the per-client admission control limits.
+        timeout (float): The timeout of a single HTTP request, in seconds.
+        max_retries (int): How many times a rejected (HTTP 429) submission is retried.
+    """
+
+    def __init__(self, base_url="http://127.0.0.1:5000", max_connections=10, client_id=None,
+                 timeout=30.0, max_retries=5):
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if client_id is not None:
+            self.session.headers["X-Client-Id"] = client_id
+        self._executor = ThreadPoolExecutor(max_connections, thread_name_prefix="StatsClient")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Closes the pooled connections.
+
+        Returns:
+            None
+        """
+        self._executor.shutdown()
+        self.session.close()
+
+    def submit(self, request_name, body):
+        """
+        Submits a job.
+
+        Parameters:
+            request_name (str): The job type, e.g. "best5".
+            body (dict): The request JSON, including the optional "dataset", "priority" and
+                "deadline" fields.
+
+        Returns:
+            int: The ID of the job.
+
+        Raises:
+            JobError: If the request is invalid, the server is shutting down or the job is still
+                rejected after `max_retries` retries.
+        """
+        for attempt in range(self.max_retries + 1):
+            response = self.session.post(f"{self.base_url}/api/{request_name}", json=body,
+                                         timeout=self.timeout)
+            result = response.json()
+            if response.status_code == 429 and attempt < self.max_retries:
+                time.sleep(float(response.headers.get("Retry-After", 1)))
+                continue
+            if result.get("status") != "queued":
+                raise JobError(result.get("status"), result.get("reason"))
+            return result["job_id"]
+        raise JobError("error", "Rejected by the admission control")
+
+    def submit_many(self, jobs):
+        """
+        Submits jobs concurrently, over the pooled connections.
+
+        Parameters:
+            jobs (list): The (request_name, body) pairs of the jobs.
+
+        Returns:
+            list: The IDs of the jobs, in the given order.
+        """
+        return list(self._executor.map(lambda job: self.submit(*job), jobs))
+
+    def result(self, job_id, timeout=None):
+        """
+        Waits for a job to finish and returns its result.
+
+        The server is asked to long-poll (the "wait" parameter, ignored by the servers without
+        long-polling), and the job is polled again with growing delays while it is running.
+
+        Parameters:
+            job_id (int): The ID of the job.
+            timeout (float): The maximum number of seconds to wait, None for no limit.
+
+        Returns:
+            The result of the job.
+
+        Raises:
+            JobError: If the job ends without a result or the job ID is invalid.
+            TimeoutError: If the job is not finished after `timeout` seconds.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        for delay in poll_delays():
+            wait = LONG_POLL_WAIT
+            if deadline is not None:
+                wait = max(0.0, min(wait, deadline - time.monotonic()))
+            response = self.session.get(f"{self.base_url}/api/get_results/{job_id}",
+                                        params={"wait": wait}, timeout=self.timeout + wait)
+            entry = response.json()
+            if entry["status"] != "running":
+                return self._job_data(job_id, entry)
+            if deadline is not None and time.monotonic() + delay > deadline:
+                raise TimeoutError(f"Job {job_id} not finished after {timeout} s")
+            time.sleep(delay)
+        return None
+
+    def results(self, job_ids, timeout=None):
+        """
+        Waits for jobs to finish and returns their results, with as few requests as possible.
+
+        The results are streamed by the bulk result endpoint as the jobs finish; on servers
+        without it, every job is polled with growing delays.
+
+        Parameters:
+            job_ids (list): The IDs of the jobs.
+            timeout (float): The maximum number of seconds to wait, None for no limit.
+
+        Returns:
+            dict: The result of every job, by job ID.
+
+        Raises:
+            JobError: If a job ends without a result (after all the other results were received).
+            TimeoutError: If some jobs are not finished after `timeout` seconds.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        entries = {}
+        pending = list(dict.fromkeys(job_ids))
+        while pending:
+            wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+            # The bulk requests are limited to MAX_BULK_JOBS jobs, the chunks are streamed in parallel
+            chunks = [pending[start:start + MAX_BULK_JOBS]
+                      for start in range(0, len(pending), MAX_BULK_JOBS)]
+            try:
+                for streamed in self._executor.map(self._stream_results, chunks, [wait] * len(chunks)):
+                    entries.update(streamed)
+            except _NoBulkEndpoint:
+                polled = self._executor.map(self._poll_entry, pending, [deadline] * len(pending))
+                entries.update(zip(pending, polled))
+
+            # The jobs missing from an interrupted stream are requested again
+            pending = [job_id for job_id in pending
+                       if entries.get(job_id, {"status": "running"})["status"] == "running"]
+            if pending and deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"{len(pending)} jobs not finished after {timeout} s")
+
+        return {job_id: self._job_data(job_id, entries[job_id])
+                for job_id in dict.fromkeys(job_ids)}
+
+    def run_many(self, jobs, timeout=None):
+        """
+        Submits jobs concurrently and waits for their results.
+
+        Parameters:
+            jobs (list): The (request_name, body) pairs of the jobs.
+            timeout (float): The maximum number of seconds to wait for the results.
+
+        Returns:
+            list: The results of the jobs, in the given order.
+        """
+        job_ids = self.submit_many(jobs)
+        results = self.results(job_ids, timeout)
+        return [results[job_id] for job_id in job_ids]
+
+    def _stream_results(self, job_ids, wait):
+        # Returns the entries received before the stream ended, the unfinished jobs included
+        body = {"job_ids": job_ids, "stream": True}
+        if wait is not None:
+            body["wait"] = wait
+        with self.session.post(f"{self.base_url}/api/get_results", json=body, stream=True,
+                               timeout=(self.timeout, None)) as response:
+            if response.status_code in (404, 405):
+                raise _NoBulkEndpoint(f"{response.status_code} from {response.url}")
+            if not response.headers.get("Content-Type", "").startswith("application/x-ndjson"):
+                result = response.json()
+                raise JobError(result.get("status"), result.get("reason"))
+            entries = {}
+            for line in response.iter_lines():
+                if line:
+                    entry = json.loads(line)
+                    entries[entry.pop("job_id")] = entry
+            return entries
+
+    def _poll_entry(self, job_id, deadline):
+        # Polls a job with growing delays, until it is finished or the deadline passes
+        for delay in poll_delays():
+            entry = self.session.get(f"{self.base_url}/api/get_results/{job_id}",
+                                     timeout=self.timeout).json()
+            if entry["status"] != "running":
+                return entry
+            if deadline is not None and time.monotonic() + delay > deadline:
+                return entry
+            time.sleep(delay)
+        return None
+
+    @staticmethod
+    def _job_data(job_id, entry):
+        if entry["status"] != "done":
+            raise JobError(entry["status"], entry.get("reason"), job_id)
+        return entry["data"]
+
+
+class AsyncStatsClient:
+    """
+    The asyncio API of StatsClient: the same methods, as coroutines.
+
+    The HTTP requests are made by a StatsClient in worker threads (at most `max_connections`
+    submissions at once, over the same pooled connections), so the event loop is never blocked.
+
+    Parameters:
+        Same as StatsClient.
+    """
+
+    def __init__(self, base_url="http://127.0.0.1:5000", max_connections=10, client_id=None,
+                 timeout=30.0, max_retries=5):
+        self.client = StatsClient(base_url, max_connections, client_id, timeout, max_retries)
+        self._slots = asyncio.Semaphore(max_connections)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """
+        Closes the pooled connections.
+        """
+        await asyncio.to_thread(self.client.close)
+
+    async def submit(self, request_name, body):
+        """
+        Submits a job, see StatsClient.submit().
+        """
+        async with self._slots:
+            return await asyncio.to_thread(self.client.submit, request_name, body)
+
+    async def submit_many(self, jobs):
+        """
+        Submits jobs concurrently, see StatsClient.submit_many().
+        """
+        return list(await asyncio.gather(*(self.submit(*job) for job in jobs)))
+
+    async def result(self, job_id, timeout=None):
+        """
+        Waits for a job to finish and returns its result, see StatsClient.result().
+        """
+        return await asyncio.to_thread(self.client.result, job_id, timeout)
+
+    async def results(self, job_ids, timeout=None):
+        """
+        Waits for jobs to finish and returns their results, see StatsClient.results().
+        """
+        return await asyncio.to_thread(self.client.results, job_ids, timeout)
+
+    async def run_many(self, jobs, timeout=None):
+        """
+        Submits jobs concurrently and waits for their results, see StatsClient.run_many().
+        """
+        job_ids = await self.submit_many(jobs)
+        results = await self.results(job_ids, timeout)
+        return [results[job_id] for job_id in job_ids]
@@ -0,0 +1,167 @@
+import argparse
+import copy
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from logging import getLogger
+import numpy as np
+from pandas import concat
+sys.path.append("../app/")
+from task_runner import TaskRunner
+from data_ingestor import DataIngestor
+
+
+CSV_PATH = "../nutrition_activity_obesity_usa_subset.csv"
+DEFAULT_SCALES = [1, 10, 100, 1000]
+
+# Scaling exponent above which a routine is reported as super-linear
+SUPER_LINEAR_THRESHOLD = 1.2
+
+
+def build_synthetic_ingestor(base_ingestor, scale, seed=0):
+    """
+    Builds a DataIngestor whose table is `scale` times larger than the original one.
+
+    The original rows are replicated `scale` times, so the question, state and stratification
+    distribution stays the same. The values of each replica (except the first one) receive
+    a small gaussian noise, NaN values being preserved.
+    """
+    if scale == 1:
+        return base_ingestor
+
+    rng = np.random.default_rng(seed)
+    table = concat([base_ingestor.table] * scale, ignore_index=True)
+    noise = rng.normal(0, 1, len(table))
+    noise[:len(base_ingestor.table)] = 0
+    table["Data_Value"] = table["Data_Value"].to_numpy() + noise
+
+    ingestor = copy.copy(base_ingestor)
+    ingestor.load_table(table)
+    return ingestor
+
+
+def build_workload(ingestor):
+    """
+    Builds the list of (routine name, callable) pairs to be measured.
+
+    Every routine is executed for every known question. The routines which also need a state
+    use the most frequent state in the table.
+    """
+    questions = ingestor.questions_best_is_min + ingestor.questions_best_is_max
+    state = ingestor.table["LocationDesc"].value_counts().index[0]
+
+    def for_all_questions(routine):
+        return lambda task_runner: [routine(task_runner, question) for question in questions]
+
+    return [
+        ("states_mean", for_all_questions(
+            lambda runner, question: runner.exec_states_mean(question, 0))),
+        ("state_mean", for_all_questions(
+            lambda runner, question: runner.exec_state_mean(question, state, 0))),
+        ("best5", for_all_questions(
+            lambda runner, question: runner.exec_top5(question, 0))),
+        ("worst5", for_all_questions(
+            lambda runner, question: runner.exec_top5(question, 0, best=False))),
+        ("global_mean", for_all_questions(
+            lambda runner, question: runner.exec_global_mean(question, 0))),
+        ("diff_from_mean", for_all_questions(
+            lambda runner, question: runner.exec_diff_from_mean(question, 0))),
+        ("state_diff_from_mean", for_all_questions(
+            lambda runner, question: runner.exec_state_diff_from_mean(question, state, 0))),
+        ("mean_by_category", for_all_questions(
+            lambda runner, question: runner.exec_mean_by_category(question, 0))),
+        ("state_mean_by_category", for_all_questions(
+            lambda runner, question: runner.exec_state_mean_by_category(question, state, 0))),
+        ("states_stats", for_all_questions(
+            lambda runner, question: runner.exec_states_stats(question, 0))),
+        ("stats_by_category", for_all_questions(
+            lambda runner, question: runner.exec_stats_by_category(question, 0))),
+        ("query", for_all_questions(
+            lambda runner, question: runner.exec_query(
+                {"Question": question, "YearStart": {"min": 2015, "max": 2020}},
+                ["LocationDesc", "StratificationCategory1"], "mean", 0))),
+    ]
+
+
+def measure(routine, task_runner, repeats):
+    """
+    Returns the best wall time (seconds) over `repeats` runs and the peak memory (bytes)
+    allocated by a single, separately traced, run of the routine.
+
+    The intermediate results shared by the job types are dropped before every run, so that the
+    routine is measured computing them (the first job for a question) instead of reusing them.
+    """
+    question_cache = task_runner.data_ingestor.question_cache
+    timings = []
+    for _ in range(repeats):
+        question_cache.clear()
+        start = time.perf_counter()
+        routine(task_runner)
+        timings.append(time.perf_counter() - start)
+
+    question_cache.clear()
+    tracemalloc.start()
+    routine(task_runner)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return min(timings), peak_memory
+
+
+def scaling_exponent(rows_a, time_a, rows_b, time_b):
+    """
+    Returns k from time ~ rows^k, estimated between two measurements.
+    """
+    if time_a <= 0 or time_b <= 0 or rows_a == rows_b:
+        return math.nan
+    return math.log(time_b / time_a) / math.log(rows_b / rows_a)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the TaskRunner execution routines.")
+    parser.add_argument("--csv", default=CSV_PATH, help="path to the original CSV file")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES,
+                        help="dataset size multipliers (default: 1 10 100 1000)")
+    parser.add_argument("--repeats", type=int, default=3, help="timed runs per routine and size")
+    parser.add_argument("--routines", nargs="+", help="only run the given routines")
+    args = parser.parse_args()
+
+    base_ingestor = DataIngestor(os.path.abspath(args.csv))
+
+    # Routines save their results in ./results, keep those out of the working tree
+    os.chdir(tempfile.mkdtemp(prefix="bench_routines_"))
+    os.mkdir("./results")
+
+    measurements = {}
+    print(f"{'routine':<24}{'scale':>7}{'rows':>12}{'time (ms)':>12}{'peak (MiB)':>12}{'exponent':>10}")
+    for scale in sorted(args.scales):
+        ingestor = build_synthetic_ingestor(base_ingestor, scale)
+        task_runner = TaskRunner(None, None, None, None, ingestor, getLogger())
+        rows = len(ingestor.table)
+
+        for name, routine in build_workload(ingestor):
+            if args.routines and name not in args.routines:
+                continue
+
+            elapsed, peak_memory = measure(routine, task_runner, args.repeats)
+
+            # Compare against the previous size measured for the same routine
+            exponent = math.nan
+            if name in measurements:
+                previous_rows, previous_elapsed = measurements[name]
+                exponent = scaling_exponent(previous_rows, previous_elapsed, rows, elapsed)
+            measurements[name] = (rows, elapsed)
+
+            flag = " super-linear" if exponent > SUPER_LINEAR_THRESHOLD else ""
+            print(f"{name:<24}{scale:>7}{rows:>12}{elapsed * 1000:>12.2f}"
+                  f"{peak_memory / 2 ** 20:>12.2f}{exponent:>10.2f}{flag}")
+
+        # Release the synthetic table before building the next one
+        del task_runner, ingestor
+
+
+if __name__ == '__main__':
+    main()
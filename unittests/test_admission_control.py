@@ -0,0 +1,115 @@
+import unittest
+import logging
+import sys
+import time
+from threading import Barrier, Thread
+sys.path.append("../app/")
+from job_scheduler import JobScheduler
+from admission_control import AdmissionController
+from task_runner import ThreadPool
+
+
+class FailingDatasets:
+    """
+    The part of the DatasetRegistry used by the workers, where no dataset can be loaded.
+    """
+
+    def get(self, name=None):
+        raise FileNotFoundError(name)
+
+
+class TestAdmissionControl(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = JobScheduler()
+
+    def submit(self, admission, job_id, client_id="client"):
+        return admission.admit(["state_mean", ["Question1", "Ohio"], job_id], client_id)
+
+    def finish(self):
+        job = self.scheduler.get()
+        self.scheduler.task_done(job, 0.001)
+
+    def test_unlimited(self):
+        admission = AdmissionController(self.scheduler)
+        for job_id in range(1, 101):
+            self.assertEqual(self.submit(admission, job_id), (None, None))
+
+    def test_queue_depth(self):
+        admission = AdmissionController(self.scheduler, max_queue_depth=3)
+        for job_id in range(1, 4):
+            self.assertIsNone(self.submit(admission, job_id)[0])
+
+        reason, retry_after = self.submit(admission, 4)
+        self.assertEqual(reason, "Queue is full")
+        self.assertGreaterEqual(retry_after, 1)
+
+        # Admitted again once a job was taken from the queue
+        self.finish()
+        self.assertIsNone(self.submit(admission, 4)[0])
+
+    def test_in_flight(self):
+        admission = AdmissionController(self.scheduler, max_in_flight=2)
+        self.submit(admission, 1)
+        self.submit(admission, 2)
+
+        # Taken from the queue, but not finished yet
+        job = self.scheduler.get()
+        self.assertEqual(self.submit(admission, 3)[0], "Too many jobs in flight")
+
+        self.scheduler.task_done(job, 0.001)
+        self.assertIsNone(self.submit(admission, 3)[0])
+
+    def test_per_client(self):
+        admission = AdmissionController(self.scheduler, max_jobs_per_client=2)
+        self.submit(admission, 1, "a")
+        self.submit(admission, 2, "a")
+        self.assertEqual(self.submit(admission, 3, "a")[0], "Too many unfinished jobs for this client")
+        self.assertIsNone(self.submit(admission, 3, "b")[0])
+
+        self.finish()
+        self.assertEqual(admission.client_jobs, {"a": 1, "b": 1})
+
+    def test_concurrent_submissions(self):
+        admission = AdmissionController(self.scheduler, max_in_flight=5, max_queue_depth=8)
+        start = Barrier(20)
+        admitted = []
+
+        def submit(job_id):
+            start.wait()
+            if self.submit(admission, job_id)[0] is None:
+                admitted.append(job_id)
+
+        threads = [Thread(target=submit, args=(job_id,)) for job_id in range(1, 21)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(admitted), 5)
+        self.assertEqual(self.scheduler.qsize(), 5)
+
+    def test_failed_jobs_release_slots(self):
+        logger = logging.getLogger(__name__)
+        logger.disabled = True
+        pool = ThreadPool(1, FailingDatasets(), logger, self.scheduler)
+        admission = AdmissionController(self.scheduler, max_in_flight=1, max_jobs_per_client=1)
+        try:
+            for job_id in range(1, 4):
+                self.assertIsNone(admission.admit(["noop", ["Q"], job_id, None, "bad"], "a")[0])
+                with pool.condition:
+                    pool.condition.notify()
+
+                # The failed job releases the slots of its client
+                end = time.monotonic() + 5
+                while admission.client_jobs and time.monotonic() < end:
+                    time.sleep(0.01)
+                self.assertEqual(admission.client_jobs, {})
+        finally:
+            pool.shutdown()
+            with pool.condition:
+                pool.condition.notify_all()
+            for worker in pool.workers:
+                worker.join(timeout=5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+import math
+import sys
+import numpy as np
+from pandas import DataFrame
+sys.path.append("../app/")
+from aggregator import GroupStats, group_aggregate, group_means, aggregate, mean
+
+
+class TestAggregator(unittest.TestCase):
+    def setUp(self):
+        # Random table with missing values in both the keys and the values
+        rng = np.random.default_rng(42)
+        size = 5000
+        values = rng.normal(30, 10, size)
+        values[rng.random(size) < 0.1] = np.nan
+        states = rng.choice(["Ohio", "Texas", "Guam", "Iowa", None], size, p=[0.3, 0.3, 0.2, 0.19, 0.01])
+        categories = rng.choice(["Age (years)", "Gender", "Income"], size)
+        strata = rng.choice(["A", "B", "C", "D"], size)
+
+        self.table = DataFrame({
+            "LocationDesc": states,
+            "StratificationCategory1": categories,
+            "Stratification1": strata,
+            "Data_Value": values
+        })
+
+        # Group where every value is missing
+        self.table.loc[len(self.table)] = ["Utah", "Gender", "A", np.nan]
+        self.table["Data_Value"] = self.table["Data_Value"].astype(float)
+
+    def assert_same_means(self, result, reference):
+        self.assertEqual(list(result.keys()), list(reference.keys()))
+        for key, value in reference.items():
+            if math.isnan(value):
+                self.assertTrue(math.isnan(result[key]))
+            else:
+                self.assertAlmostEqual(result[key], value, places=9)
+
+    def test_single_key(self):
+        reference = {
+            state: table["Data_Value"].mean()
+            for state, table in self.table.groupby("LocationDesc")
+        }
+        result = group_means([self.table["LocationDesc"]], self.table["Data_Value"])
+        self.assert_same_means(result, reference)
+
+    def test_multiple_keys(self):
+        columns = ["LocationDesc", "StratificationCategory1", "Stratification1"]
+        reference = {
+            category: table["Data_Value"].mean()
+            for category, table in self.table.groupby(columns)
+        }
+        result = group_means([self.table[column] for column in columns], self.table["Data_Value"])
+        self.assert_same_means(result, reference)
+
+    def test_other_aggregates(self):
+        columns = ["LocationDesc", "Stratification1"]
+        grouped = self.table.groupby(columns)["Data_Value"]
+        for function in ["min", "max", "count"]:
+            reference = getattr(grouped, function)().to_dict()
+            result = group_aggregate([self.table[column] for column in columns], self.table["Data_Value"], function)
+            self.assert_same_means(result, reference)
+            self.assertEqual(
+                aggregate(self.table["Data_Value"], function),
+                getattr(self.table["Data_Value"], function)()
+            )
+
+    def test_spread_statistics(self):
+        columns = ["LocationDesc", "StratificationCategory1"]
+        grouped = self.table.groupby(columns)["Data_Value"]
+        stats = GroupStats([self.table[column] for column in columns], self.table["Data_Value"])
+        self.assert_same_means(stats.to_dict("std"), grouped.std().to_dict())
+        self.assert_same_means(stats.to_dict("median"), grouped.median().to_dict())
+        self.assert_same_means(stats.to_dict("p90"), grouped.quantile(0.9).to_dict())
+
+    def test_weighted_mean(self):
+        weights = np.linspace(0.5, 2, len(self.table))
+        weighted = self.table.assign(Weight=weights).dropna(subset=["Data_Value"])
+        reference = {
+            state: np.average(table["Data_Value"], weights=table["Weight"])
+            for state, table in weighted.groupby("LocationDesc")
+        }
+        reference["Utah"] = np.nan
+        result = group_aggregate([self.table["LocationDesc"]], self.table["Data_Value"], "weighted_mean", weights)
+        self.assert_same_means(result, reference)
+
+    def test_empty_table(self):
+        empty = self.table.iloc[:0]
+        self.assertEqual(group_means([empty["LocationDesc"]], empty["Data_Value"]), {})
+        self.assertTrue(math.isnan(mean(empty["Data_Value"])))
+
+    def test_mean(self):
+        self.assertAlmostEqual(mean(self.table["Data_Value"]), self.table["Data_Value"].mean(), places=9)
+
+
+if __name__ == '__main__':
+    unittest.main()
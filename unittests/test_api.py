@@ -0,0 +1,247 @@
+import unittest
+import logging
+import os
+import json
+import shutil
+import sys
+import time
+import types
+from threading import Timer
+from unittest import mock
+sys.path.append("../app/")
+
+# api.py takes the Flask app from the app package, whose import starts the whole server: a stub
+# package gives it a fake webserver instead, the modules being loaded from ../app/ as usual. The
+# stub is shared with the other test modules doing the same (e.g. test_asgi.py)
+if "app" not in sys.modules:
+    app_package = types.ModuleType("app")
+    app_package.__path__ = [os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")]
+    app_package.webserver = types.SimpleNamespace(logger=logging.getLogger(__name__))
+    sys.modules["app"] = app_package
+
+from app import api
+from app.dataset_registry import DatasetRegistry
+from app.job_scheduler import JobScheduler
+from app.job_store import InMemoryJobStore
+from app.result_cache import ResultCache
+
+
+class TestValidateQuery(unittest.TestCase):
+    def test_valid(self):
+        self.assertIsNone(api.validate_query({}))
+        self.assertIsNone(api.validate_query({
+            "filters": {
+                "Question": "Q1",
+                "LocationDesc": ["Ohio", "Texas"],
+                "YearStart": {"min": 2015, "max": 2020},
+                "YearEnd": 2020
+            },
+            "group_by": ["LocationDesc"],
+            "aggregate": "p90"
+        }))
+
+    def test_bad_columns(self):
+        self.assertIsNotNone(api.validate_query({"filters": {"Data_Value": 3}}))
+        self.assertIsNotNone(api.validate_query({"filters": ["Question"]}))
+        self.assertIsNotNone(api.validate_query({"group_by": ["Data_Value"]}))
+        self.assertIsNotNone(api.validate_query({"group_by": "LocationDesc"}))
+        self.assertIsNotNone(api.validate_query({"aggregate": "mode"}))
+
+    def test_bad_ranges(self):
+        # Ranges only for the year columns, only with "min" and "max", only numeric bounds
+        self.assertIsNotNone(api.validate_query({"filters": {"Question": {"min": "A"}}}))
+        self.assertIsNotNone(api.validate_query({"filters": {"YearStart": {"from": 2015}}}))
+        self.assertIsNotNone(api.validate_query({"filters": {"YearStart": {"min": "2015"}}}))
+        self.assertIsNotNone(api.validate_query({"filters": {"YearStart": {"min": None}}}))
+        self.assertIsNotNone(api.validate_query({"filters": {"YearStart": {"max": True}}}))
+
+    def test_bad_value_types(self):
+        self.assertIsNotNone(api.validate_query({"filters": {"Question": [["x"]]}}))
+        self.assertIsNotNone(api.validate_query({"filters": {"Question": [{"a": 1}]}}))
+        self.assertIsNotNone(api.validate_query({"filters": {"Question": None}}))
+        self.assertIsNotNone(api.validate_query({"filters": {"LocationDesc": [None, "Ohio"]}}))
+        self.assertIsNotNone(api.validate_query({"filters": {"YearEnd": False}}))
+
+
+class TestValidateRequest(unittest.TestCase):
+    def setUp(self):
+        # Only the names are checked, no dataset is loaded
+        api.webserver.datasets = DatasetRegistry({"default": "unused.csv"}, logging.getLogger(__name__))
+
+    def test_valid(self):
+        self.assertIsNone(api.validate_request("best5", {"question": "Q"}, 0, None, "default"))
+        self.assertIsNone(api.validate_request("best5", {"question": "Q"}, -2.5, 30, "default"))
+
+    def test_bad_scheduling_fields(self):
+        self.assertIsNotNone(api.validate_request("best5", {}, 0, None, "other"))
+        self.assertIsNotNone(api.validate_request("best5", {}, "1", None, "default"))
+        self.assertIsNotNone(api.validate_request("best5", {}, True, None, "default"))
+        self.assertIsNotNone(api.validate_request("best5", {}, 0, 0, "default"))
+        # Accepted by Python's JSON parser, but they would break the order of the queue
+        for value in [float("nan"), float("inf"), float("-inf")]:
+            self.assertIsNotNone(api.validate_request("best5", {}, value, None, "default"))
+            self.assertIsNotNone(api.validate_request("best5", {}, 0, value, "default"))
+
+
+class TestJobResults(unittest.TestCase):
+    def setUp(self):
+        # The part of the webserver used to read the results: a job store, the queue reporting the
+        # finished jobs and the results folder
+        api.webserver.tasks_runner = types.SimpleNamespace(job_status=InMemoryJobStore(),
+                                                           job_queue=JobScheduler())
+        api.webserver.result_cache = ResultCache()
+        self.created_results = not os.path.isdir("./results")
+        os.makedirs("./results", exist_ok=True)
+        self.job_ids = []
+
+    def tearDown(self):
+        if self.created_results:
+            shutil.rmtree("./results", ignore_errors=True)
+        else:
+            for job_id in self.job_ids:
+                if os.path.exists(f"./results/job_id_{job_id}.json"):
+                    os.remove(f"./results/job_id_{job_id}.json")
+
+    def add_job(self, status="running", result=None):
+        job_id = api.webserver.tasks_runner.job_status.add_job(status)
+        self.job_ids.append(job_id)
+        if status == "done":
+            with open(f"./results/job_id_{job_id}.json", "w", encoding="utf-8") as file:
+                json.dump(result, file)
+        return job_id
+
+    def test_result_response(self):
+        running = self.add_job()
+        body, status_code, headers = api.job_result_response(running)
+        self.assertEqual((json.loads(body), status_code), ({"status": "running"}, 200))
+        self.assertEqual(headers["Cache-Control"], "no-cache")
+        self.assertNotIn("ETag", headers)
+
+        # The IDs are reused after a restart, so even final results are revalidated, with the ETag
+        done = self.add_job("done", {"Ohio": 1.5})
+        body, status_code, headers = api.job_result_response(done)
+        self.assertEqual((json.loads(body), status_code), ({"status": "done", "data": {"Ohio": 1.5}}, 200))
+        self.assertEqual(headers["Cache-Control"], "no-cache")
+
+        body, status_code, not_modified = api.job_result_response(done, if_none_match=headers["ETag"])
+        self.assertEqual((body, status_code), (b"", 304))
+        self.assertEqual(not_modified["ETag"], headers["ETag"])
+
+    def finish_job(self, job_id, result):
+        # What a worker does: save the result, then report the job to the queue
+        with open(f"./results/job_id_{job_id}.json", "w", encoding="utf-8") as file:
+            json.dump(result, file)
+        api.webserver.tasks_runner.job_status[job_id] = "done"
+        api.webserver.tasks_runner.job_queue.task_done(["noop", [], job_id, None, None])
+
+    def test_cancel_job(self):
+        tasks_runner = api.webserver.tasks_runner
+        queued = self.add_job()
+        tasks_runner.job_queue.put(["noop", [], queued, None, None])
+        # The done callbacks (e.g. streamed results) already see the new status
+        seen = []
+        tasks_runner.job_queue.add_done_callback(lambda job: seen.append(tasks_runner.job_status[job[2]]))
+        self.assertEqual(api.cancel_job(queued), {"status": "cancelled", "job_id": queued})
+        self.assertEqual(tasks_runner.job_status[queued], "cancelled")
+        self.assertEqual(seen, ["cancelled"])
+        self.assertEqual(tasks_runner.job_queue.unfinished_tasks, 0)
+        self.assertEqual(api.cancel_job(queued)["reason"], "Job is already cancelled")
+
+        # A running job missing from the queue was either taken by a worker or, with a shared job
+        # store, submitted to another process
+        running = self.add_job()
+        self.assertEqual(api.cancel_job(running)["reason"], "Job is already being executed")
+        tasks_runner.job_status.shared = True
+        self.assertIn("another process", api.cancel_job(running)["reason"])
+        self.assertEqual(api.cancel_job(99)["reason"], "Invalid job_id")
+
+    def test_parse_bulk_request(self):
+        self.assertEqual(api.parse_bulk_request({"job_ids": [3, 1, 3]}), ([3, 1], None, None))
+        self.assertEqual(api.parse_bulk_request({"from": 2, "to": 4, "job_ids": [3, 7]}),
+                         ([3, 7, 2, 4], None, None))
+        self.assertEqual(api.parse_bulk_request({"job_ids": [1], "stream": True, "wait": 5}), ([1], 5, None))
+        self.assertEqual(api.parse_bulk_request({"job_ids": [1], "stream": True}),
+                         ([1], api.MAX_BULK_WAIT, None))
+        self.assertEqual(api.parse_bulk_request({"job_ids": [1], "stream": True, "wait": 10 ** 6}),
+                         ([1], api.MAX_BULK_WAIT, None))
+
+        # Range limits: the range is inclusive, the duplicates are not counted
+        last = api.MAX_BULK_JOBS
+        self.assertEqual(len(api.parse_bulk_request({"from": 1, "to": last})[0]), api.MAX_BULK_JOBS)
+        self.assertEqual(len(api.parse_bulk_request({"from": 1, "to": last, "job_ids": [1, last]})[0]),
+                         api.MAX_BULK_JOBS)
+        self.assertIsNotNone(api.parse_bulk_request({"from": 1, "to": last + 1})[2])
+        self.assertIsNotNone(api.parse_bulk_request({"from": 1, "to": last, "job_ids": [last + 1]})[2])
+        self.assertIsNotNone(api.parse_bulk_request({"job_ids": list(range(last + 1))})[2])
+        self.assertIsNotNone(api.parse_bulk_request({"from": 5, "to": 4})[2])
+
+        # Invalid bodies
+        for body in [None, [1, 2], {}, {"job_ids": []}, {"job_ids": "1,2"}, {"job_ids": [1, "2"]},
+                     {"from": 1}, {"from": "1", "to": 2}, {"job_ids": [1], "stream": True, "wait": -1},
+                     {"job_ids": [1], "stream": True, "wait": "5"}]:
+            job_ids, wait, reason = api.parse_bulk_request(body)
+            self.assertIsNotNone(reason, body)
+            self.assertIsNone(job_ids)
+            self.assertIsNone(wait)
+
+        # JSON booleans are ints in Python, but not job IDs (True would find job 1)
+        for body in [{"job_ids": [True]}, {"job_ids": [1, False]}, {"from": True, "to": 2},
+                     {"from": 1, "to": True}]:
+            self.assertIsNotNone(api.parse_bulk_request(body)[2], body)
+
+    def test_bulk_results(self):
+        done = self.add_job("done", [1, 2])
+        running = self.add_job()
+        failed = self.add_job("error")
+        self.assertEqual(api.bulk_results([running, done, failed, 99]), {
+            "status": "done",
+            "data": {
+                f"job_id_{running}": {"status": "running"},
+                f"job_id_{done}": {"status": "done", "data": [1, 2]},
+                f"job_id_{failed}": {"status": "error", "reason": "The job failed"},
+                "job_id_99": {"status": "error", "reason": "Invalid job_id"}
+            }
+        })
+
+    def test_stream_results(self):
+        job_queue = api.webserver.tasks_runner.job_queue
+        done = self.add_job("done", "first")
+        later = self.add_job()
+        never = self.add_job()
+        cancelled = self.add_job()
+
+        # One job is finished by a worker, the other one is cancelled without a callback
+        Timer(0.2, self.finish_job, (later, "second")).start()
+        Timer(0.3, api.webserver.tasks_runner.job_status.__setitem__, (cancelled, "cancelled")).start()
+        start = time.monotonic()
+        with mock.patch.object(api, "BULK_POLL_INTERVAL", 0.05):
+            lines = [json.loads(line) for line in api.stream_results([never, later, done, cancelled, 99], 1.0)]
+        elapsed = time.monotonic() - start
+
+        # The finished jobs first, then the others as they finish, the unfinished ones at the end
+        self.assertEqual(lines, [
+            {"job_id": done, "status": "done", "data": "first"},
+            {"job_id": 99, "status": "error", "reason": "Invalid job_id"},
+            {"job_id": later, "status": "done", "data": "second"},
+            {"job_id": cancelled, "status": "cancelled"},
+            {"job_id": never, "status": "running"}
+        ])
+        self.assertGreaterEqual(elapsed, 1.0)
+        self.assertEqual(job_queue._done_callbacks, [])
+
+    def test_stream_results_all_finished(self):
+        first = self.add_job()
+        second = self.add_job()
+        Timer(0.1, self.finish_job, (first, 1)).start()
+        Timer(0.2, self.finish_job, (second, 2)).start()
+
+        # The stream ends as soon as the last job is finished, well before the wait runs out
+        start = time.monotonic()
+        lines = [json.loads(line) for line in api.stream_results([second, first], 10.0)]
+        self.assertLess(time.monotonic() - start, 5.0)
+        self.assertEqual([line["job_id"] for line in lines], [first, second])
+        self.assertTrue(all(line["status"] == "done" for line in lines))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,194 @@
+import unittest
+import asyncio
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+import types
+from threading import Timer
+sys.path.append("../app/")
+
+# Same stub app package as in test_api.py: asgi.py and api.py use its fake webserver, so importing
+# them does not start the server
+if "app" not in sys.modules:
+    app_package = types.ModuleType("app")
+    app_package.__path__ = [os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")]
+    app_package.webserver = types.SimpleNamespace(logger=logging.getLogger(__name__))
+    sys.modules["app"] = app_package
+
+from app import api, asgi
+from app.admission_control import AdmissionController
+from app.dataset_registry import DatasetRegistry
+from app.result_cache import ResultCache
+from app.task_runner import ThreadPool
+
+
+class ClientDisconnected(OSError):
+    """
+    Raised by the test `send` callable once the client went away, like the ASGI servers do.
+    """
+
+
+class TestAsgi(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        # A webserver without workers: the tests finish the jobs themselves, like a worker would
+        logger = logging.getLogger(__name__)
+        logger.disabled = True
+        webserver = api.webserver
+        webserver.logger = logger
+        webserver.datasets = DatasetRegistry({"default": "unused.csv"}, logger)
+        webserver.tasks_runner = ThreadPool(0, webserver.datasets, logger)
+        webserver.admission_control = AdmissionController(webserver.tasks_runner.job_queue)
+        webserver.result_cache = ResultCache()
+        # Every test runs in its own event loop
+        asgi.job_waiters = asgi.JobWaiters()
+
+        self.created_results = not os.path.isdir("./results")
+        os.makedirs("./results", exist_ok=True)
+        self.job_ids = []
+
+    def tearDown(self):
+        if self.created_results:
+            shutil.rmtree("./results", ignore_errors=True)
+        else:
+            for job_id in self.job_ids:
+                if os.path.exists(f"./results/job_id_{job_id}.json"):
+                    os.remove(f"./results/job_id_{job_id}.json")
+
+    async def call(self, method, path, body=None, query_string=b"", disconnect_after=None):
+        """
+        Drives the ASGI application with a single request.
+
+        Returns:
+            tuple: The status code, the headers and the chunks of the response body.
+        """
+        scope = {
+            "type": "http",
+            "method": method,
+            "path": path,
+            "query_string": query_string,
+            "headers": [],
+            "client": ("127.0.0.1", 40000)
+        }
+        request = json.dumps(body).encode("utf-8") if body is not None else b""
+        requests = [{"type": "http.request", "body": request}]
+        disconnected = asyncio.Event()
+        response = {"chunks": []}
+
+        async def receive():
+            # After the body, the next message is the disconnection of the client
+            if requests:
+                return requests.pop()
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if disconnected.is_set():
+                raise ClientDisconnected()
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = dict(message["headers"])
+                return
+            response["chunks"].append(message["body"])
+            if disconnect_after is not None and len(response["chunks"]) >= disconnect_after:
+                disconnected.set()
+
+        await asgi.application(scope, receive, send)
+        return response["status"], response["headers"], response["chunks"]
+
+    async def request(self, method, path, body=None, query_string=b""):
+        status, _, chunks = await self.call(method, path, body, query_string)
+        return status, json.loads(b"".join(chunks))
+
+    async def submit(self, question="Q"):
+        status, result = await self.request("POST", "/api/best5", {"question": question})
+        self.assertEqual((status, result["status"]), (200, "queued"))
+        self.job_ids.append(result["job_id"])
+        return result["job_id"]
+
+    def finish_job(self, result):
+        # What a worker does: take the job, save its result, then report it to the queue
+        tasks_runner = api.webserver.tasks_runner
+        job = tasks_runner.job_queue.get()
+        with open(f"./results/job_id_{job[2]}.json", "w", encoding="utf-8") as file:
+            json.dump(result, file)
+        tasks_runner.job_status[job[2]] = "done"
+        tasks_runner.job_queue.task_done(job, 0.001)
+
+    async def test_submit(self):
+        job_id = await self.submit()
+        self.assertEqual(api.webserver.tasks_runner.job_queue.get()[:3], ["best5", ["Q"], job_id])
+        self.assertEqual(await self.request("GET", "/api/num_jobs"), (200, {"status": "done", "data": 1}))
+
+        status, result = await self.request("POST", "/api/best5", {"question": "Q", "priority": "high"})
+        self.assertEqual((status, result["status"]), (200, "error"))
+
+    async def test_long_poll(self):
+        job_id = await self.submit()
+
+        # The waiting request is woken by the queue's done callback, well before its wait runs out
+        Timer(0.2, self.finish_job, ({"Ohio": 1.5},)).start()
+        start = time.monotonic()
+        status, result = await self.request("GET", f"/api/get_results/{job_id}", query_string=b"wait=10")
+        self.assertLess(time.monotonic() - start, 5.0)
+        self.assertEqual((status, result), (200, {"status": "done", "data": {"Ohio": 1.5}}))
+        self.assertEqual(asgi.job_waiters.waiters, {})
+
+    async def test_long_poll_timeout(self):
+        job_id = await self.submit()
+        start = time.monotonic()
+        status, result = await self.request("GET", f"/api/get_results/{job_id}", query_string=b"wait=0.2")
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        self.assertEqual((status, result), (200, {"status": "running"}))
+        self.assertEqual(asgi.job_waiters.waiters, {})
+
+    async def test_not_found(self):
+        self.assertEqual(await self.request("GET", "/api/unknown"), (404, {"status": "error", "reason": "Not found"}))
+        self.assertEqual((await self.request("POST", "/api/unknown", {}))[0], 404)
+        self.assertEqual((await self.request("GET", "/api/best5"))[0], 404)
+
+    async def test_cancel(self):
+        job_id = await self.submit()
+        self.assertEqual(await self.request("DELETE", f"/api/jobs/{job_id}"),
+                         (200, {"status": "cancelled", "job_id": job_id}))
+        self.assertEqual(await self.request("GET", f"/api/get_results/{job_id}"), (200, {"status": "cancelled"}))
+        status, result = await self.request("DELETE", f"/api/jobs/{job_id}")
+        self.assertEqual((status, result["reason"]), (200, "Job is already cancelled"))
+
+    async def test_bulk_stream(self):
+        first, second, never = await self.submit("Q1"), await self.submit("Q2"), await self.submit("Q3")
+        self.finish_job("first")
+        Timer(0.2, self.finish_job, ("second",)).start()
+
+        status, headers, chunks = await self.call(
+            "POST", "/api/get_results", {"job_ids": [never, second, first], "stream": True, "wait": 1.0}
+        )
+        self.assertEqual((status, headers[b"content-type"]), (200, b"application/x-ndjson"))
+        self.assertEqual([json.loads(chunk) for chunk in chunks if chunk], [
+            {"job_id": first, "status": "done", "data": "first"},
+            {"job_id": second, "status": "done", "data": "second"},
+            {"job_id": never, "status": "running"}
+        ])
+
+    async def test_bulk_stream_disconnect(self):
+        job_queue = api.webserver.tasks_runner.job_queue
+        first, pending = await self.submit("Q1"), await self.submit("Q2")
+        self.finish_job("first")
+        callbacks = list(job_queue._done_callbacks)
+
+        # The client goes away after the first line: the stream stops waiting for the other job,
+        # and the generator is closed and unsubscribed
+        start = time.monotonic()
+        _, _, chunks = await self.call("POST", "/api/get_results",
+                                       {"job_ids": [first, pending], "stream": True, "wait": 10},
+                                       disconnect_after=1)
+        self.assertLess(time.monotonic() - start, 5.0)
+        self.assertEqual([json.loads(chunk) for chunk in chunks],
+                         [{"job_id": first, "status": "done", "data": "first"}])
+        self.assertEqual(job_queue._done_callbacks, callbacks)
+
+
+if __name__ == '__main__':
+    unittest.main()
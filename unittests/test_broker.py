@@ -0,0 +1,195 @@
+import unittest
+import logging
+import os
+import shutil
+import socket
+import sys
+import time
+sys.path.append("../app/")
+from broker import JobBroker, send_message, receive_message
+from job_scheduler import JobScheduler
+from task_runner import ThreadPool
+from worker import RemoteTaskRunner
+
+
+class BrokenDatasets:
+    """
+    The part of the DatasetRegistry used by the workers, where the "bad" dataset cannot be loaded.
+    """
+
+    def get(self, name=None):
+        if name == "bad":
+            raise FileNotFoundError("/nope.csv")
+        return None
+
+
+def wait_for(predicate, timeout=5):
+    end = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < end:
+        time.sleep(0.01)
+    return predicate()
+
+
+class TestBroker(unittest.TestCase):
+    def setUp(self):
+        self.logger = logging.getLogger(__name__)
+        self.logger.disabled = True
+        self.created_results = not os.path.isdir("./results")
+        os.makedirs("./results", exist_ok=True)
+
+        self.pool = ThreadPool(0, BrokenDatasets(), self.logger, JobScheduler())
+        self.broker = JobBroker(("127.0.0.1", 0), self.pool, self.logger, heartbeat_timeout=0.5,
+                                max_requeues=2)
+        self.broker.start()
+        self.job_ids = []
+
+    def tearDown(self):
+        self.pool.shutdown()
+        with self.pool.condition:
+            self.pool.condition.notify_all()
+        self.broker.shutdown()
+        self.broker.server_close()
+        if self.created_results:
+            shutil.rmtree("./results", ignore_errors=True)
+        else:
+            for job_id in self.job_ids:
+                if os.path.exists(f"./results/job_id_{job_id}.json"):
+                    os.remove(f"./results/job_id_{job_id}.json")
+
+    def queue_job(self, dataset="good"):
+        job_id = self.pool.job_status.add_job("running")
+        self.job_ids.append(job_id)
+        self.pool.job_queue.put(["noop", ["Q"], job_id, None, dataset])
+        with self.pool.condition:
+            self.pool.condition.notify()
+        return job_id
+
+    def connect(self):
+        connection = socket.create_connection(self.broker.server_address[:2])
+        self.addCleanup(connection.close)
+        stream = connection.makefile("rwb")
+        self.addCleanup(stream.close)
+        return connection, stream
+
+    def pull(self, stream):
+        send_message(stream, {"type": "pull", "wait": 0.2})
+        return receive_message(stream)
+
+    def test_remote_worker(self):
+        worker = RemoteTaskRunner(self.broker.server_address[:2], BrokenDatasets(), self.logger,
+                                  heartbeat_interval=0.1)
+        worker.start()
+        good = self.queue_job()
+        bad = self.queue_job("bad")
+
+        self.assertTrue(wait_for(lambda: self.pool.job_queue.unfinished_tasks == 0))
+        self.assertEqual(self.pool.job_status[good], "done")
+        self.assertTrue(os.path.exists(f"./results/job_id_{good}.json"))
+        # The failed job is reported, not saved, and the worker goes on
+        self.assertEqual(self.pool.job_status[bad], "error")
+        self.assertFalse(os.path.exists(f"./results/job_id_{bad}.json"))
+        self.assertTrue(worker.is_alive())
+
+        # The worker leaves on the shutdown reply to its pull
+        self.pool.shutdown()
+        worker.join(timeout=5)
+        self.assertFalse(worker.is_alive())
+
+    def test_requeue_dropped_connection(self):
+        job_id = self.queue_job()
+        connection, stream = self.connect()
+        self.assertEqual(self.pull(stream)["job"][2], job_id)
+        connection.shutdown(socket.SHUT_RDWR)
+
+        # Once the broker sees the connection drop, the job is leased to the next worker
+        _, stream = self.connect()
+        reply = self.pull(stream)
+        while reply["type"] == "idle":
+            reply = self.pull(stream)
+        self.assertEqual(reply["job"][2], job_id)
+        self.assertEqual(self.broker.requeues[job_id], 1)
+
+        send_message(stream, {"type": "result", "job_id": job_id, "result": {"Q": 1}, "duration": 0.1})
+        self.assertEqual(receive_message(stream), {"type": "ok"})
+        self.assertEqual(self.pool.job_status[job_id], "done")
+        self.assertNotIn(job_id, self.broker.requeues)
+        self.assertEqual(self.pool.job_queue.unfinished_tasks, 0)
+
+    def test_requeue_heartbeat_timeout(self):
+        job_id = self.queue_job()
+        _, silent_stream = self.connect()
+        self.assertEqual(self.pull(silent_stream)["job"][2], job_id)
+
+        # The silent worker is dropped after the heartbeat timeout, its job is leased again
+        _, stream = self.connect()
+        reply = self.pull(stream)
+        while reply["type"] == "idle":
+            reply = self.pull(stream)
+        self.assertEqual(reply["job"][2], job_id)
+        self.assertNotIn(1, self.broker.workers)
+
+        # The connection of the dropped worker was closed by the broker
+        try:
+            send_message(silent_stream, {"type": "result", "job_id": job_id, "result": {}, "duration": 0.1})
+            self.assertIsNone(receive_message(silent_stream))
+        except OSError:
+            pass
+
+    def test_requeue_limit(self):
+        job_id = self.queue_job()
+        for _ in range(self.broker.max_requeues + 1):
+            connection, stream = self.connect()
+            reply = self.pull(stream)
+            while reply["type"] == "idle":
+                reply = self.pull(stream)
+            self.assertEqual(reply["job"][2], job_id)
+            connection.shutdown(socket.SHUT_RDWR)
+            self.assertTrue(wait_for(lambda: not self.broker.workers))
+
+        # The job took down too many workers, it is failed instead of being leased again
+        self.assertEqual(self.pool.job_status[job_id], "error")
+        self.assertEqual(self.pool.job_queue.unfinished_tasks, 0)
+        self.assertNotIn(job_id, self.broker.requeues)
+        self.assertTrue(self.pool.job_queue.empty())
+
+    def test_invalid_messages(self):
+        job_id = self.queue_job()
+        _, stream = self.connect()
+        for message in [[], {"job_id": 1}, {"type": "pull", "wait": "1"}, {"type": "unknown"}]:
+            send_message(stream, message)
+            self.assertEqual(receive_message(stream)["type"], "error")
+        self.assertEqual(self.pull(stream)["job"][2], job_id)
+
+        # Malformed results are refused before the lease is touched
+        for message in [{"type": "result", "job_id": job_id},
+                        {"type": "result", "job_id": str(job_id), "result": {}},
+                        {"type": "result", "job_id": job_id, "result": {}, "duration": "fast"},
+                        {"type": "result", "job_id": job_id, "result": {}, "duration": float("nan")}]:
+            send_message(stream, message)
+            self.assertEqual(receive_message(stream)["type"], "error")
+        self.assertEqual(self.pool.job_status[job_id], "running")
+        self.assertEqual(len(self.broker.workers), 1)
+
+        send_message(stream, {"type": "result", "job_id": job_id, "result": {"Q": 1}, "duration": 0.1})
+        self.assertEqual(receive_message(stream), {"type": "ok"})
+        self.assertEqual(self.pool.job_status[job_id], "done")
+        self.assertEqual(self.pool.job_queue.unfinished_tasks, 0)
+
+    def test_result_not_reused(self):
+        worker = RemoteTaskRunner(self.broker.server_address[:2], BrokenDatasets(), self.logger)
+        worker.result = {"Ohio": 1.5}
+        replies = [{"type": "shutdown"}, {"type": "ok"}, {"type": "job", "job": ["noop", ["Q"], 7, None, None]}]
+        sent = []
+
+        def call(message):
+            sent.append(message)
+            return replies.pop()
+
+        # A job type without a routine saves nothing, the result of the previous job is not sent
+        worker.process_jobs(call)
+        self.assertEqual([message["type"] for message in sent], ["pull", "result", "pull"])
+        self.assertIsNone(sent[1]["result"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import os
+import sys
+import tempfile
+import numpy as np
+from pandas import DataFrame
+sys.path.append("../app/")
+from data_ingestor import DataIngestor
+
+
+class TestDataIngestor(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(11)
+        size = 3000
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.directory.name, "data.csv")
+        DataFrame({
+            "YearStart": rng.choice([2011, 2013, 2015, 2017, 2019], size),
+            "YearEnd": rng.choice([2012, 2014, 2016, 2018, 2020], size),
+            "LocationDesc": rng.choice(["Ohio", "Texas", "Guam", "Iowa"], size),
+            "Question": rng.choice(["Q1", "Q2", "Q3"], size),
+            "Data_Value": rng.normal(30, 10, size),
+            "Low_Confidence_Limit": rng.normal(25, 1, size),
+            "High_Confidence_Limit": rng.normal(35, 1, size),
+            "StratificationCategory1": rng.choice(["Age (years)", "Gender"], size),
+            "Stratification1": rng.choice(["A", "B", "C"], size)
+        }).to_csv(cls.path, index=False)
+        cls.ingestor = DataIngestor(cls.path)
+        cls.unclustered = DataIngestor(cls.path, clustered=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def assert_rows(self, filters, mask):
+        self.assertEqual(self.ingestor.filter_rows(filters).tolist(), np.flatnonzero(mask).tolist())
+
+    def test_filter_single_value(self):
+        table = self.ingestor.table
+        self.assert_rows({"LocationDesc": "Ohio"}, table["LocationDesc"] == "Ohio")
+        self.assert_rows({"YearStart": 2015}, table["YearStart"] == 2015)
+        self.assert_rows({"Question": "Q9"}, np.zeros(len(table), dtype=bool))
+
+    def test_filter_list(self):
+        table = self.ingestor.table
+        self.assert_rows({"LocationDesc": ["Ohio", "Guam", "Nowhere"]}, table["LocationDesc"].isin(["Ohio", "Guam"]))
+
+    def test_filter_range(self):
+        table = self.ingestor.table
+        self.assert_rows({"YearStart": {"min": 2013, "max": 2017}}, table["YearStart"].between(2013, 2017))
+        self.assert_rows({"YearEnd": {"min": 2015}}, table["YearEnd"] >= 2015)
+        self.assert_rows({"YearEnd": {"max": 2015}}, table["YearEnd"] <= 2015)
+
+    def test_filters_combined(self):
+        table = self.ingestor.table
+        self.assert_rows(
+            {"Question": "Q2", "LocationDesc": ["Texas", "Iowa"], "YearStart": {"min": 2015}, "Stratification1": "B"},
+            (table["Question"] == "Q2") & table["LocationDesc"].isin(["Texas", "Iowa"])
+            & (table["YearStart"] >= 2015) & (table["Stratification1"] == "B")
+        )
+        self.assertEqual(self.ingestor.filter_rows({}).tolist(), list(range(len(table))))
+
+    def assert_same_selection(self, question, state=None):
+        # Same rows in both layouts, the clustered one being sorted differently
+        clustered = self.ingestor.select(question, state)
+        unclustered = self.unclustered.select(question, state)
+        columns = list(clustered.columns)
+        self.assertEqual(
+            clustered.sort_values(columns).to_numpy().tolist(),
+            unclustered[columns].sort_values(columns).to_numpy().tolist()
+        )
+        return clustered
+
+    def test_clustered_select(self):
+        for question in ["Q1", "Q2", "Q3"]:
+            self.assertGreater(len(self.assert_same_selection(question)), 0)
+            for state in ["Ohio", "Texas", "Guam", "Iowa"]:
+                self.assertGreater(len(self.assert_same_selection(question, state)), 0)
+
+    def test_clustered_select_missing(self):
+        self.assertEqual(len(self.assert_same_selection("Q9")), 0)
+        self.assertEqual(len(self.assert_same_selection("Q1", "Nowhere")), 0)
+        self.assertEqual(len(self.assert_same_selection("Q9", "Ohio")), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+import gc
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import weakref
+from pandas import DataFrame
+sys.path.append("../app/")
+from dataset_registry import DatasetRegistry, parse_datasets
+from task_runner import ThreadPool
+
+
+def write_dataset(path, states):
+    DataFrame({
+        "YearStart": [2020] * len(states),
+        "YearEnd": [2020] * len(states),
+        "LocationDesc": states,
+        "Question": ["Q1"] * len(states),
+        "Data_Value": [float(index) for index in range(len(states))],
+        "Low_Confidence_Limit": [0.0] * len(states),
+        "High_Confidence_Limit": [1.0] * len(states),
+        "StratificationCategory1": ["Total"] * len(states),
+        "Stratification1": ["Total"] * len(states)
+    }).to_csv(path, index=False)
+
+
+class TestDatasetRegistry(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.paths = {}
+        for name, states in [("default", ["Ohio", "Texas"]), ("a", ["Iowa"] * 50), ("b", ["Guam"] * 50)]:
+            self.paths[name] = os.path.join(self.directory.name, f"{name}.csv")
+            write_dataset(self.paths[name], states)
+        self.logger = logging.getLogger(__name__)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_parse_datasets(self):
+        self.assertEqual(parse_datasets(""), {})
+        self.assertEqual(parse_datasets("a=./a.csv, b = ./b.csv,"), {"a": "./a.csv", "b": "./b.csv"})
+        with self.assertRaises(ValueError):
+            parse_datasets("a")
+
+    def test_lazy_loading(self):
+        registry = DatasetRegistry(self.paths, self.logger)
+        self.assertFalse(any(dataset["loaded"] for dataset in registry.status()))
+
+        default = registry.get()
+        self.assertEqual(list(default.table["LocationDesc"]), ["Ohio", "Texas"])
+        self.assertIs(registry.get("default"), default)
+        self.assertEqual(list(registry.get("a").table["LocationDesc"].unique()), ["Iowa"])
+        self.assertEqual([dataset["loaded"] for dataset in registry.status()], [True, True, False])
+
+        self.assertNotIn("c", registry)
+        with self.assertRaises(KeyError):
+            registry.get("c")
+
+    def test_unloading(self):
+        registry = DatasetRegistry(self.paths, self.logger)
+        memory = registry.get("a").memory_usage()
+        registry = DatasetRegistry(self.paths, self.logger, memory_budget=int(memory * 1.5))
+
+        first = registry.get("a")
+        registry.get("b")
+        # "a" is the least recently used dataset and is unloaded to make room for "b"
+        self.assertEqual(list(registry.loaded), ["b"])
+        self.assertIsNot(registry.get("a"), first)
+        self.assertEqual(list(registry.loaded), ["a"])
+
+    def test_unloaded_dataset_is_released(self):
+        memory = DatasetRegistry(self.paths, self.logger).get("a").memory_usage()
+        registry = DatasetRegistry(self.paths, self.logger, memory_budget=int(memory * 1.5))
+        pool = ThreadPool(0, registry, self.logger)
+        created_results = not os.path.isdir("./results")
+        os.makedirs("./results", exist_ok=True)
+        try:
+            job_id = pool.job_status.add_job("running")
+            pool.job_queue.put(["states_mean", ["Q1"], job_id, None, "a"])
+            pool.add_workers(1)
+            end = time.monotonic() + 5
+            while pool.job_queue.unfinished_tasks and time.monotonic() < end:
+                time.sleep(0.01)
+            self.assertEqual(pool.job_status[job_id], "done")
+
+            # Once "a" is unloaded, the idle worker does not keep it in memory
+            dataset = weakref.ref(registry.loaded["a"][0])
+            registry.get("b")
+            self.assertEqual(list(registry.loaded), ["b"])
+            gc.collect()
+            self.assertIsNone(dataset())
+        finally:
+            pool.shutdown()
+            with pool.condition:
+                pool.condition.notify_all()
+            for worker in pool.workers:
+                worker.join(timeout=5)
+            if created_results:
+                shutil.rmtree("./results", ignore_errors=True)
+            elif os.path.exists(f"./results/job_id_{job_id}.json"):
+                os.remove(f"./results/job_id_{job_id}.json")
+
+
+if __name__ == '__main__':
+    unittest.main()
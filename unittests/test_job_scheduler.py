@@ -0,0 +1,106 @@
+import unittest
+import sys
+from unittest import mock
+sys.path.append("../app/")
+import job_scheduler
+from job_scheduler import JobScheduler
+
+
+class TestJobScheduler(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = JobScheduler(stretch=10.0, priority_step=0.01)
+        self.now = 1000.0
+        patcher = mock.patch.object(job_scheduler.time, "monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def drain(self):
+        order = []
+        while not self.scheduler.empty():
+            order.append(self.scheduler.get()[2])
+        return order
+
+    def test_cheap_jobs_overtake_expensive_ones(self):
+        for job_id in range(1, 4):
+            self.scheduler.put(["mean_by_category", ["Question1"], job_id])
+        self.scheduler.put(["state_mean", ["Question1", "Ohio"], 4])
+        self.assertEqual(self.drain(), [4, 1, 2, 3])
+
+    def test_aging_bounds_overtaking(self):
+        self.scheduler.put(["mean_by_category", ["Question1"], 1])
+        # Submitted later than 10 x (0.01 - 0.001) seconds after the expensive job
+        self.now += 0.1
+        self.scheduler.put(["state_mean", ["Question1", "Ohio"], 2])
+        self.assertEqual(self.drain(), [1, 2])
+
+    def test_priority(self):
+        self.scheduler.put(["state_mean", ["Question1", "Ohio"], 1])
+        self.scheduler.put(["mean_by_category", ["Question1"], 2], priority=10)
+        self.assertEqual(self.drain(), [2, 1])
+
+    def test_non_finite_priority(self):
+        for job_id in range(1, 4):
+            self.scheduler.put(["states_mean", ["Question1"], job_id])
+        for priority in [float("nan"), float("inf"), float("-inf")]:
+            with self.assertRaises(ValueError):
+                self.scheduler.put(["states_mean", ["Question1"], 9], priority=priority)
+        self.scheduler.put(["states_mean", ["Question1"], 4])
+
+        # The rejected jobs did not enter the queue nor break the FIFO order of the others
+        self.assertEqual(self.scheduler.unfinished_tasks, 4)
+        self.assertEqual(self.drain(), [1, 2, 3, 4])
+
+    def test_equal_jobs_are_fifo(self):
+        for job_id in range(1, 6):
+            self.scheduler.put(["states_mean", ["Question1"], job_id])
+        self.assertEqual(self.drain(), [1, 2, 3, 4, 5])
+
+    def test_cancel(self):
+        finished = []
+        self.scheduler.add_done_callback(finished.append)
+        for job_id in range(1, 4):
+            self.scheduler.put(["states_mean", ["Question1"], job_id])
+
+        job = self.scheduler.cancel(2)
+        self.assertEqual(job[2], 2)
+        self.assertIsNone(self.scheduler.cancel(2))
+        # The cancelled job is finished only when the caller reports it
+        self.assertEqual(finished, [])
+        self.assertEqual(self.scheduler.unfinished_tasks, 3)
+        self.scheduler.task_done(job)
+        self.assertEqual([job[2] for job in finished], [2])
+        self.assertEqual(self.scheduler.unfinished_tasks, 2)
+        self.assertEqual(self.drain(), [1, 3])
+
+    def test_take(self):
+        self.scheduler.put(["best5", ["Question1"], 1])
+        self.scheduler.put(["states_mean", ["Question2"], 2])
+        self.scheduler.put(["worst5", ["Question1"], 3])
+        self.scheduler.put(["global_mean", ["Question1"], 4])
+
+        taken = self.scheduler.take(lambda job: job[1][0] == "Question1", 2)
+        # Taken in the order they would have been run (global_mean is cheaper)
+        self.assertEqual([job[2] for job in taken], [4, 1])
+        self.assertEqual(self.scheduler.take(lambda job: job[1][0] == "Question3", 2), [])
+        self.assertEqual(self.drain(), [2, 3])
+
+    def test_done_callbacks(self):
+        finished, removed = [], []
+        self.scheduler.add_done_callback(finished.append)
+        self.scheduler.add_done_callback(removed.append)
+        self.scheduler.remove_done_callback(removed.append)
+
+        self.scheduler.put(["best5", ["Question1"], 1])
+        self.scheduler.task_done(self.scheduler.get(), 0.1)
+        self.assertEqual([job[2] for job in finished], [1])
+        self.assertEqual(removed, [])
+
+    def test_measured_costs(self):
+        for _ in range(50):
+            self.scheduler.record("state_mean", 0.5)
+        self.assertAlmostEqual(self.scheduler.expected_cost("state_mean"), 0.5, places=3)
+        self.assertEqual(self.scheduler.expected_cost("unknown"), self.scheduler.expected_cost("state_mean"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+import os
+import sys
+import tempfile
+from multiprocessing import Pool
+sys.path.append("../app/")
+from job_store import JobStore, InMemoryJobStore, SQLiteJobStore
+
+
+def allocate_job_ids(path):
+    store = SQLiteJobStore(path)
+    return [store.add_job("running") for _ in range(50)]
+
+
+class JobStoreTests:
+    def make_store(self):
+        raise NotImplementedError
+
+    def test_add_job(self):
+        store = self.make_store()
+        self.assertEqual([store.add_job("running") for _ in range(3)], [1, 2, 3])
+        self.assertEqual(store[2], "running")
+        self.assertIn(3, store)
+        self.assertNotIn(4, store)
+        self.assertIsNone(store.get(4))
+
+    def test_statuses(self):
+        store = self.make_store()
+        for _ in range(4):
+            store.add_job("running")
+        store[1] = "done"
+        store[3] = "expired"
+
+        self.assertEqual(list(store.items()), [(1, "done"), (2, "running"), (3, "expired"), (4, "running")])
+        self.assertEqual(store.count("running"), 2)
+        self.assertEqual(len(store), 4)
+
+    def test_items_snapshot(self):
+        store = self.make_store()
+        for _ in range(3):
+            store.add_job("running")
+        items = store.items()
+
+        # A job discarded after the listing (e.g. a rejected submission) does not change it
+        del store[2]
+        self.assertEqual(list(items), [(1, "running"), (2, "running"), (3, "running")])
+        self.assertEqual(list(store.items()), [(1, "running"), (3, "running")])
+
+    def test_discarded_ids_are_not_reused(self):
+        store = self.make_store()
+        store.add_job("running")
+        job_id = store.add_job("running")
+        del store[job_id]
+
+        self.assertNotIn(job_id, store)
+        self.assertEqual(store.add_job("running"), job_id + 1)
+
+
+class TestJobStore(unittest.TestCase):
+    def test_abstract(self):
+        # The storage classes must implement the allocation of job IDs
+        with self.assertRaises(TypeError):
+            JobStore()
+        self.assertFalse(InMemoryJobStore.shared)
+        self.assertTrue(SQLiteJobStore.shared)
+
+
+class TestInMemoryJobStore(JobStoreTests, unittest.TestCase):
+    def make_store(self):
+        return InMemoryJobStore()
+
+
+class TestSQLiteJobStore(JobStoreTests, unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "jobs.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def make_store(self):
+        return SQLiteJobStore(self.path)
+
+    def test_shared_between_stores(self):
+        first = self.make_store()
+        second = self.make_store()
+        job_id = first.add_job("running")
+
+        self.assertEqual(second[job_id], "running")
+        second[job_id] = "done"
+        self.assertEqual(first[job_id], "done")
+        self.assertEqual(second.add_job("running"), job_id + 1)
+
+    def test_unique_ids_across_processes(self):
+        self.make_store()
+        with Pool(4) as pool:
+            job_ids = sum(pool.map(allocate_job_ids, [self.path] * 4), [])
+
+        self.assertEqual(sorted(job_ids), list(range(1, 201)))
+
+
+if __name__ == '__main__':
+    unittest.main()
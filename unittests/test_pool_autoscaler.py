@@ -0,0 +1,83 @@
+import unittest
+import logging
+import sys
+import time
+from unittest import mock
+sys.path.append("../app/")
+import pool_autoscaler
+from job_scheduler import JobScheduler
+from pool_autoscaler import PoolAutoscaler
+from task_runner import ThreadPool
+
+
+class EmptyDatasets:
+    """
+    The part of the DatasetRegistry used by the workers, the "noop" jobs need no data.
+    """
+
+    def get(self, name=None):
+        return None
+
+
+class TestPoolAutoscaler(unittest.TestCase):
+    def setUp(self):
+        self.pool = ThreadPool(1, EmptyDatasets(), logging.getLogger(__name__), JobScheduler())
+        self.autoscaler = PoolAutoscaler(self.pool, 1, 4, target_wait=0.01, idle_timeout=5)
+
+    def tearDown(self):
+        self.pool.shutdown()
+        with self.pool.condition:
+            self.pool.condition.notify_all()
+        for worker in self.pool.workers:
+            worker.join(timeout=5)
+
+    def queue_jobs(self, count):
+        # The jobs are not announced to the workers, so they stay queued until the pool grows
+        for _ in range(count):
+            job_id = self.pool.job_status.add_job("running")
+            self.pool.job_queue.put(["noop", [], job_id, None, None])
+
+    def wait_for(self, predicate):
+        end = time.monotonic() + 5
+        while not predicate() and time.monotonic() < end:
+            time.sleep(0.01)
+        self.assertTrue(predicate())
+
+    def test_grow_with_backlog(self):
+        self.queue_jobs(2)
+        self.autoscaler.check()
+        # 2 jobs of unknown type, expected to cost 0.02 s each, drained in 0.01 s
+        self.assertEqual(self.pool.num_of_threads(), 4)
+        self.assertEqual([(event["from"], event["to"]) for event in self.autoscaler.events], [(1, 4)])
+
+        self.wait_for(lambda: self.pool.job_queue.unfinished_tasks == 0)
+        self.assertEqual(self.pool.job_status.count("done"), 2)
+
+    def test_no_change_without_backlog(self):
+        self.autoscaler.check()
+        self.autoscaler.check()
+        self.assertEqual(self.pool.num_of_threads(), 1)
+        self.assertFalse(self.autoscaler.events)
+
+    def test_shrink_when_idle(self):
+        self.pool.add_workers(3)
+        with mock.patch.object(pool_autoscaler.time, "monotonic", return_value=100.0):
+            self.autoscaler.check()
+        with mock.patch.object(pool_autoscaler.time, "monotonic", return_value=103.0):
+            self.autoscaler.check()
+        self.assertEqual(self.pool.num_of_threads(), 4)
+
+        with mock.patch.object(pool_autoscaler.time, "monotonic", return_value=105.0):
+            self.autoscaler.check()
+        self.assertEqual(self.pool.num_of_threads(), 1)
+        self.wait_for(lambda: sum(worker.is_alive() for worker in self.pool.workers) == 1)
+
+        # The remaining worker still executes jobs
+        self.queue_jobs(1)
+        with self.pool.condition:
+            self.pool.condition.notify()
+        self.wait_for(lambda: self.pool.job_queue.unfinished_tasks == 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import math
+import sys
+import numpy as np
+from pandas import DataFrame
+sys.path.append("../app/")
+from question_cache import QuestionCache
+
+
+class TableIngestor:
+    """
+    The part of the DataIngestor used by QuestionCache, counting the selections.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.bitmaps = {"Question": dict.fromkeys(table["Question"].unique())}
+        self.selections = 0
+
+    def select(self, question):
+        self.selections += 1
+        return self.table[self.table["Question"] == question]
+
+
+class TestQuestionCache(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        size = 2000
+        self.table = DataFrame({
+            "Question": rng.choice(["Q1", "Q2"], size),
+            "LocationDesc": rng.choice(["Ohio", "Texas", "Guam"], size),
+            "StratificationCategory1": rng.choice(["Age (years)", "Gender"], size),
+            "Stratification1": rng.choice(["A", "B", "C"], size),
+            "Data_Value": rng.normal(30, 10, size)
+        })
+        self.ingestor = TableIngestor(self.table)
+        self.cache = QuestionCache(self.ingestor)
+
+    def assert_same_means(self, result, reference):
+        self.assertEqual(list(result.keys()), list(reference.keys()))
+        for key, value in reference.items():
+            self.assertAlmostEqual(result[key], value, places=9)
+
+    def test_means(self):
+        rows = self.table[self.table["Question"] == "Q1"]
+        self.assert_same_means(
+            self.cache.state_means("Q1"),
+            rows.groupby("LocationDesc")["Data_Value"].mean().to_dict()
+        )
+        self.assertAlmostEqual(self.cache.global_mean("Q1"), rows["Data_Value"].mean(), places=9)
+
+        reference = rows.groupby(["LocationDesc", "StratificationCategory1", "Stratification1"])["Data_Value"].mean()
+        category_means = self.cache.category_means("Q1")
+        self.assertEqual(list(category_means), ["Guam", "Ohio", "Texas"])
+        for state, state_means in category_means.items():
+            self.assert_same_means(state_means, reference[state].to_dict())
+
+    def test_computed_once(self):
+        first = self.cache.state_means("Q1")
+        self.cache.state_means("Q1")
+        self.cache.global_mean("Q1")
+        self.cache.global_mean("Q1")
+        self.assertEqual(self.ingestor.selections, 2)
+        self.assertIs(self.cache.state_means("Q1"), first)
+
+        # Other questions have their own results
+        self.assertNotEqual(self.cache.state_means("Q2"), first)
+        self.assertEqual(self.ingestor.selections, 3)
+
+    def test_clear(self):
+        self.cache.state_means("Q1")
+        self.cache.clear()
+        self.cache.state_means("Q1")
+        self.assertEqual(self.ingestor.selections, 2)
+
+    def test_unknown_question(self):
+        self.assertEqual(self.cache.state_means("Q3"), {})
+        self.assertTrue(math.isnan(self.cache.global_mean("Q3")))
+        self.assertEqual(self.cache.category_means("Q3"), {})
+
+        # Unknown questions are computed again on every request, never stored
+        self.cache.state_means("Q3")
+        self.assertEqual(self.ingestor.selections, 4)
+        self.assertEqual(self.cache._results, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+import gzip
+import json
+import sys
+import zlib
+sys.path.append("../app/")
+from result_cache import ResultCache, choose_encoding, etag_matches
+
+
+def serialized(size):
+    return json.dumps({f"State{index}": index / 7 for index in range(size)}).encode("utf-8")
+
+
+class TestResultCache(unittest.TestCase):
+    def test_choose_encoding(self):
+        self.assertIsNone(choose_encoding(""))
+        self.assertIsNone(choose_encoding("identity, br"))
+        self.assertEqual(choose_encoding("gzip, deflate, br"), "gzip")
+        self.assertEqual(choose_encoding("deflate"), "deflate")
+        self.assertEqual(choose_encoding("gzip;q=0.5, deflate"), "deflate")
+        self.assertEqual(choose_encoding("*"), "gzip")
+        self.assertIsNone(choose_encoding("gzip;q=0, deflate;q=0"))
+
+    def test_etag_matches(self):
+        self.assertTrue(etag_matches('"abc"', '"abc"'))
+        self.assertTrue(etag_matches('"xyz", W/"abc"', '"abc"'))
+        self.assertTrue(etag_matches("*", '"abc"'))
+        self.assertFalse(etag_matches("", '"abc"'))
+        self.assertFalse(etag_matches('"abc-gzip"', '"abc"'))
+
+    def test_serialized_once(self):
+        cache = ResultCache()
+        calls = []
+        body = serialized(200)
+
+        def serialize():
+            calls.append(1)
+            return body
+
+        first = cache.get(1, None, serialize)
+        second = cache.get(1, None, serialize)
+        self.assertEqual(first, second)
+        self.assertEqual(first[0], body)
+        self.assertEqual(len(calls), 1)
+
+    def test_compressed_variants(self):
+        cache = ResultCache()
+        body = serialized(200)
+        plain, etag, encoding = cache.get(1, None, lambda: body)
+        self.assertIsNone(encoding)
+
+        compressed, gzip_etag, encoding = cache.get(1, "gzip", lambda: body)
+        self.assertEqual(encoding, "gzip")
+        self.assertEqual(gzip.decompress(compressed), plain)
+        self.assertNotEqual(gzip_etag, etag)
+        self.assertIs(cache.get(1, "gzip", lambda: body)[0], compressed)
+
+        compressed, _, encoding = cache.get(1, "deflate", lambda: body)
+        self.assertEqual(encoding, "deflate")
+        self.assertEqual(zlib.decompress(compressed), plain)
+
+    def test_small_bodies_not_compressed(self):
+        cache = ResultCache()
+        body, _, encoding = cache.get(1, "gzip", lambda: b'{"Ohio": 31.4}')
+        self.assertEqual(body, b'{"Ohio": 31.4}')
+        self.assertIsNone(encoding)
+
+    def test_eviction(self):
+        body = serialized(200)
+        cache = ResultCache(max_bytes=3 * len(body))
+        for job_id in range(1, 4):
+            cache.get(job_id, None, lambda: body)
+        # Job 1 becomes the most recently used, job 2 is evicted
+        cache.get(1, None, lambda: body)
+        cache.get(4, None, lambda: body)
+
+        self.assertEqual(cache.size, 3 * len(body))
+        calls = []
+        cache.get(2, None, lambda: calls.append(1) or body)
+        cache.get(1, None, lambda: calls.append(1) or body)
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
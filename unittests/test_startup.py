@@ -0,0 +1,53 @@
+import unittest
+import logging
+import sys
+from threading import Event
+sys.path.append("../app/")
+from startup import StartupTask
+
+
+class TestStartupTask(unittest.TestCase):
+    def setUp(self):
+        self.logger = logging.getLogger(__name__)
+
+    def test_progress(self):
+        started, release = Event(), Event()
+
+        def slow_step():
+            started.set()
+            release.wait(5)
+
+        done = []
+        startup = StartupTask([("Loading", slow_step), ("Starting", lambda: done.append(1))], self.logger)
+        startup.start()
+        started.wait(5)
+
+        status = startup.status()
+        self.assertFalse(status["ready"])
+        self.assertEqual((status["step"], status["done_steps"], status["total_steps"]), ("Loading", 0, 2))
+
+        release.set()
+        startup.join(5)
+        status = startup.status()
+        self.assertTrue(status["ready"])
+        self.assertEqual((status["step"], status["done_steps"]), (None, 2))
+        self.assertIsNone(status["error"])
+        self.assertEqual(done, [1])
+
+    def test_failure(self):
+        def failing_step():
+            raise FileNotFoundError("missing.csv")
+
+        done = []
+        startup = StartupTask([("Loading", failing_step), ("Starting", lambda: done.append(1))], self.logger)
+        startup.start()
+        startup.join(5)
+
+        status = startup.status()
+        self.assertFalse(status["ready"])
+        self.assertEqual(status["error"], "Loading: missing.csv")
+        self.assertEqual(done, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
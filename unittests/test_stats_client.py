@@ -0,0 +1,128 @@
+import unittest
+import asyncio
+import json
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import islice
+from threading import Lock, Thread
+sys.path.append("../client/")
+from stats_client import StatsClient, AsyncStatsClient, JobError, poll_delays
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    A minimal webserver: every job is "running" for its first two polls, then done with its
+    question as result. The first submission is rejected with HTTP 429. The bulk endpoint exists only if the
+    server has `bulk` set.
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, result, status_code=200, headers=None):
+        body = json.dumps(result).encode("utf-8")
+        self.send_response(status_code)
+        for name, value in {"Content-Type": "application/json", **(headers or {})}.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def entry(self, job_id):
+        with self.server.lock:
+            if job_id not in self.server.polls:
+                return {"status": "error", "reason": "Invalid job_id"}
+            self.server.polls[job_id] += 1
+            if self.server.polls[job_id] <= 2:
+                return {"status": "running"}
+            return {"status": "done", "data": self.server.questions[job_id]}
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.path == "/api/get_results":
+            if not self.server.bulk:
+                self.send_json({"status": "error", "reason": "Not found"}, 404)
+                return
+            self.server.bulk_requests += 1
+            lines = b"".join(
+                json.dumps({"job_id": job_id, **self.entry(job_id)}).encode("utf-8") + b"\n"
+                for job_id in body["job_ids"]
+            )
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Content-Length", str(len(lines)))
+            self.end_headers()
+            self.wfile.write(lines)
+            return
+
+        with self.server.lock:
+            self.server.submissions += 1
+            rejected = self.server.submissions == 1
+        if rejected:
+            self.send_json({"status": "error", "reason": "Too many jobs"}, 429, {"Retry-After": "0"})
+            return
+        if body.get("question") is None:
+            self.send_json({"status": "error", "reason": "Missing question"})
+            return
+        with self.server.lock:
+            job_id = len(self.server.polls) + 1
+            self.server.polls[job_id] = 0
+            self.server.questions[job_id] = body["question"]
+        self.send_json({"status": "queued", "job_id": job_id})
+
+    def do_GET(self):
+        self.send_json(self.entry(int(self.path.split("?")[0].rsplit("/", 1)[1])))
+
+
+class TestStatsClient(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.server.polls, self.server.questions = {}, {}
+        self.server.submissions, self.server.bulk_requests = 0, 0
+        self.server.lock = Lock()
+        self.server.bulk = True
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_poll_delays(self):
+        delays = list(islice(poll_delays(0.1, 2, 1.0), 6))
+        self.assertEqual(delays, [0.1, 0.2, 0.4, 0.8, 1.0, 1.0])
+
+    def test_submit_and_result(self):
+        with StatsClient(self.url, max_connections=4) as client:
+            # The first submission is rejected, then retried after Retry-After
+            job_id = client.submit("best5", {"question": "Q"})
+            self.assertEqual(client.result(job_id, timeout=5), "Q")
+            with self.assertRaises(JobError):
+                client.submit("best5", {})
+            with self.assertRaises(JobError):
+                client.result(100, timeout=5)
+
+    def test_bulk_results(self):
+        with StatsClient(self.url, max_connections=4) as client:
+            results = client.run_many([("best5", {"question": f"Q{index}"}) for index in range(20)], timeout=5)
+        self.assertEqual(results, [f"Q{index}" for index in range(20)])
+        # Every stream returns all the jobs, running twice then done
+        self.assertEqual(self.server.bulk_requests, 3)
+
+    def test_polling_fallback(self):
+        self.server.bulk = False
+        with StatsClient(self.url, max_connections=4) as client:
+            job_ids = client.submit_many([("best5", {"question": f"Q{index}"}) for index in range(5)])
+            results = client.results(job_ids, timeout=5)
+        self.assertEqual([results[job_id] for job_id in job_ids], [f"Q{index}" for index in range(5)])
+
+    def test_async(self):
+        async def run():
+            async with AsyncStatsClient(self.url, max_connections=4) as client:
+                return await client.run_many([("best5", {"question": f"Q{index}"}) for index in range(10)], timeout=5)
+
+        self.assertEqual(asyncio.run(run()), [f"Q{index}" for index in range(10)])
+
+
+if __name__ == '__main__':
+    unittest.main()
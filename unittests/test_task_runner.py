@@ -0,0 +1,195 @@
+import unittest
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from threading import Timer
+import numpy as np
+from pandas import DataFrame
+sys.path.append("../app/")
+from dataset_registry import DatasetRegistry
+from job_scheduler import JobScheduler
+from task_runner import TaskRunner, ThreadPool
+
+
+class BrokenDatasets:
+    """
+    The part of the DatasetRegistry used by the workers, where the "bad" dataset cannot be loaded.
+    """
+
+    def get(self, name=None):
+        if name == "bad":
+            raise FileNotFoundError("/nope.csv")
+        return None
+
+
+class TestTaskRunner(unittest.TestCase):
+    def setUp(self):
+        logger = logging.getLogger(__name__)
+        logger.disabled = True
+        self.pool = ThreadPool(0, BrokenDatasets(), logger, JobScheduler(batch_size=4))
+
+    def tearDown(self):
+        self.pool.shutdown()
+        with self.pool.condition:
+            self.pool.condition.notify_all()
+        for worker in self.pool.workers:
+            worker.join(timeout=5)
+
+    def test_failed_jobs(self):
+        finished = []
+        self.pool.job_queue.add_done_callback(finished.append)
+
+        # The "noop" jobs need no data, the ones on the "bad" dataset fail, some of them in a batch
+        job_ids = {}
+        for dataset in ["bad", "good", "bad", "bad", "good"]:
+            job_id = self.pool.job_status.add_job("running")
+            job_ids[job_id] = dataset
+            self.pool.job_queue.put(["noop", ["Q"], job_id, None, dataset])
+        self.pool.add_workers(1)
+
+        end = time.monotonic() + 5
+        while self.pool.job_queue.unfinished_tasks and time.monotonic() < end:
+            time.sleep(0.01)
+
+        self.assertEqual(self.pool.job_queue.unfinished_tasks, 0)
+        self.assertEqual(sorted(job[2] for job in finished), sorted(job_ids))
+        for job_id, dataset in job_ids.items():
+            self.assertEqual(self.pool.job_status[job_id], "error" if dataset == "bad" else "done")
+        # The worker survived the failures
+        self.assertEqual(self.pool.num_of_threads(), 1)
+
+    def test_expired_jobs(self):
+        finished = []
+        self.pool.job_queue.add_done_callback(finished.append)
+
+        # The deadlines are absolute times, the first one passed while the job was queued
+        expired = self.pool.job_status.add_job("running")
+        self.pool.job_queue.put(["noop", ["Q"], expired, time.time() - 1, "good"])
+        pending = self.pool.job_status.add_job("running")
+        self.pool.job_queue.put(["noop", ["Q"], pending, time.time() + 60, "good"])
+        self.pool.add_workers(1)
+
+        end = time.monotonic() + 5
+        while self.pool.job_queue.unfinished_tasks and time.monotonic() < end:
+            time.sleep(0.01)
+
+        self.assertEqual(self.pool.job_status[expired], "expired")
+        self.assertEqual(self.pool.job_status[pending], "done")
+        self.assertEqual(sorted(job[2] for job in finished), [expired, pending])
+        self.assertEqual(self.pool.job_queue.unfinished_tasks, 0)
+
+
+class TestTakeBatch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(5)
+        size = 600
+        cls.directory = tempfile.TemporaryDirectory()
+        path = os.path.join(cls.directory.name, "data.csv")
+        cls.table = DataFrame({
+            "YearStart": [2020] * size,
+            "YearEnd": [2020] * size,
+            "LocationDesc": rng.choice(["Ohio", "Texas", "Guam", "Iowa"], size),
+            "Question": rng.choice(["Q1", "Q2"], size),
+            "Data_Value": rng.normal(30, 10, size),
+            "Low_Confidence_Limit": [25.0] * size,
+            "High_Confidence_Limit": [35.0] * size,
+            "StratificationCategory1": ["Total"] * size,
+            "Stratification1": ["Total"] * size
+        })
+        cls.table.to_csv(path, index=False)
+        cls.datasets = DatasetRegistry({"default": path}, logging.getLogger(__name__))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def setUp(self):
+        logger = logging.getLogger(__name__)
+        logger.disabled = True
+        self.pool = ThreadPool(0, self.datasets, logger, JobScheduler(batch_size=3, batch_window=0.5))
+        # A worker which is not started, its methods are called by the test
+        self.runner = TaskRunner(self.pool.job_queue, self.pool.job_status, self.pool.shutdown_notification,
+                                 self.pool.condition, None, logger, datasets=self.datasets)
+        self.created_results = not os.path.isdir("./results")
+        os.makedirs("./results", exist_ok=True)
+        self.job_ids = []
+
+    def tearDown(self):
+        if self.created_results:
+            shutil.rmtree("./results", ignore_errors=True)
+        else:
+            for job_id in self.job_ids:
+                if os.path.exists(f"./results/job_id_{job_id}.json"):
+                    os.remove(f"./results/job_id_{job_id}.json")
+
+    def queue_job(self, request, data):
+        job_id = self.pool.job_status.add_job("running")
+        self.job_ids.append(job_id)
+        self.pool.job_queue.put([request, data, job_id, None, "default"])
+        return job_id
+
+    def test_batch(self):
+        jobs = {
+            self.queue_job("states_mean", ["Q1"]): "states_mean",
+            self.queue_job("global_mean", ["Q1"]): "global_mean",
+            self.queue_job("state_mean", ["Q1", "Ohio"]): "state_mean",
+            self.queue_job("best5", ["Q1"]): "best5"
+        }
+        other = self.queue_job("states_mean", ["Q2"])
+
+        # A full batch is taken right away, without waiting for the window
+        start = time.monotonic()
+        batch = self.runner.take_batch(self.pool.job_queue.get())
+        self.assertLess(time.monotonic() - start, 0.4)
+        self.assertEqual(len(batch), 3)
+        self.assertTrue(all(job[1][0] == "Q1" for job in batch))
+        self.assertEqual(len({job[2] for job in batch}), 3)
+
+        # The rest of the jobs, the other question included, are still queued
+        queued = [job[2] for job in self.pool.job_queue.take(lambda job: True, 10)]
+        self.assertEqual(sorted(queued), sorted(set(jobs) - {job[2] for job in batch}) + [other])
+
+        # Every job of the batch gets its own result
+        means = self.table[self.table["Question"] == "Q1"].groupby("LocationDesc")["Data_Value"].mean()
+        expected = {
+            "states_mean": dict(means.sort_values().items()),
+            "global_mean": {"global_mean": self.table[self.table["Question"] == "Q1"]["Data_Value"].mean()},
+            "state_mean": {"Ohio": means["Ohio"]},
+            "best5": dict(means.sort_values(ascending=False).items())
+        }
+        for job in batch:
+            self.runner.process_job(job)
+            self.assertEqual(self.pool.job_status[job[2]], "done")
+            with open(f"./results/job_id_{job[2]}.json", encoding="utf-8") as file:
+                result = json.load(file)
+            reference = expected[jobs[job[2]]]
+            self.assertEqual(list(result), list(reference))
+            for key, value in reference.items():
+                self.assertAlmostEqual(result[key], value, places=9)
+
+    def test_lone_job_is_not_delayed(self):
+        self.queue_job("states_mean", ["Q1"])
+        self.queue_job("states_mean", ["Q2"])
+        start = time.monotonic()
+        batch = self.runner.take_batch(self.pool.job_queue.get())
+        self.assertLess(time.monotonic() - start, 0.4)
+        self.assertEqual(len(batch), 1)
+
+    def test_window_collects_burst(self):
+        first = self.queue_job("states_mean", ["Q1"])
+        second = self.queue_job("global_mean", ["Q1"])
+        # The last job of the burst is queued during the window
+        late = Timer(0.1, self.queue_job, ("best5", ["Q1"]))
+        late.start()
+        batch = self.runner.take_batch(self.pool.job_queue.get())
+        late.join()
+        self.assertEqual(sorted(job[2] for job in batch), [first, second, max(self.job_ids)])
+
+
+if __name__ == '__main__':
+    unittest.main()